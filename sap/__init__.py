@@ -11,19 +11,47 @@ import os
 import logging
 
 
+# Log level of messages produced for every processed XML element - lower
+# than DEBUG to avoid flooding debug logs with parsing details
+TRACE = 5
+logging.addLevelName(TRACE, 'TRACE')
+
+_LOGGER = None
+
+
 def get_logger():
-    """Returns the common logger object. Don't use for standard output"""
+    """Returns the common logger object. Don't use for standard output
+
+       The log level is taken from the environment variable SAPCLI_LOG_LEVEL
+       only when the logger is requested for the first time.
+    """
+
+    # pylint: disable=global-statement
+    global _LOGGER
+
+    if _LOGGER is None:
+        logger = logging.getLogger()
+
+        env_level = os.environ.get('SAPCLI_LOG_LEVEL', None)
+        if env_level:
+            logging.basicConfig()
+            logger.setLevel(int(env_level))
+
+        _LOGGER = logger
+
+    return _LOGGER
 
-    logger = logging.getLogger()
 
-    env_level = os.environ.get('SAPCLI_LOG_LEVEL', None)
-    if env_level:
-        logging.basicConfig()
-        logger.setLevel(int(env_level))
+def is_trace_enabled():
+    """Returns True if messages of the level TRACE are logged - evaluate once
+       before processing a document and skip tracing calls if False.
+    """
 
-    return logger
+    return get_logger().isEnabledFor(TRACE)
 
 
 __all__ = [
+    "TRACE",
     "get_logger",
+    "is_trace_enabled",
 ]
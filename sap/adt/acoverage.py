@@ -0,0 +1,348 @@
+"""ABAP Unit Code Coverage ADT wrappers"""
+
+import sys
+from array import array
+from typing import NamedTuple, List, Dict
+
+from xml.sax.handler import ContentHandler
+
+from sap import get_logger, is_trace_enabled, TRACE
+from sap.adt.core import parse_xml_response
+
+
+COVERAGE_MIME_TYPE = 'application/xml'
+
+COVERAGE_MEASUREMENTS_URI = 'runtime/traces/coverage/measurements'
+COVERAGE_RESULTS_URI = 'runtime/traces/coverage/results'
+
+# Types of coverage counters
+COVERAGE_STATEMENT = 'statement'
+COVERAGE_BRANCH = 'branch'
+COVERAGE_PROCEDURE = 'procedure'
+
+
+def mod_log():
+    """ADT Module logger"""
+
+    return get_logger()
+
+
+def _object_references(adt_object_uris):
+    references = ''.join(f'        <adtcore:objectReference adtcore:uri="{adt_object_uri}"/>\n'
+                         for adt_object_uri in adt_object_uris)
+
+    return f'''  <adtcore:objectSets xmlns:adtcore="http://www.sap.com/adt/core">
+    <objectSet kind="inclusive">
+      <adtcore:objectReferences>
+{references}      </adtcore:objectReferences>
+    </objectSet>
+  </adtcore:objectSets>
+'''
+
+
+class CoverageNode:
+    """Node of the coverage measurement tree - a package, an object or
+       a procedure (method, form, function module) - with the numbers of
+       executed and all statements, branches and procedures.
+    """
+
+    __slots__ = ('name', 'typ', 'uri', 'statements_uri', 'counters', 'nodes')
+
+    def __init__(self, name, typ, uri):
+        self.name = name
+        self.typ = typ
+        self.uri = uri
+        self.statements_uri = None
+        # counter type -> (executed, total)
+        self.counters = {}
+        self.nodes = []
+
+    def counter(self, typ):
+        """Returns the pair (executed, total) of the counter type -
+           e.g. COVERAGE_STATEMENT
+        """
+
+        return self.counters.get(typ, (0, 0))
+
+    def iter_leaves(self):
+        """Yields the nodes without child nodes"""
+
+        if not self.nodes:
+            yield self
+            return
+
+        for node in self.nodes:
+            yield from node.iter_leaves()
+
+
+class LineCoverage:
+    """Executed lines of a source code in two arrays: line numbers in
+       ascending order and the corresponding execution counts.
+    """
+
+    __slots__ = ('lines', 'hits')
+
+    def __init__(self, line_hits):
+        """:param line_hits: dictionary line number -> execution count"""
+
+        numbers = sorted(line_hits)
+
+        self.lines = array('L', numbers)
+        self.hits = array('L', (line_hits[number] for number in numbers))
+
+    def __iter__(self):
+        return zip(self.lines, self.hits)
+
+    def __len__(self):
+        return len(self.lines)
+
+    @property
+    def covered(self):
+        """Number of executed lines"""
+
+        return sum(1 for hits in self.hits if hits)
+
+
+# pylint: disable=too-few-public-methods
+class Coverage(NamedTuple):
+    """Coverage of tested objects with the lines of source code includes"""
+
+    nodes: List[CoverageNode]
+    lines: Dict[str, LineCoverage]
+
+
+# pylint: disable=too-few-public-methods
+class SourceCoverage(NamedTuple):
+    """Coverage of a source code include of an object - the nodes measured
+       in the include and its lines
+    """
+
+    uri: str
+    nodes: List[CoverageNode]
+    lines: LineCoverage
+
+
+class CoverageXMLHandler(ContentHandler):
+    """Coverage measurement results XML parser building the tree of
+       CoverageNode
+    """
+
+    def __init__(self):
+        super(CoverageXMLHandler, self).__init__()
+
+        self.nodes = []
+        self._path = []
+        self._trace = is_trace_enabled()
+
+    def startElement(self, name, attrs):
+        if self._trace:
+            mod_log().log(TRACE, 'XML: %s', name)
+
+        if name == 'node':
+            node = CoverageNode(sys.intern(attrs.get('adtcore:name', '')), sys.intern(attrs.get('adtcore:type', '')),
+                                attrs.get('adtcore:uri', None))
+
+            if self._path:
+                self._path[-1].nodes.append(node)
+            else:
+                self.nodes.append(node)
+
+            self._path.append(node)
+        elif not self._path:
+            return
+        elif name == 'coverage':
+            typ = sys.intern(attrs.get('type', ''))
+            self._path[-1].counters[typ] = (int(attrs.get('executed', 0)), int(attrs.get('total', 0)))
+        elif name == 'atom:link' and attrs.get('rel', '').endswith('/statements'):
+            self._path[-1].statements_uri = attrs.get('href', None)
+
+    def endElement(self, name):
+        if name == 'node':
+            self._path.pop()
+
+
+def _source_uri(uri):
+    """Returns the URI of the source code include without the fragment"""
+
+    return uri.split('#', 1)[0]
+
+
+def _source_object_uri(source_uri):
+    """Returns the URI of the object to which the source code belongs"""
+
+    source_uri = _source_uri(source_uri)
+
+    for part in ('/source/', '/includes/'):
+        index = source_uri.find(part)
+        if index > 0:
+            return source_uri[:index]
+
+    return source_uri
+
+
+def _start_line(source_uri):
+    """Returns the line number of the fragment #start=LINE,COLUMN"""
+
+    _, _, fragment = source_uri.partition('#')
+
+    for parameter in fragment.split(';'):
+        key, _, value = parameter.partition('=')
+        if key == 'start':
+            return int(value.split(',', 1)[0])
+
+    return None
+
+
+class StatementsXMLHandler(ContentHandler):
+    """Coverage statements results XML parser collecting execution counts
+       of lines grouped by source code include URIs
+    """
+
+    def __init__(self):
+        super(StatementsXMLHandler, self).__init__()
+
+        # include URI -> {line -> execution count}
+        self.lines = {}
+        self._executed = None
+        self._trace = is_trace_enabled()
+
+    def startElement(self, name, attrs):
+        if self._trace:
+            mod_log().log(TRACE, 'XML: %s', name)
+
+        if name == 'statement':
+            self._executed = int(attrs.get('executed', 0))
+        elif name == 'adtcore:objectReference' and self._executed is not None:
+            source_uri = attrs.get('adtcore:uri', '')
+            line = _start_line(source_uri)
+            if line is None:
+                return
+
+            line_hits = self.lines.setdefault(_source_uri(source_uri), {})
+            line_hits[line] = max(line_hits.get(line, 0), self._executed)
+
+    def endElement(self, name):
+        if name == 'statement':
+            self._executed = None
+
+
+class ACoverage:
+    """ABAP Unit Code Coverage measurement results"""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    @staticmethod
+    def build_query(adt_object_uris):
+        """Build the query of coverage results of the tested objects"""
+
+        return f'''<?xml version="1.0" encoding="UTF-8"?>
+<cov:query xmlns:cov="http://www.sap.com/adt/cov">
+{_object_references(adt_object_uris)}</cov:query>'''
+
+    @staticmethod
+    def build_statements_request(statements_uris):
+        """Build the bulk request of statement results"""
+
+        requests = ''.join(f'  <statementsRequest get="{statements_uri}"/>\n' for statements_uri in statements_uris)
+
+        return f'''<?xml version="1.0" encoding="UTF-8"?>
+<cov:statementsBulkRequest xmlns:cov="http://www.sap.com/adt/cov">
+{requests}</cov:statementsBulkRequest>'''
+
+    def fetch_nodes(self, identifier, adt_object_uris):
+        """Returns the list of top level CoverageNode of the tested objects
+           parsed as the response is being downloaded.
+        """
+
+        resp = self._connection.execute('POST', f'{COVERAGE_MEASUREMENTS_URI}/{identifier}',
+                                        accept=COVERAGE_MIME_TYPE, content_type=COVERAGE_MIME_TYPE,
+                                        body=ACoverage.build_query(adt_object_uris), stream=True)
+
+        return parse_xml_response(resp, CoverageXMLHandler()).nodes
+
+    def fetch_lines(self, identifier, statements_uris):
+        """Returns the dictionary include URI -> LineCoverage"""
+
+        if not statements_uris:
+            return {}
+
+        resp = self._connection.execute('POST', f'{COVERAGE_RESULTS_URI}/{identifier}/statements',
+                                        accept=COVERAGE_MIME_TYPE, content_type=COVERAGE_MIME_TYPE,
+                                        body=ACoverage.build_statements_request(statements_uris), stream=True)
+
+        xml_handler = parse_xml_response(resp, StatementsXMLHandler())
+
+        return {uri: LineCoverage(line_hits) for uri, line_hits in xml_handler.lines.items()}
+
+    def fetch(self, identifier, adt_object_uris):
+        """Returns Coverage of the tested objects measured in the test run
+           whose results contain the coverage identifier.
+        """
+
+        nodes = self.fetch_nodes(identifier, adt_object_uris)
+
+        statements_uris = [leaf.statements_uri for node in nodes for leaf in node.iter_leaves()
+                           if leaf.statements_uri is not None]
+
+        return Coverage(nodes, self.fetch_lines(identifier, statements_uris))
+
+
+def merge_coverages(coverages):
+    """Merges coverages of several test runs of different objects"""
+
+    if len(coverages) == 1:
+        return coverages[0]
+
+    merged = Coverage([], {})
+
+    for coverage in coverages:
+        merged.nodes.extend(coverage.nodes)
+        merged.lines.update(coverage.lines)
+
+    return merged
+
+
+def includes_by_object(lines):
+    """Returns the dictionary object URI -> the list of URIs of its source
+       code includes with lines
+    """
+
+    includes = {}
+    for uri in lines:
+        includes.setdefault(_source_object_uri(uri), []).append(uri)
+
+    return includes
+
+
+def _include_order(uri):
+    """The main source first, then the other includes by name"""
+
+    return (not uri.endswith('/source/main'), uri)
+
+
+def source_coverages(node, lines, includes):
+    """Returns the list of SourceCoverage of the object's source code
+       includes where the procedures are assigned to the includes in which
+       they start; an object without procedures is measured as a whole in
+       its first include.
+
+       :param lines: the dictionary include URI -> LineCoverage
+       :param includes: the result of includes_by_object(lines)
+    """
+
+    sources = {uri: [] for uri in includes.get(node.uri, ())}
+
+    procedures = [leaf for leaf in node.iter_leaves() if leaf is not node]
+    for procedure in procedures:
+        sources.setdefault(_source_uri(procedure.uri or node.uri), []).append(procedure)
+
+    if not sources:
+        sources[node.uri] = []
+
+    ordered = sorted(sources, key=_include_order)
+
+    if not procedures:
+        sources[ordered[0]] = [node]
+
+    return [SourceCoverage(uri, sources[uri], lines.get(uri, None)) for uri in ordered]
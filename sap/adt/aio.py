@@ -0,0 +1,144 @@
+"""asyncio interface to ADT for overlapping many requests on one event loop
+
+The HTTP communication is still carried out by :class:`sap.adt.Connection`
+whose blocking calls are dispatched to a thread pool, hence all requests
+share the same HTTP session, cookies and CSRF token.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from sap.adt.package import Package, explore
+from sap.adt.repository import Repository
+
+
+DEFAULT_CONCURRENCY = 10
+
+
+class AsyncConnection:
+    """ADT Connection with coroutine methods execute() and get_text()"""
+
+    def __init__(self, connection, concurrency=DEFAULT_CONCURRENCY):
+        """Parameters:
+            - connection: sap.adt.Connection
+            - concurrency: maximum number of requests in flight
+        """
+
+        self._connection = connection
+        self._concurrency = concurrency
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._semaphore = None
+        self._session_lock = None
+        self._session_ready = False
+
+    @property
+    def connection(self):
+        """The wrapped synchronous connection"""
+
+        return self._connection
+
+    @property
+    def user(self):
+        """Connected user"""
+
+        return self._connection.user
+
+    @property
+    def uri(self):
+        """ADT path for building URLs (e.g. sap/bc/adt)"""
+
+        return self._connection.uri
+
+    def close(self):
+        """Waits for the running requests and releases the worker threads"""
+
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    async def _dispatch(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def run(self, func, *args, **kwargs):
+        """Calls the blocking function func in a worker thread when the number
+           of requests in flight drops below the configured concurrency.
+
+           The first call is executed alone to let it establish the HTTP
+           session and CSRF token which are then shared by all requests.
+        """
+
+        # asyncio primitives are bound to the loop running at creation time
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+            self._session_lock = asyncio.Lock()
+
+        if not self._session_ready:
+            async with self._session_lock:
+                if not self._session_ready:
+                    result = await self._dispatch(func, *args, **kwargs)
+                    self._session_ready = True
+                    return result
+
+        async with self._semaphore:
+            return await self._dispatch(func, *args, **kwargs)
+
+    # pylint: disable=too-many-arguments
+    async def execute(self, method, adt_uri, params=None, headers=None, body=None, accept=None, content_type=None,
+                      stream=False):
+        """Coroutine variant of sap.adt.Connection.execute()"""
+
+        return await self.run(self._connection.execute, method, adt_uri, params=params, headers=headers, body=body,
+                              accept=accept, content_type=content_type, stream=stream)
+
+    async def get_text(self, relativeuri):
+        """Coroutine variant of sap.adt.Connection.get_text()"""
+
+        return await self.run(self._connection.get_text, relativeuri)
+
+
+async def fetch(async_connection, adt_object):
+    """Coroutine variant of ADTObject.fetch() which returns the fetched object"""
+
+    await async_connection.run(adt_object.fetch)
+
+    return adt_object
+
+
+async def text(async_connection, adt_object):
+    """Coroutine variant of ADTObject.text"""
+
+    return await async_connection.run(getattr, adt_object, 'text')
+
+
+async def read_node(async_connection, adt_object, withdescr=False, nodekeys=None):
+    """Coroutine variant of Repository.read_node()"""
+
+    repository = Repository(async_connection.connection)
+
+    return await async_connection.run(repository.read_node, adt_object, withdescr=withdescr, nodekeys=nodekeys)
+
+
+async def walk(async_connection, package):
+    """Asynchronous generator yielding the same structure and in the same order
+       as sap.adt.package.walk() but all packages of the same level of
+       the hierarchy are explored concurrently.
+    """
+
+    level = [(package, [])]
+
+    while level:
+        explored = await asyncio.gather(*(async_connection.run(explore, pkg) for pkg, _ in level))
+
+        next_level = []
+        for (pkg, path), (subpackages, objects) in zip(level, explored):
+            yield (path, subpackages, objects)
+
+            next_level.extend((Package(pkg.connection, subpkg), path + [subpkg]) for subpkg in subpackages)
+
+        level = next_level
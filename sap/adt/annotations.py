@@ -1,5 +1,6 @@
 """Python decorators for conversions of Python objects to ADT XML fragments"""
 
+import sys
 from enum import Enum
 import collections
 
@@ -41,14 +42,15 @@ class XmlElementKind(Enum):
 class XmlAttributeProperty(property):
     """XML Annotation"""
 
-    def __init__(self, name, fget, fset=None, deserialize=True):
+    def __init__(self, name, fget, fset=None, deserialize=True, serialize=True):
         super(XmlAttributeProperty, self).__init__(fget, fset)
 
         self.name = name
         self.deserialize = deserialize
+        self.serialize = serialize
 
     def setter(self, fset):
-        return type(self)(self.name, self.fget, fset, deserialize=self.deserialize)
+        return type(self)(self.name, self.fget, fset, deserialize=self.deserialize, serialize=self.serialize)
 
 
 # pylint: disable=too-few-public-methods
@@ -91,7 +93,8 @@ class XmlPropertyImpl:
     def set(self, obj, value):
         """Setter"""
 
-        obj.__dict__[self.attr] = value
+        # works for objects with __slots__ too
+        setattr(obj, self.attr, value)
 
 
 class XmlNodeProperty(XmlElementProperty, XmlPropertyImpl):
@@ -127,6 +130,34 @@ class XmlNodeAttributeProperty(XmlAttributeProperty, XmlPropertyImpl):
         raise NotImplementedError()
 
 
+class XmlInternedAttributeProperty(XmlNodeAttributeProperty):
+    """XML attribute whose values repeat in many nodes (e.g. priorities, check
+       IDs) and therefore are interned to keep a single copy in memory.
+    """
+
+    def set(self, obj, value):
+        """Setter"""
+
+        if isinstance(value, str):
+            value = sys.intern(value)
+
+        super(XmlInternedAttributeProperty, self).set(obj, value)
+
+    def setter(self, fset):
+        """Returns the attribute property with the given setter which receives
+           interned values
+        """
+
+        def interned_fset(obj, value):
+            if isinstance(value, str):
+                value = sys.intern(value)
+
+            fset(obj, value)
+
+        return XmlAttributeProperty(self.name, self.fget, interned_fset, deserialize=self.deserialize,
+                                    serialize=self.serialize)
+
+
 class XmlListNodeProperty(XmlElementProperty):
     """Many repetitions of the same tag"""
 
@@ -217,13 +248,13 @@ def xml_text_node_property(name, value=None, deserialize=True):
     return XmlNodeProperty(name, value=value, deserialize=deserialize, factory=None, kind=XmlElementKind.TEXT)
 
 
-def xml_attribute(name, deserialize=True):
+def xml_attribute(name, deserialize=True, serialize=True):
     """Mark the given property as a XML element attribute of the given name"""
 
     def decorator(meth):
         """Creates a property object"""
 
-        return XmlAttributeProperty(name, meth, deserialize=deserialize)
+        return XmlAttributeProperty(name, meth, deserialize=deserialize, serialize=serialize)
 
     return decorator
 
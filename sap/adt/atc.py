@@ -1,19 +1,40 @@
 """ATC ADT wrappers"""
 
-import xml.sax
+import os
+import json
+import time
+import hashlib
 from xml.sax.handler import ContentHandler
+from concurrent.futures import ThreadPoolExecutor
 
-from typing import NamedTuple
+from typing import NamedTuple, Iterator, Tuple
+
+import requests
 
 from sap import get_logger
+import sap.adt.objects
+import sap.adt.package
 from sap.adt.objects import OrderedClassMembers, ADTObjectType, XMLNamespace, xmlns_adtcore_ancestor
 from sap.adt.annotations import xml_element, XmlNodeProperty, xml_text_node_property, XmlContainer, \
-    XmlNodeAttributeProperty
-from sap.adt.marshalling import Marshal
+    XmlNodeAttributeProperty, XmlInternedAttributeProperty
+from sap.adt.marshalling import Marshal, deserialization_plan
+from sap.adt.core import iter_xml_response
+from sap.adt.xmlparser import parse_xml
+from sap.errors import SAPCliError
+from sap.adt.errors import HTTPRequestError, ADTError
 
 
 CUSTOMIZING_MIME_TYPE_V1 = 'application/vnd.sap.atc.customizing-v1+xml'
 
+# Number of objects checked in a single run to keep requests reasonably sized
+DEFAULT_RUN_CHUNK_SIZE = 100
+
+# Number of repeated runs of a failed shard
+DEFAULT_SHARD_RETRIES = 1
+
+# One day
+CUSTOMIZING_CACHE_TTL = 24 * 60 * 60
+
 XMLNS_ATC = XMLNamespace('atc', 'http://www.sap.com/adt/atc')
 XMLNS_ATCINFO = XMLNamespace('atcinfo', 'http://www.sap.com/adt/atc/info')
 XMLNS_ATCWORKLIST = XMLNamespace('atcworklist', 'http://www.sap.com/adt/atc/worklist')
@@ -49,8 +70,114 @@ class Customizing:
         self.system_check_variant = system_check_variant
 
 
-def fetch_customizing(connection):
-    """Fetch ATC customizing for the connected system"""
+class CustomizingCache:
+    """ATC customizing and worklist IDs stored in a directory where each ADT
+       system and client has its own files which expire after the configured
+       time.
+    """
+
+    def __init__(self, directory, ttl=CUSTOMIZING_CACHE_TTL):
+        self._directory = directory
+        self._ttl = ttl
+
+    def _path(self, prefix, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self._directory, f'{prefix}-{digest}.json')
+
+    def _load(self, path, key):
+        """Returns the record stored in the file or None if missing or expired"""
+
+        try:
+            with open(path, 'r', encoding='utf-8') as source:
+                record = json.load(source)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            mod_log().info('Ignoring corrupted ATC cache: %s', path)
+            return None
+
+        if record.get('key', None) != key or time.time() - record['fetched'] > self._ttl:
+            return None
+
+        return record
+
+    def _save(self, path, key, **values):
+        if not os.path.isdir(self._directory):
+            os.makedirs(self._directory, exist_ok=True)
+
+        tmp_path = f'{path}.{os.getpid()}'
+
+        with open(tmp_path, 'w', encoding='utf-8') as dest:
+            json.dump({'key': key, 'fetched': time.time(), **values}, dest)
+
+        os.replace(tmp_path, path)
+
+    def load_customizing(self, key):
+        """Returns the cached Customizing or None if missing or expired"""
+
+        record = self._load(self._path('atc', key), key)
+        if record is None:
+            return None
+
+        return Customizing(system_check_variant=record['system_check_variant'])
+
+    def save_customizing(self, key, customizing):
+        """Stores the Customizing"""
+
+        self._save(self._path('atc', key), key, system_check_variant=customizing.system_check_variant)
+
+    def load_worklist_id(self, key, variant):
+        """Returns the cached worklist ID of the check variant or None
+           if missing or expired
+        """
+
+        worklist_key = f'{key} {variant}'
+        record = self._load(self._path('atc-worklist', worklist_key), worklist_key)
+        if record is None:
+            return None
+
+        return record['worklist_id']
+
+    def save_worklist_id(self, key, variant, worklist_id):
+        """Stores the worklist ID of the check variant"""
+
+        worklist_key = f'{key} {variant}'
+        self._save(self._path('atc-worklist', worklist_key), worklist_key, worklist_id=worklist_id)
+
+
+def customizing_cache(connection):
+    """Returns CustomizingCache stored in the directory of the connection's
+       response cache or None if the connection has no cache.
+    """
+
+    if connection.cache is None:
+        return None
+
+    return CustomizingCache(connection.cache.directory)
+
+
+def fetch_customizing(connection, cache=None):
+    """Fetch ATC customizing for the connected system
+
+       If the cache (CustomizingCache) is given, the customizing is stored
+       in the cache and reused until it expires.
+    """
+
+    if cache is not None:
+        cust = cache.load_customizing(connection.system_key)
+        if cust is not None:
+            return cust
+
+    cust = _download_customizing(connection)
+
+    if cache is not None:
+        cache.save_customizing(connection.system_key, cust)
+
+    return cust
+
+
+def _download_customizing(connection):
+    """Downloads ATC customizing"""
 
     resp = connection.execute(
         'GET',
@@ -61,7 +188,7 @@ def fetch_customizing(connection):
     mod_log().debug('ATC Customizing response:\n%s', resp.text)
 
     cust = Customizing()
-    xml.sax.parseString(resp.text, ATCCustomizingXMLHandler(cust))
+    parse_xml(resp.text, ATCCustomizingXMLHandler(cust))
 
     return cust
 
@@ -126,17 +253,27 @@ WorkListObjectSetList = XmlContainer.define('atcworklist:objectSet', WorkListObj
 
 
 class ATCFinding(metaclass=OrderedClassMembers):
-    """atcfinding:finding XML Node"""
+    """atcfinding:finding XML Node
+
+       Worklists have up to hundreds of thousands of findings, hence the
+       values are stored in slots instead of __dict__ and the values shared
+       by many findings are interned.
+    """
+
+    # storage of the XML properties
+    __slots__ = ('_adtcore_uri', '_atcfinding_location', '_atcfinding_priority', '_atcfinding_checkId',
+                 '_atcfinding_checkTitle', '_atcfinding_messageId', '_atcfinding_messageTitle',
+                 '_atcfinding_exemptionApproval', '_atcfinding_exemptionKind')
 
     uri = XmlNodeAttributeProperty('adtcore:uri')
     location = XmlNodeAttributeProperty('atcfinding:location')
-    priority = XmlNodeAttributeProperty('atcfinding:priority')
-    check_id = XmlNodeAttributeProperty('atcfinding:checkId')
-    check_title = XmlNodeAttributeProperty('atcfinding:checkTitle')
-    message_id = XmlNodeAttributeProperty('atcfinding:messageId')
-    message_title = XmlNodeAttributeProperty('atcfinding:messageTitle')
-    exemption_approval = XmlNodeAttributeProperty('atcfinding:exemptionApproval')
-    exemption_kind = XmlNodeAttributeProperty('atcfinding:exemptionKind')
+    priority = XmlInternedAttributeProperty('atcfinding:priority')
+    check_id = XmlInternedAttributeProperty('atcfinding:checkId')
+    check_title = XmlInternedAttributeProperty('atcfinding:checkTitle')
+    message_id = XmlInternedAttributeProperty('atcfinding:messageId')
+    message_title = XmlInternedAttributeProperty('atcfinding:messageTitle')
+    exemption_approval = XmlInternedAttributeProperty('atcfinding:exemptionApproval')
+    exemption_kind = XmlInternedAttributeProperty('atcfinding:exemptionKind')
 
 
 # pylint: disable=invalid-name
@@ -146,14 +283,18 @@ ATCFindingList = XmlContainer.define('atcfinding:finding', ATCFinding)
 class ATCObject(metaclass=OrderedClassMembers):
     """atcobject:object XML Node"""
 
+    # storage of the XML properties
+    __slots__ = ('_adtcore_uri', '_adtcore_type', '_adtcore_name', '_adtcore_packageName', '_atcobject_author',
+                 '_atcobject_objectTypeId', '_atcobject_findings')
+
     objtype = ADTObjectType(None, None, XMLNS_ATCOBJECT, 'application/xml', None, 'object')
 
     uri = XmlNodeAttributeProperty('adtcore:uri')
-    typ = XmlNodeAttributeProperty('adtcore:type')
+    typ = XmlInternedAttributeProperty('adtcore:type')
     name = XmlNodeAttributeProperty('adtcore:name')
-    package_name = XmlNodeAttributeProperty('adtcore:packageName')
-    author = XmlNodeAttributeProperty('atcobject:author')
-    object_type_id = XmlNodeAttributeProperty('atcobject:objectTypeId')
+    package_name = XmlInternedAttributeProperty('adtcore:packageName')
+    author = XmlInternedAttributeProperty('atcobject:author')
+    object_type_id = XmlInternedAttributeProperty('atcobject:objectTypeId')
     findings = XmlNodeProperty('atcobject:findings', factory=ATCFindingList)
 
 
@@ -173,6 +314,19 @@ class WorkList(metaclass=OrderedClassMembers):
     object_sets = XmlNodeProperty('atcworklist:objectSets', factory=WorkListObjectSetList)
     objects = XmlNodeProperty('atcworklist:objects', factory=ATCObjectList)
 
+    def iter_findings(self):
+        """Yields the pairs (ATCObject, ATCFinding) in the document order"""
+
+        if self.objects is None:
+            return
+
+        for atcobject in self.objects:
+            if atcobject.findings is None:
+                continue
+
+            for finding in atcobject.findings:
+                yield (atcobject, finding)
+
 
 class WorkListRunResult(NamedTuple):
     """Work List Run results"""
@@ -181,16 +335,178 @@ class WorkListRunResult(NamedTuple):
     worklist: WorkList
 
 
+def chunked_object_sets(adt_objects, chunk_size=DEFAULT_RUN_CHUNK_SIZE):
+    """Generator splitting the list of ADT objects into ADTObjectSets
+       with at most chunk_size objects.
+    """
+
+    if chunk_size < 1:
+        raise SAPCliError(f'Invalid number of objects per ATC run: {chunk_size}')
+
+    for start in range(0, len(adt_objects), chunk_size):
+        obj_sets = sap.adt.objects.ADTObjectSets()
+
+        for adt_object in adt_objects[start:start + chunk_size]:
+            obj_sets.include_object(adt_object)
+
+        yield obj_sets
+
+
+def merge_worklists(worklists):
+    """Returns a WorkList with the objects of all the given worklists where
+       the findings of an object occurring in more worklists are joined.
+
+       The attributes of the result are taken from the last worklist.
+    """
+
+    if len(worklists) == 1:
+        return worklists[0]
+
+    merged = WorkList()
+    merged.objects = ATCObjectList()
+
+    known = {}
+    for worklist in worklists:
+        merged.worklist_id = worklist.worklist_id
+        merged.timestamp = worklist.timestamp
+        merged.used_objectset = worklist.used_objectset
+        merged.object_set_is_complete = worklist.object_set_is_complete
+        merged.object_sets = worklist.object_sets
+
+        if worklist.objects is None:
+            continue
+
+        for atcobject in worklist.objects:
+            previous = known.get(atcobject.uri, None)
+
+            if previous is None:
+                known[atcobject.uri] = atcobject
+                merged.objects.append(atcobject)
+            elif atcobject.findings is not None:
+                if previous.findings is None:
+                    previous.findings = ATCFindingList()
+
+                for finding in atcobject.findings:
+                    previous.findings.append(finding)
+
+    return merged
+
+
+def _set_attributes(obj, attrs):
+    """Sets the XML attribute properties of obj"""
+
+    properties = deserialization_plan(type(obj)).attributes
+
+    for name, value in attrs.items():
+        try:
+            properties[name].__set__(obj, value)
+        except KeyError:
+            pass
+
+
+class WorkListXMLHandler(ContentHandler):
+    """ATC Worklist XML parser which does not build the object graph but
+       collects the parsed pairs (ATCObject, ATCFinding) in the list findings
+       to be taken by the caller via the method pop_findings().
+
+       The attributes and object sets of the worklist are stored in the given
+       WorkList.
+    """
+
+    def __init__(self, worklist):
+        super(WorkListXMLHandler, self).__init__()
+
+        self.worklist = worklist
+        self.findings = []
+        self._object = None
+
+    def startElement(self, name, attrs):
+        if name == 'atcfinding:finding':
+            finding = ATCFinding()
+            _set_attributes(finding, attrs)
+            self.findings.append((self._object, finding))
+        elif name == 'atcobject:object':
+            self._object = ATCObject()
+            _set_attributes(self._object, attrs)
+        elif name == 'atcworklist:objectSet':
+            object_set = WorkListObjectSet()
+            _set_attributes(object_set, attrs)
+            self.worklist.object_sets.append(object_set)
+        elif name == 'atcworklist:objectSets':
+            self.worklist.object_sets = WorkListObjectSetList()
+        elif name == 'atcworklist:worklist':
+            _set_attributes(self.worklist, attrs)
+
+    def endElement(self, name):
+        if name == 'atcobject:object':
+            self._object = None
+
+    def pop_findings(self):
+        """Returns the findings parsed since the last call"""
+
+        findings = self.findings
+        self.findings = []
+
+        return findings
+
+
+def iter_worklist_response(response, worklist):
+    """Generator yielding the pairs (ATCObject, ATCFinding) as they are parsed
+       from the response of atc/worklists/{id} executed with stream=True.
+
+       The objects have no findings and the attributes of the worklist are
+       stored in the given WorkList.
+    """
+
+    xml_handler = WorkListXMLHandler(worklist)
+
+    for _ in iter_xml_response(response, xml_handler):
+        yield from xml_handler.pop_findings()
+
+
+class WorkListRunStream(NamedTuple):
+    """Work List Run results with the lazily parsed worklist
+
+       The attributes of the worklist are available once the iteration over
+       findings has started.
+    """
+
+    run_response: RunResponse
+    worklist: WorkList
+    findings: Iterator[Tuple[ATCObject, ATCFinding]]
+
+
+def is_unknown_worklist_error(error):
+    """Returns True if the error says the server does not know the worklist"""
+
+    if isinstance(error, HTTPRequestError):
+        return error.response.status_code == 404
+
+    return isinstance(error, ADTError) and error.type == 'ExceptionResourceNotFound'
+
+
 class ChecksRunner:
-    """"ATC Checks runner"""
+    """"ATC Checks runner
+
+       All runs of the runner share a single worklist which is either
+       the given one or created by the first run. A new worklist is created
+       when the server no longer knows the current one.
+    """
 
-    def __init__(self, connection, variant):
+    def __init__(self, connection, variant, worklist_id=None):
         """:param connection: ADT Connection
            :param variant: A string holding the executed variant name
+           :param worklist_id: ID of a worklist created by previous runs
         """
         self._connection = connection
         self._variant = variant
-        self._worklist_id = None
+        self._worklist_id = worklist_id
+
+    @property
+    def worklist_id(self):
+        """ID of the worklist used by the last run or None"""
+
+        return self._worklist_id
 
     def _get_id(self):
         """Fetches this list's ID"""
@@ -203,25 +519,142 @@ class ChecksRunner:
 
         return self._worklist_id
 
-    def run_for(self, obj_sets, max_verdicts=100):
-        """Executes checks for the given object sets"""
+    def _post_run(self, request):
+        """Starts the run on this list and returns the response"""
+
+        reused = self._worklist_id is not None
+        worklist_id = self._get_id()
+
+        try:
+            return self._connection.execute('POST', 'atc/runs', params={'worklistId': worklist_id},
+                                            accept='application/xml', content_type='application/xml',
+                                            body=request)
+        except (HTTPRequestError, ADTError) as ex:
+            if not reused or not is_unknown_worklist_error(ex):
+                raise
+
+            # the server may have already deleted the worklist of the previous runs
+            mod_log().info('ATC worklist %s no longer exists: %s', worklist_id, str(ex))
+
+            self._worklist_id = None
+            return self._post_run(request)
+
+    def _run(self, obj_sets, max_verdicts):
+        """Executes checks and returns the run response and the response of
+           the streamed GET request for the worklist.
+        """
 
         run_request = RunRequest(obj_sets, max_verdicts)
         request = Marshal().serialize(run_request)
 
-        worklist_id = self._get_id()
-        resp = self._connection.execute('POST', 'atc/runs', params={'worklistId': worklist_id},
-                                        accept='application/xml', content_type='application/xml',
-                                        body=request)
+        resp = self._post_run(request)
+        worklist_id = self._worklist_id
 
         run_response = RunResponse()
         Marshal.deserialize(resp.text, run_response)
 
         resp = self._connection.execute('GET', f'atc/worklists/{worklist_id}',
                                         params={'includeExemptedFindings': 'false'},
-                                        accept='application/atc.worklist.v1+xml')
+                                        accept='application/atc.worklist.v1+xml', stream=True)
+
+        return (run_response, resp)
+
+    def run_for(self, obj_sets, max_verdicts=100):
+        """Executes checks for the given object sets"""
+
+        run_response, resp = self._run(obj_sets, max_verdicts)
 
         worklist = WorkList()
-        Marshal.deserialize(resp.text, worklist)
+        Marshal.deserialize_response(resp, worklist)
 
         return WorkListRunResult(run_response, worklist)
+
+    def stream_for(self, obj_sets, max_verdicts=100):
+        """Executes checks for the given object sets and returns the findings
+           as an iterator consuming the worklist as it is being downloaded.
+        """
+
+        run_response, resp = self._run(obj_sets, max_verdicts)
+
+        worklist = WorkList()
+        return WorkListRunStream(run_response, worklist, iter_worklist_response(resp, worklist))
+
+
+class ShardObject(NamedTuple):
+    """Repository object found in a package usable in
+       ADTObjectSets.include_object()
+    """
+
+    typ: str
+    name: str
+    full_adt_uri: str
+
+
+def package_objects(package):
+    """Returns the list of ShardObject of all objects in the package
+       hierarchy sorted by type and name.
+    """
+
+    objects = []
+    for _, _, package_objects_list in sap.adt.package.walk(package):
+        objects.extend(ShardObject(obj.typ, obj.name, obj.uri) for obj in package_objects_list)
+
+    objects.sort(key=lambda obj: (obj.typ, obj.name))
+
+    return objects
+
+
+class ShardedChecksRunner:
+    """ATC Checks runner executing every object set (shard) on its own
+       worklist in parallel.
+    """
+
+    def __init__(self, connection, variant, jobs=1, retries=DEFAULT_SHARD_RETRIES):
+        """:param connection: ADT Connection
+           :param variant: A string holding the executed variant name
+           :param jobs: Number of shards checked in parallel
+           :param retries: Number of repeated runs of a failed shard
+        """
+
+        self._connection = connection
+        self._variant = variant
+        self._jobs = jobs
+        self._retries = retries
+
+    def _run_shard(self, obj_sets, max_verdicts):
+        """Checks the shard on a new worklist and returns the worklist with
+           objects sorted by type and name.
+        """
+
+        attempt = 0
+        while True:
+            try:
+                checks = ChecksRunner(self._connection, self._variant)
+                worklist = checks.run_for(obj_sets, max_verdicts=max_verdicts).worklist
+                break
+            except (SAPCliError, requests.exceptions.RequestException) as ex:
+                if attempt >= self._retries:
+                    raise
+
+                attempt += 1
+                mod_log().warning('ATC shard run failed, retrying (%i/%i): %s', attempt, self._retries, str(ex))
+
+        if worklist.objects is not None:
+            worklist.objects.items.sort(key=lambda obj: (obj.object_type_id or '', obj.name or ''))
+
+        return worklist
+
+    def iter_worklists(self, shards, max_verdicts=100):
+        """Generator yielding worklists of the given ADTObjectSets in the same
+           order regardless of the order in which the parallel runs finish.
+        """
+
+        with ThreadPoolExecutor(max_workers=self._jobs) as executor:
+            yield from executor.map(lambda obj_sets: self._run_shard(obj_sets, max_verdicts), shards)
+
+    def run_for(self, shards, max_verdicts=100):
+        """Executes checks for the given ADTObjectSets and returns the merged
+           worklist.
+        """
+
+        return merge_worklists(list(self.iter_worklists(shards, max_verdicts=max_verdicts)))
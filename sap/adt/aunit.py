@@ -1,11 +1,44 @@
 """ABAP Unit Test framework ADT wrappers"""
 
+import os
+import time
+import hashlib
+import threading
 from typing import NamedTuple, List
 
-import xml.sax
 from xml.sax.handler import ContentHandler
+from concurrent.futures import ThreadPoolExecutor
 
-from sap import get_logger
+import requests
+
+from sap import get_logger, is_trace_enabled, TRACE
+from sap.adt.acoverage import ACoverage, Coverage
+from sap.adt.cache import CacheEntry
+import sap.adt.cts
+import sap.adt.objects
+import sap.adt.package
+import sap.adt.programs
+from sap.adt.core import parse_xml_response
+from sap.adt.xmlparser import parse_xml
+from sap.errors import SAPCliError
+
+
+DEFAULT_RUN_CHUNK_SIZE = 100
+
+DEFAULT_SHARD_RETRIES = 1
+
+# R3TR object types of transport requests which can contain tests
+CTS_TESTED_OBJECT_TYPES = {'CLAS': 'CLAS/OC', 'PROG': 'PROG/P'}
+
+# 1 day
+RESULTS_CACHE_TTL = 24 * 60 * 60
+
+RESULTS_MIME_TYPE = 'application/xml'
+
+AUNIT_RUNS_URI = 'abapunit/testruns'
+
+# run configurations built by AUnit.build_test_configuration() - newest first
+AUNIT_RUN_CONFIG_MIME_TYPES = ('application/vnd.sap.adt.abapunit.testruns.config.v4+xml',)
 
 
 def mod_log():
@@ -14,12 +47,59 @@ def mod_log():
     return get_logger()
 
 
+def chunked_objects(adt_objects, chunk_size=DEFAULT_RUN_CHUNK_SIZE):
+    """Splits the list of ADT objects into lists of at most chunk_size
+       objects.
+    """
+
+    if chunk_size < 1:
+        raise SAPCliError(f'The chunk size must be a positive number: {chunk_size}')
+
+    for start in range(0, len(adt_objects), chunk_size):
+        yield adt_objects[start:start + chunk_size]
+
+
 class AUnit:
     """ABAP Unit tests
     """
 
-    def __init__(self, connection):
+    def __init__(self, connection, results_cache=None):
+        """:param connection: ADT Connection
+           :param results_cache: RunResultsCache replaying the results of
+                                 passed runs of unchanged objects
+        """
+
         self._connection = connection
+        self._results_cache = results_cache
+        self._run_config_mime_type = None
+
+    @property
+    def run_configuration_mime_type(self):
+        """The newest run configuration MIME type accepted by the system
+
+           The discovery document is consulted only if the connection has
+           the cache directory because downloading it would cost more than
+           it saves; the newest known type is used otherwise.
+        """
+
+        if self._run_config_mime_type is not None:
+            return self._run_config_mime_type
+
+        mimetype = AUNIT_RUN_CONFIG_MIME_TYPES[0]
+
+        if self._connection.cache is not None:
+            discovery = self._connection.discovery
+            accepted = discovery.accepts(AUNIT_RUNS_URI)
+
+            if accepted:
+                mimetype = discovery.pick_accepted(AUNIT_RUNS_URI, AUNIT_RUN_CONFIG_MIME_TYPES)
+
+                if mimetype is None:
+                    raise SAPCliError(f'The system does not accept any supported AUnit run configuration: '
+                                      f'{", ".join(accepted)}')
+
+        self._run_config_mime_type = mimetype
+        return mimetype
 
     @staticmethod
     def build_tested_object_uri(connection, adt_object):
@@ -29,14 +109,22 @@ class AUnit:
         return '/' + connection.uri + '/' + adt_object.uri
 
     @staticmethod
-    def build_test_configuration(adt_object_uri):
-        """Build the AUnit ADT URI of the tested object.
+    def build_test_configuration(adt_object_uris, coverage=False):
+        """Build the AUnit ADT run configuration of the tested objects.
+
+           :param adt_object_uris: URI of the tested object or a list of URIs
+           :param coverage: True to measure code coverage
         """
 
-        test_config = '''<?xml version="1.0" encoding="UTF-8"?>
+        if isinstance(adt_object_uris, str):
+            adt_object_uris = [adt_object_uris]
+
+        coverage_active = 'true' if coverage else 'false'
+
+        test_config = f'''<?xml version="1.0" encoding="UTF-8"?>
 <aunit:runConfiguration xmlns:aunit="http://www.sap.com/adt/aunit">
   <external>
-    <coverage active="false"/>
+    <coverage active="{coverage_active}"/>
   </external>
   <options>
     <uriType value="semantic"/>
@@ -47,12 +135,12 @@ class AUnit:
   <adtcore:objectSets xmlns:adtcore="http://www.sap.com/adt/core">
     <objectSet kind="inclusive">
       <adtcore:objectReferences>
-        <adtcore:objectReference adtcore:uri="'''
+'''
 
-        test_config += adt_object_uri
+        for adt_object_uri in adt_object_uris:
+            test_config += f'        <adtcore:objectReference adtcore:uri="{adt_object_uri}"/>\n'
 
-        test_config += '''"/>
-      </adtcore:objectReferences>
+        test_config += '''      </adtcore:objectReferences>
     </objectSet>
   </adtcore:objectSets>
 </aunit:runConfiguration>'''
@@ -63,14 +151,72 @@ class AUnit:
         """Executes ABAP Unit tests on the given ADT object
         """
 
-        adt_object_uri = AUnit.build_tested_object_uri(self._connection, adt_object)
-        test_config = AUnit.build_test_configuration(adt_object_uri)
+        return self.execute_objects([adt_object])
+
+    def execute_objects(self, adt_objects, stream=False, coverage=False):
+        """Executes ABAP Unit tests on all the given ADT objects in a single
+           test run.
+
+           With stream=True, the results are not downloaded until read -
+           e.g. by parse_run_results_response().
+
+           With coverage=True, the results hold the coverage identifier
+           - see sap.adt.acoverage.ACoverage.
+        """
+
+        adt_object_uris = [AUnit.build_tested_object_uri(self._connection, adt_object)
+                           for adt_object in adt_objects]
+        test_config = AUnit.build_test_configuration(adt_object_uris, coverage=coverage)
 
         return self._connection.execute(
-            'POST', 'abapunit/testruns',
+            'POST', AUNIT_RUNS_URI,
             headers={
-                'Content-Type': 'application/vnd.sap.adt.abapunit.testruns.config.v4+xml'},
-            body=test_config)
+                'Content-Type': self.run_configuration_mime_type},
+            body=test_config,
+            stream=stream)
+
+    def execute_and_parse(self, adt_objects, consumer=None, coverage=False):
+        """Executes ABAP Unit tests on all the given ADT objects in a single
+           test run and parses the results only once - returns the pair
+           (response, RunResults).
+
+           With the consumer, the results are passed to it as they are
+           downloaded - see parse_run_results_response().
+
+           With the results cache, the tests are executed only if there are
+           no stored results of the objects with the same versions and the
+           results of runs without errors are stored - the results of cached
+           runs are downloaded before they are passed to the consumer.
+           Coverage runs are never cached.
+        """
+
+        key = None
+        if self._results_cache is not None and not coverage:
+            key = run_results_key(self._connection, adt_objects)
+
+        if key is not None:
+            aunit_xml = self._results_cache.load(key)
+            if aunit_xml is not None:
+                mod_log().info('Replaying cached AUnit results: %s', key)
+                entry = CacheEntry({'Content-Type': RESULTS_MIME_TYPE}, 'utf-8', aunit_xml.encode('utf-8'))
+                response = entry.to_response(f'/{self._connection.uri}/{AUNIT_RUNS_URI}')
+                return (response, _parse_results(response, consumer)[0])
+
+        response = self.execute_objects(adt_objects, stream=consumer is not None and key is None, coverage=coverage)
+        run_results, passed = _parse_results(response, consumer)
+
+        if key is not None and passed:
+            self._results_cache.save(key, response.text)
+
+        return (response, run_results)
+
+    def run(self, adt_objects, chunk_size=DEFAULT_RUN_CHUNK_SIZE, coverage=False):
+        """Executes ABAP Unit tests on the given ADT objects in test runs
+           of at most chunk_size objects and yields the responses.
+        """
+
+        for chunk in chunked_objects(adt_objects, chunk_size):
+            yield self.execute_objects(chunk, coverage=coverage)
 
 
 # pylint: disable=too-few-public-methods
@@ -79,6 +225,7 @@ class RunResults(NamedTuple):
 
     alerts: List
     programs: List
+    coverage_identifier: str = None
 
 
 # pylint: disable=too-few-public-methods
@@ -98,11 +245,36 @@ class TestClass(NamedTuple):
 
 
 # pylint: disable=too-few-public-methods
-class TestMethod(NamedTuple):
-    """ABAP Unit Tests Framework ADT results TestMethod node"""
+class _TestMethodFields(NamedTuple):
+    """Members of TestMethod"""
 
     name: str
     alerts: List
+    status: str
+
+
+class TestMethod(_TestMethodFields):
+    """ABAP Unit Tests Framework ADT results TestMethod node
+
+       If not given, the status is determined from the alerts.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, name, alerts, status=None):
+        if status is None:
+            status = test_method_status(alerts)
+
+        return super(TestMethod, cls).__new__(cls, name, alerts, status)
+
+
+class TestMethodStatus:
+    """Results of AUnit Test Methods"""
+
+    # pylint: disable=invalid-name
+    OK = 'OK'
+    SKIP = 'SKIP'
+    ERR = 'ERR'
 
 
 class AlertSeverity:
@@ -136,17 +308,39 @@ class Alert(NamedTuple):
         return self.severity == AlertSeverity.TOLERABLE
 
 
+def test_method_status(alerts):
+    """Returns TestMethodStatus of the test method with the given alerts"""
+
+    if any(alert.is_error for alert in alerts):
+        return TestMethodStatus.ERR
+
+    if any(alert.is_warning for alert in alerts):
+        return TestMethodStatus.SKIP
+
+    return TestMethodStatus.OK
+
+
 # pylint: disable=too-many-instance-attributes
 class AUnitResponseHandler(ContentHandler):
-    """ABAP Unit Test Framework ADT results XML parser"""
+    """ABAP Unit Test Framework ADT results XML parser
+
+       Without consumer, the results are stored in the member run_results.
+       Otherwise, the parsed nodes are passed to the consumer's methods and
+       are not kept:
+         - alert(alert) - an alert of the run or of a test class
+         - program(program) - a new program without test classes
+         - test_class(program, test_class) - a complete test class
+    """
 
-    def __init__(self):
+    def __init__(self, consumer=None):
         super(AUnitResponseHandler, self).__init__()
 
         self.run_results = RunResults(list(), list())
+        self._consumer = consumer
         self._program = None
         self._test_class = None
-        self._test_method = None
+        self._test_method_name = None
+        self._test_method_alerts = None
 
         self._alert_title = None
         self._alert_title_part = None
@@ -155,48 +349,62 @@ class AUnitResponseHandler(ContentHandler):
         self._alert_details = None
         self._alert_stack = None
 
+        self._trace = is_trace_enabled()
+
     def startElement(self, name, attrs):
-        mod_log().debug('XML: %s', name)
+        if self._trace:
+            mod_log().log(TRACE, 'XML: %s', name)
+
         if name == 'program':
             self._program = Program(name=attrs.get('adtcore:name'), test_classes=[])
-            self.run_results.programs.append(self._program)
-            mod_log().debug('XML: %s: %s', name, self._program.name)
+            if self._consumer is None:
+                self.run_results.programs.append(self._program)
+            else:
+                self._consumer.program(self._program)
         elif name == 'testClass':
             self._test_class = TestClass(name=attrs.get('adtcore:name'), test_methods=[])
-            self._program.test_classes.append(self._test_class)
-            mod_log().debug('XML: %s: %s', name, self._test_class.name)
         elif name == 'testMethod':
-            self._test_method = TestMethod(name=attrs.get('adtcore:name'), alerts=[])
-            self._test_class.test_methods.append(self._test_method)
-            mod_log().debug('XML: %s: %s', name, self._test_method.name)
+            self._test_method_name = attrs.get('adtcore:name')
+            self._test_method_alerts = []
         elif name == 'alert':
             self._alert_kind = attrs.get('kind')
             self._alert_severity = attrs.get('severity')
             self._alert_details = []
             self._alert_stack = []
-            mod_log().debug('XML: %s', name)
         elif name == 'title':
             self._alert_title_part = ''
         elif name == 'detail':
             self._alert_details.append(attrs.get('text'))
-            mod_log().debug('XML: %s: %s', name, self._alert_details[-1])
         elif name == 'stackEntry':
             self._alert_stack.append(attrs.get('adtcore:description'))
-            mod_log().debug('XML: %s: %s', name, self._alert_stack[-1])
+        elif name == 'coverage':
+            # external/coverage adtcore:uri=".../coverage/measurements/{identifier}"
+            coverage_uri = attrs.get('adtcore:uri', None)
+            if coverage_uri:
+                self.run_results = self.run_results._replace(coverage_identifier=coverage_uri.rsplit('/', 1)[-1])
 
     def characters(self, content):
         if self._alert_title_part is not None:
-            mod_log().debug('XML: alert title: %s', content)
             self._alert_title_part += content.strip()
 
     def endElement(self, name):
-        mod_log().debug('XML: %s: CLOSING', name)
+        if self._trace:
+            mod_log().log(TRACE, 'XML: %s: CLOSING', name)
+
         if name == 'program':
             self._program = None
-        elif name == 'testclas':
+        elif name == 'testClass':
+            if self._consumer is None:
+                self._program.test_classes.append(self._test_class)
+            else:
+                self._consumer.test_class(self._program, self._test_class)
+
             self._test_class = None
-        elif name == 'testmethod':
-            self._test_method = None
+        elif name == 'testMethod':
+            self._test_class.test_methods.append(TestMethod(self._test_method_name, self._test_method_alerts,
+                                                            test_method_status(self._test_method_alerts)))
+            self._test_method_name = None
+            self._test_method_alerts = None
         elif name == 'title':
             self._alert_title = self._alert_title_part
             self._alert_title_part = None
@@ -205,10 +413,12 @@ class AUnitResponseHandler(ContentHandler):
                           self._alert_title, self._alert_details,
                           self._alert_stack)
 
-            if self._test_method is not None:
-                self._test_method.alerts.append(alert)
-            else:
+            if self._test_method_alerts is not None:
+                self._test_method_alerts.append(alert)
+            elif self._consumer is None:
                 self.run_results.alerts.append(alert)
+            else:
+                self._consumer.alert(alert)
 
             self._alert_title = None
             self._alert_severity = None
@@ -221,6 +431,369 @@ def parse_run_results(aunit_results_xml):
     """Converts XML results into Python representation"""
 
     xml_handler = AUnitResponseHandler()
-    xml.sax.parseString(aunit_results_xml, xml_handler)
+    parse_xml(aunit_results_xml, xml_handler)
 
     return xml_handler.run_results
+
+
+def parse_run_results_response(response, consumer):
+    """Passes the results parsed from the response of a test run executed
+       with stream=True to the consumer - see AUnitResponseHandler - and
+       returns RunResults without programs and alerts.
+    """
+
+    return parse_xml_response(response, AUnitResponseHandler(consumer=consumer)).run_results
+
+
+def feed_run_results(run_results, consumer):
+    """Passes the alerts, programs and test classes of RunResults to the
+       consumer in the same order as AUnitResponseHandler.
+    """
+
+    for alert in run_results.alerts:
+        consumer.alert(alert)
+
+    for program in run_results.programs:
+        consumer.program(program)
+
+        for test_class in program.test_classes:
+            consumer.test_class(program, test_class)
+
+
+def merge_run_results(run_results):
+    """Merges the results of several test runs into a single RunResults
+       where programs of the same name are joined and the run alerts
+       reported by more runs are listed only once.
+    """
+
+    if len(run_results) == 1:
+        return run_results[0]
+
+    merged = RunResults(list(), list())
+    programs = {}
+    alerts = set()
+
+    for results in run_results:
+        for alert in results.alerts:
+            alert_key = (alert.kind, alert.severity, alert.title)
+            if alert_key in alerts:
+                continue
+
+            alerts.add(alert_key)
+            merged.alerts.append(alert)
+
+        for program in results.programs:
+            known = programs.get(program.name, None)
+            if known is None:
+                known = Program(name=program.name, test_classes=[])
+                programs[program.name] = known
+                merged.programs.append(known)
+
+            known_classes = set(test_class.name for test_class in known.test_classes)
+            known.test_classes.extend(test_class for test_class in program.test_classes
+                                      if test_class.name not in known_classes)
+
+    return merged
+
+
+def run_results_passed(run_results):
+    """Returns True if no alert of the results is an error"""
+
+    if any(alert.is_error for alert in run_results.alerts):
+        return False
+
+    return all(test_method.status != TestMethodStatus.ERR
+               for program in run_results.programs
+               for test_class in program.test_classes
+               for test_method in test_class.test_methods)
+
+
+class _PassedRunConsumer:
+    """Consumer of parsed results passing them to another consumer and
+       remembering whether the run passed - see run_results_passed().
+    """
+
+    def __init__(self, consumer):
+        self._consumer = consumer
+        self.passed = True
+
+    def alert(self, alert):
+        """Run or test class alert"""
+
+        self.passed = self.passed and not alert.is_error
+        self._consumer.alert(alert)
+
+    def program(self, program):
+        """New program"""
+
+        self._consumer.program(program)
+
+    def test_class(self, program, test_class):
+        """Complete test class"""
+
+        self.passed = self.passed and all(test_method.status != TestMethodStatus.ERR
+                                          for test_method in test_class.test_methods)
+        self._consumer.test_class(program, test_class)
+
+
+def _parse_results(response, consumer):
+    """Returns the pair (RunResults, passed) of the test run response -
+       the results are passed to the consumer if given.
+    """
+
+    if consumer is None:
+        run_results = parse_run_results(response.text)
+        return (run_results, run_results_passed(run_results))
+
+    passed_consumer = _PassedRunConsumer(consumer)
+    return (parse_run_results_response(response, passed_consumer), passed_consumer.passed)
+
+
+class ChangedAtXMLHandler(ContentHandler):
+    """Collects the time stamps of the last changes of an object and its
+       class includes from the object's metadata.
+    """
+
+    def __init__(self):
+        super(ChangedAtXMLHandler, self).__init__()
+
+        self.timestamps = []
+
+    def startElement(self, name, attrs):
+        changed_at = attrs.get('adtcore:changedAt', None)
+        if changed_at is not None:
+            self.timestamps.append(f'{attrs.get("class:includeType", name)}={changed_at}')
+
+
+def object_version(adt_object):
+    """Returns the version of the object - the ETag of its metadata or
+       the time stamps of the last changes of the object and its includes -
+       or None if it is not known.
+
+       Packages have no version because the listings of their hierarchies
+       do not carry the time stamps of the objects.
+    """
+
+    if isinstance(adt_object, sap.adt.package.Package):
+        return None
+
+    try:
+        response = adt_object.connection.execute('GET', adt_object.uri)
+    except SAPCliError as ex:
+        # e.g. ExceptionResourceNotFound - the test run reports the error
+        mod_log().info('The version of %s is not known: %s', adt_object.uri, str(ex))
+        return None
+
+    etag = response.headers.get('ETag', None)
+    if etag:
+        return etag
+
+    return ' '.join(parse_xml(response.text, ChangedAtXMLHandler()).timestamps) or None
+
+
+def run_results_key(connection, adt_objects):
+    """Returns the cache key of the test run of the objects built from
+       the connected system and the objects with their versions or None
+       if the version of any object is not known.
+    """
+
+    parts = []
+    for adt_object in adt_objects:
+        version = object_version(adt_object)
+        if version is None:
+            return None
+
+        parts.append(f'{adt_object.uri} {version}')
+
+    parts.sort()
+    parts.insert(0, connection.system_key)
+
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+class RunResultsCache:
+    """AUnit results XML stored in a directory where each test run has its
+       own file named by its key; the files expire after the configured
+       time.
+    """
+
+    def __init__(self, directory, ttl=RESULTS_CACHE_TTL):
+        self._directory = directory
+        self._ttl = ttl
+
+    def _path(self, key):
+        return os.path.join(self._directory, f'aunit-{key}.xml')
+
+    def load(self, key):
+        """Returns the cached results XML or None if missing or expired"""
+
+        path = self._path(key)
+
+        try:
+            if time.time() - os.path.getmtime(path) > self._ttl:
+                os.remove(path)
+                return None
+
+            with open(path, 'r', encoding='utf-8') as source:
+                return source.read()
+        except FileNotFoundError:
+            return None
+
+    def save(self, key, aunit_xml):
+        """Stores the results XML"""
+
+        if not os.path.isdir(self._directory):
+            os.makedirs(self._directory, exist_ok=True)
+
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}'
+
+        with open(tmp_path, 'w', encoding='utf-8') as dest:
+            dest.write(aunit_xml)
+
+        os.replace(tmp_path, path)
+
+
+def run_results_cache(connection):
+    """Returns RunResultsCache stored in the directory of the connection's
+       response cache or None if the connection has no cache.
+    """
+
+    if connection.cache is None:
+        return None
+
+    return RunResultsCache(connection.cache.directory)
+
+
+def fetch_coverage(connection, coverage_identifier, adt_objects):
+    """Returns sap.adt.acoverage.Coverage of the tested objects"""
+
+    adt_object_uris = [AUnit.build_tested_object_uri(connection, adt_object) for adt_object in adt_objects]
+
+    return ACoverage(connection).fetch(coverage_identifier, adt_object_uris)
+
+
+def tested_objects(connection, objects):
+    """Returns the list of classes and programs for the pairs (type, name)
+       where type is ADT object type code (CLAS/OC, PROG/P) sorted by type
+       and name; the objects of other types are ignored.
+    """
+
+    tested_types = {'CLAS/OC': sap.adt.objects.Class, 'PROG/P': sap.adt.programs.Program}
+
+    return [tested_types[typ](connection, name) for typ, name in sorted(set(objects)) if typ in tested_types]
+
+
+def package_tested_objects(package):
+    """Returns the list of classes and programs of the package hierarchy
+       which can contain ABAP Unit tests sorted by type and name.
+    """
+
+    objects = []
+    for _, _, package_objects in sap.adt.package.walk(package):
+        objects.extend((obj.typ, obj.name) for obj in package_objects)
+
+    return tested_objects(package.connection, objects)
+
+
+def transport_tested_objects(connection, number):
+    """Returns the list of classes and programs recorded in the transport
+       request or task of the connected user sorted by type and name.
+    """
+
+    tasks = None
+    for transport in sap.adt.cts.Workbench(connection).get_transport_requests():
+        if transport.number == number:
+            tasks = transport.tasks
+            break
+
+        tasks = [task for task in transport.tasks if task.number == number] or None
+        if tasks is not None:
+            break
+
+    if tasks is None:
+        raise SAPCliError(f'Transport request not found: {number}')
+
+    objects = []
+    for task in tasks:
+        for cts_object in task.objects:
+            main_object = cts_object.main_object
+            if main_object is None or main_object[0] not in CTS_TESTED_OBJECT_TYPES:
+                mod_log().debug('Not a tested object: %s %s %s', cts_object.pgmid, cts_object.type, cts_object.name)
+                continue
+
+            objects.append((CTS_TESTED_OBJECT_TYPES[main_object[0]], main_object[1]))
+
+    return tested_objects(connection, objects)
+
+
+# pylint: disable=too-few-public-methods
+class ShardRun(NamedTuple):
+    """Results of a test run of one shard"""
+
+    aunit_xml: str
+    run_results: RunResults
+    coverage: Coverage = None
+
+
+class ShardedAUnit:
+    """ABAP Unit tests runner executing every list of objects (shard) in its
+       own test run in parallel.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, connection, jobs=1, retries=DEFAULT_SHARD_RETRIES, coverage=False, results_cache=None):
+        """:param connection: ADT Connection
+           :param jobs: Number of shards tested in parallel
+           :param retries: Number of repeated runs of a failed shard
+           :param coverage: True to measure and fetch code coverage
+           :param results_cache: RunResultsCache of passed shards
+        """
+
+        self._connection = connection
+        self._results_cache = results_cache
+        self._jobs = jobs
+        self._retries = retries
+        self._coverage = coverage
+
+    def _run_shard(self, adt_objects):
+        """Tests the shard and returns ShardRun with programs sorted by
+           name.
+        """
+
+        attempt = 0
+        while True:
+            try:
+                response, run_results = AUnit(self._connection, results_cache=self._results_cache).execute_and_parse(
+                    adt_objects, coverage=self._coverage)
+                break
+            except (SAPCliError, requests.exceptions.RequestException) as ex:
+                if attempt >= self._retries:
+                    raise
+
+                attempt += 1
+                mod_log().warning('AUnit shard run failed, retrying (%i/%i): %s', attempt, self._retries, str(ex))
+
+        run_results.programs.sort(key=lambda program: program.name or '')
+
+        coverage = None
+        if self._coverage and run_results.coverage_identifier is not None:
+            coverage = fetch_coverage(self._connection, run_results.coverage_identifier, adt_objects)
+
+        return ShardRun(response.text, run_results, coverage)
+
+    def iter_runs(self, shards):
+        """Generator yielding ShardRun of the given lists of objects in
+           the same order regardless of the order in which the parallel runs
+           finish.
+        """
+
+        with ThreadPoolExecutor(max_workers=self._jobs) as executor:
+            yield from executor.map(self._run_shard, shards)
+
+    def run(self, shards):
+        """Executes tests of the given lists of objects and returns the merged
+           RunResults.
+        """
+
+        return merge_run_results([shard_run.run_results for shard_run in self.iter_runs(shards)])
@@ -0,0 +1,212 @@
+"""Persistent cache of ADT HTTP responses validated by ETag and Last-Modified"""
+
+import os
+import json
+import hashlib
+import threading
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from sap import get_logger
+
+
+# 512 MiB
+DEFAULT_CACHE_MAX_SIZE = 512 * 1024 * 1024
+
+CACHE_ENTRY_SUFFIX = '.entry'
+
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+def mod_log():
+    """ADT Module logger"""
+
+    return get_logger()
+
+
+class CacheEntry:
+    """Cached response body together with its validators"""
+
+    def __init__(self, headers, encoding, content):
+        self.headers = headers
+        self.encoding = encoding
+        self.content = content
+
+    @property
+    def validators(self):
+        """Returns HTTP headers making the request conditional"""
+
+        conditions = {}
+
+        etag = self.headers.get('ETag', None)
+        if etag is not None:
+            conditions['If-None-Match'] = etag
+
+        last_modified = self.headers.get('Last-Modified', None)
+        if last_modified is not None:
+            conditions['If-Modified-Since'] = last_modified
+
+        return conditions
+
+    def to_response(self, url):
+        """Builds a response object from the cached data"""
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.encoding = self.encoding
+        # pylint: disable=protected-access
+        response._content = self.content
+        # iter_content() yields the content instead of reading the socket
+        response._content_consumed = True
+
+        return response
+
+
+class ResponseCache:
+    """Directory of cached responses where each response is stored in its own
+       file and the least recently used files are removed when the total size
+       of the files exceeds the configured limit.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_CACHE_MAX_SIZE):
+        """Parameters:
+            - directory: path to the cache directory; created if missing
+            - max_size: maximum total size of cached files in bytes
+        """
+
+        self._directory = directory
+        self._max_size = max_size
+        self._size = None
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self):
+        """Cache directory"""
+
+        return self._directory
+
+    @staticmethod
+    def key(url, params=None, accept=None):
+        """Returns the cache key for the request"""
+
+        parts = [url]
+
+        if params:
+            parts.extend(f'{name}={value}' for name, value in sorted(params.items()))
+
+        parts.append(accept or '')
+
+        return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self._directory, key + CACHE_ENTRY_SUFFIX)
+
+    def _entries(self):
+        """Returns the list of tuples (path, size, mtime) of all cached files"""
+
+        entries = []
+
+        for filename in os.listdir(self._directory):
+            if not filename.endswith(CACHE_ENTRY_SUFFIX):
+                continue
+
+            path = os.path.join(self._directory, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+
+            entries.append((path, stat.st_size, stat.st_mtime))
+
+        return entries
+
+    def get(self, key):
+        """Returns the cached entry or None"""
+
+        path = self._path(key)
+
+        try:
+            with open(path, 'rb') as source:
+                metadata = json.loads(source.readline().decode('utf-8'))
+                content = source.read()
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            mod_log().info('Ignoring corrupted cache entry: %s', path)
+            return None
+
+        return CacheEntry(metadata['headers'], metadata['encoding'], content)
+
+    def touch(self, key):
+        """Marks the entry as recently used"""
+
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def put(self, key, response):
+        """Stores the response if it has a validator and returns True if the
+           response was stored.
+        """
+
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        if 'ETag' not in headers and 'Last-Modified' not in headers:
+            return False
+
+        metadata = json.dumps({'headers': headers, 'encoding': response.encoding})
+        content = response.content
+
+        if not os.path.isdir(self._directory):
+            os.makedirs(self._directory, exist_ok=True)
+
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}'
+
+        with open(tmp_path, 'wb') as dest:
+            dest.write(metadata.encode('utf-8'))
+            dest.write(b'\n')
+            dest.write(content)
+
+        size = os.path.getsize(tmp_path)
+
+        with self._lock:
+            try:
+                replaced = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced = 0
+
+            os.replace(tmp_path, path)
+
+            if self._size is None:
+                self._size = sum(entry[1] for entry in self._entries())
+            else:
+                self._size += size - replaced
+
+            if self._size > self._max_size:
+                self._evict()
+
+        return True
+
+    def _evict(self):
+        """Removes the least recently used entries until the total size
+           drops below the limit.
+        """
+
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self._size = sum(entry[1] for entry in entries)
+
+        for path, size, _ in entries:
+            if self._size <= self._max_size:
+                break
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+            mod_log().debug('Evicted cache entry: %s', path)
+            self._size -= size
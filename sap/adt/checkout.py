@@ -0,0 +1,139 @@
+"""Records of ADT objects checked out to a repository directory"""
+
+import os
+import json
+import hashlib
+import threading
+
+
+CHECKOUT_MANIFEST_FILE = '.sapcli-manifest.json'
+
+
+def hash_file(filename):
+    """Returns SHA-256 hex digest of the file contents"""
+
+    digest = hashlib.sha256()
+
+    with open(filename, 'rb') as source:
+        for chunk in iter(lambda: source.read(65536), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class CheckoutManifest:
+    """Records of checked out objects which allows us to skip downloading
+       sources of objects that have not been changed since the last checkout.
+
+       Each record holds the object type, name, version, the time stamp of
+       the last change and content hashes of the written files.
+    """
+
+    def __init__(self, repo_dir, objects=None):
+        self._repo_dir = repo_dir
+        self._objects = objects if objects is not None else {}
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        """Path to the manifest file"""
+
+        return os.path.join(self._repo_dir, CHECKOUT_MANIFEST_FILE)
+
+    @staticmethod
+    def load(repo_dir, force=False):
+        """Reads the manifest from the repository directory or returns
+           an empty manifest if the directory does not have any.
+
+           With force, the recorded objects are ignored so all objects are
+           downloaded and recorded again.
+        """
+
+        path = os.path.join(repo_dir, CHECKOUT_MANIFEST_FILE)
+        objects = None
+
+        if not force and os.path.isfile(path):
+            with open(path, 'r', encoding='utf-8') as source:
+                objects = json.load(source).get('objects', {})
+
+        return CheckoutManifest(repo_dir, objects)
+
+    def save(self):
+        """Writes the manifest to the repository directory"""
+
+        with self._lock:
+            contents = json.dumps({'objects': self._objects}, indent=1, sort_keys=True)
+
+        with open(self.path, 'w', encoding='utf-8') as dest:
+            dest.write(contents)
+
+    @staticmethod
+    def _key(adt_object):
+        return f'{adt_object.objtype.code} {adt_object.name}'
+
+    def _directory(self, destdir):
+        return os.path.relpath(os.path.abspath(destdir or os.curdir), self._repo_dir)
+
+    def is_up_to_date(self, adt_object, destdir):
+        """Returns True if the fetched object has the same version and time
+           stamp as the recorded one and all its files in destdir are
+           unmodified.
+        """
+
+        if adt_object.changed_at is None:
+            return False
+
+        with self._lock:
+            record = self._objects.get(CheckoutManifest._key(adt_object), None)
+
+        if record is None:
+            return False
+
+        if (record['version'], record['changed_at'], record['directory']) != \
+           (adt_object.active, adt_object.changed_at, self._directory(destdir)):
+            return False
+
+        return self._files_unmodified(record)
+
+    def _files_unmodified(self, record):
+        for filename, digest in record['files'].items():
+            path = os.path.join(self._repo_dir, record['directory'], filename)
+            if not os.path.isfile(path) or hash_file(path) != digest:
+                return False
+
+        return True
+
+    def changed_objects(self):
+        """Returns the sorted list of pairs (type, name) of the recorded
+           objects whose files were modified or removed since the checkout.
+        """
+
+        with self._lock:
+            records = list(self._objects.values())
+
+        return sorted((record['type'], record['name']) for record in records if not self._files_unmodified(record))
+
+    def checkout(self, adt_object, destdir, download):
+        """Calls download() returning the list of written files unless
+           the object is up to date and records the files.
+        """
+
+        if self.is_up_to_date(adt_object, destdir):
+            return
+
+        self.record(adt_object, download())
+
+    def record(self, adt_object, filenames):
+        """Stores metadata of the given object and hashes of its files"""
+
+        record = {
+            'type': adt_object.objtype.code,
+            'name': adt_object.name,
+            'version': adt_object.active,
+            'changed_at': adt_object.changed_at,
+            'directory': self._directory(os.path.dirname(filenames[0])),
+            'files': {os.path.basename(filename): hash_file(filename) for filename in filenames}
+        }
+
+        with self._lock:
+            self._objects[CheckoutManifest._key(adt_object)] = record
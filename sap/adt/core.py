@@ -1,11 +1,43 @@
 """Base ADT functionality module"""
 
 import os
+import gzip
+import time
+import socket
+import logging
+import threading
+
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
+from urllib3.connection import HTTPConnection
 
 from sap import get_logger
-from sap.adt.errors import HTTPRequestError, new_adt_error_from_xml, UnexpectedResponseContent
+from sap.errors import SAPCliError
+from sap.adt.errors import ADTError, HTTPRequestError, new_adt_error_from_xml, UnexpectedResponseContent
+from sap.adt.discovery import DiscoveryCache, fetch_discovery
+from sap.adt.xmlparser import new_xml_parser
+
+
+# Retrieve CSRF token via HEAD core/discovery - no response body
+CSRF_FETCH_HEAD = 'head'
+# Retrieve CSRF token via GET core/discovery - downloads the whole document
+CSRF_FETCH_DISCOVERY = 'discovery'
+
+CSRF_FETCH_STRATEGIES = (CSRF_FETCH_HEAD, CSRF_FETCH_DISCOVERY)
+
+# Maximum number of kept-alive HTTP connections - should not be lower than
+# the number of threads sharing the connection
+DEFAULT_POOL_MAXSIZE = 10
+
+# Request bodies of this and larger size are compressed if enabled
+REQUEST_COMPRESSION_THRESHOLD = 64 * 1024
+
+# Size of blocks of streamed responses passed to XML parsers
+RESPONSE_CHUNK_SIZE = 64 * 1024
+
+# Maximum number of response bytes written to debug log
+DEBUG_RESPONSE_LIMIT = 4 * 1024
 
 
 def mod_log():
@@ -14,12 +46,162 @@ def mod_log():
     return get_logger()
 
 
+def is_csrf_token_failure(response):
+    """Returns True if the response reports invalid CSRF token"""
+
+    return response.status_code == 403 and response.headers.get('x-csrf-token', '').lower() == 'required'
+
+
+def iter_xml_response(response, xml_handler):
+    """Generator feeding the response body to the SAX handler block by block
+       and yielding the handler after every block to let the caller consume
+       the data parsed so far.
+
+       Responses of requests executed with stream=True are parsed as their
+       bytes arrive without holding the whole document in memory.
+    """
+
+    parser = new_xml_parser(xml_handler)
+
+    try:
+        for chunk in response.iter_content(RESPONSE_CHUNK_SIZE):
+            parser.feed(chunk)
+            yield xml_handler
+    finally:
+        response.close()
+
+    parser.close()
+
+    yield xml_handler
+
+
+def parse_xml_response(response, xml_handler):
+    """Feeds the whole response body to the SAX handler - see
+       iter_xml_response().
+    """
+
+    for _ in iter_xml_response(response, xml_handler):
+        pass
+
+    return xml_handler
+
+
+def _truncated_text(res):
+    """Returns the beginning of the response body for logging"""
+
+    content = res.content
+    text = content[:DEBUG_RESPONSE_LIMIT].decode(res.encoding or 'utf-8', errors='replace')
+
+    if len(content) > DEBUG_RESPONSE_LIMIT:
+        text += f'\n... truncated {len(content) - DEBUG_RESPONSE_LIMIT} bytes'
+
+    return text
+
+
+class TransferStats:
+    """Bytes received by a connection - as transferred over the network and
+       after decompression. Streamed responses are not accounted because
+       they are read by the caller.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.compressed = 0
+        self.uncompressed = 0
+        self._lock = threading.Lock()
+
+    def add(self, compressed, uncompressed):
+        """Records a response"""
+
+        with self._lock:
+            self.requests += 1
+            self.compressed += compressed
+            self.uncompressed += uncompressed
+
+    @property
+    def saved(self):
+        """Number of bytes not transferred thanks to compression"""
+
+        return self.uncompressed - self.compressed
+
+
+class KeepAliveHTTPAdapter(HTTPAdapter):
+    """HTTP adapter enabling TCP keep-alive on pooled connections to prevent
+       firewalls from dropping idle connections between requests.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs.setdefault('socket_options',
+                          HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)])
+
+        super(KeepAliveHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+
+
+# pylint: disable=too-few-public-methods
+class ConnectionOptions:
+    """HTTP transport settings of Connection"""
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, cache=None, session_store=None, csrf_fetch=None, pool_maxsize=None, pool_block=True,
+                 compress_requests=None):
+        """Parameters:
+            - cache: sap.adt.cache.ResponseCache for conditional GET requests
+            - session_store: sap.adt.session.SessionStore for reusing cookies
+                             and CSRF token of previous connections
+            - csrf_fetch: CSRF token retrieval strategy - one of
+                          CSRF_FETCH_STRATEGIES (default taken from the
+                          environment variable SAPCLI_CSRF_FETCH or 'head')
+            - pool_maxsize: maximum number of kept-alive HTTP connections
+                            (default taken from the environment variable
+                            SAPCLI_HTTP_POOL_SIZE or DEFAULT_POOL_MAXSIZE)
+            - pool_block: boolean - True to make threads wait for a free
+                          connection when all are in use instead of opening
+                          new connections which are closed after use
+            - compress_requests: boolean - True to gzip PUT bodies larger
+                                 than REQUEST_COMPRESSION_THRESHOLD (default
+                                 True if the environment variable
+                                 SAPCLI_HTTP_COMPRESS_REQUESTS is 'true');
+                                 turned off if the server rejects them
+        """
+
+        if csrf_fetch is None:
+            csrf_fetch = os.environ.get('SAPCLI_CSRF_FETCH', CSRF_FETCH_HEAD)
+
+        if csrf_fetch not in CSRF_FETCH_STRATEGIES:
+            raise SAPCliError(f'Unknown CSRF token fetch strategy: {csrf_fetch}')
+
+        if pool_maxsize is None:
+            try:
+                pool_maxsize = int(os.environ.get('SAPCLI_HTTP_POOL_SIZE', DEFAULT_POOL_MAXSIZE))
+            except ValueError as ex:
+                raise SAPCliError(f'Invalid HTTP pool size: {os.environ["SAPCLI_HTTP_POOL_SIZE"]}') from ex
+
+        if pool_maxsize < 1:
+            raise SAPCliError(f'Invalid HTTP pool size: {pool_maxsize}')
+
+        if compress_requests is None:
+            compress_requests = os.environ.get('SAPCLI_HTTP_COMPRESS_REQUESTS', 'false').lower() in ('true', 'yes')
+
+        self.cache = cache
+        self.session_store = session_store
+        self.csrf_fetch = csrf_fetch
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.compress_requests = compress_requests
+
+
+# the baseline attributes plus the settings and the state shared by threads
+# pylint: disable=too-many-instance-attributes
 class Connection:
     """ADT Connection for HTTP communication built on top Python requests.
+
+       The connection can be shared by several threads: the HTTP session is
+       initialized only once and CSRF token is refreshed only once when it
+       expires.
     """
 
     # pylint: disable=too-many-arguments
-    def __init__(self, host, client, user, password, port=None, ssl=True, verify=True):
+    def __init__(self, host, client, user, password, port=None, ssl=True, verify=True, options=None):
         """Parameters:
             - host: string host name
             - client: string SAP client
@@ -29,6 +211,7 @@ class Connection:
                     (default 80 or 443 - it depends on the parameter ssl)
             - ssl: boolean to switch between http and https
             - verify: boolean to switch SSL validation on/off
+            - options: ConnectionOptions (default from the environment)
         """
 
         if ssl:
@@ -50,6 +233,12 @@ class Connection:
         self._auth = HTTPBasicAuth(user, password)
         self._session = None
 
+        self._options = options if options is not None else ConnectionOptions()
+        self._discovery = None
+        # guards session initialization and CSRF token refresh
+        self._session_lock = threading.RLock()
+        self._transfer_stats = TransferStats()
+
     @property
     def user(self):
         """Connected user"""
@@ -62,6 +251,48 @@ class Connection:
 
         return self._adt_uri
 
+    @property
+    def system_key(self):
+        """Identifies the connected system and client in persistent caches"""
+
+        return f'{self._base_url}?{self._query_args}'
+
+    @property
+    def options(self):
+        """HTTP transport settings - ConnectionOptions"""
+
+        return self._options
+
+    @property
+    def cache(self):
+        """sap.adt.cache.ResponseCache or None"""
+
+        return self._options.cache
+
+    @property
+    def transfer_stats(self):
+        """Bytes received by this connection - TransferStats"""
+
+        return self._transfer_stats
+
+    @property
+    def discovery(self):
+        """Capabilities of the connected system - sap.adt.discovery.Discovery
+
+           The discovery document is downloaded on the first access only.
+           If the connection has a response cache, the parsed document is
+           stored in the cache directory and reused until it expires.
+        """
+
+        if self._discovery is None:
+            cache = None
+            if self._options.cache is not None:
+                cache = DiscoveryCache(self._options.cache.directory)
+
+            self._discovery = fetch_discovery(self, cache=cache, cache_key=self.system_key)
+
+        return self._discovery
+
     def _build_adt_url(self, adt_uri):
         """Creates complete URL from a fragment of ADT URI
            where the fragment usually refers to an ADT object
@@ -79,68 +310,247 @@ class Connection:
             error = new_adt_error_from_xml(res.text)
 
             if error is not None:
+                error.response = res
                 raise error
 
         # else - unformatted text
         raise HTTPRequestError(req, res)
 
-    # pylint: disable=no-self-use
-    def _retrieve(self, session, method, url, params=None, headers=None, body=None):
+    # pylint: disable=no-self-use,too-many-arguments
+    def _retrieve(self, session, method, url, params=None, headers=None, body=None, stream=False):
         """A helper method for easier testing."""
 
         req = requests.Request(method.upper(), url, params=params, data=body, headers=headers)
         req = session.prepare_request(req)
 
         mod_log().info('Executing %s %s', method, url)
-        res = session.send(req)
+        res = session.send(req, stream=stream)
+
+        if stream:
+            mod_log().info('Streaming response %s %s (%s)', method, url,
+                           res.headers.get('Content-Encoding', 'identity'))
+            return (req, res)
 
-        mod_log().debug('Response %s %s:\n++++\n%s\n++++', method, url, res.text)
+        self._record_transfer(method, url, res)
+
+        if mod_log().isEnabledFor(logging.DEBUG):
+            mod_log().debug('Response %s %s:\n++++\n%s\n++++', method, url, _truncated_text(res))
 
         return (req, res)
 
-    def _execute_with_session(self, session, method, url, params=None, headers=None, body=None):
+    def _record_transfer(self, method, url, res):
+        """Accounts the received bytes of the response"""
+
+        uncompressed = len(res.content)
+
+        try:
+            # urllib3 counts the bytes read from the socket before decoding
+            compressed = res.raw.tell()
+        except (AttributeError, OSError):
+            compressed = uncompressed
+
+        self._transfer_stats.add(compressed, uncompressed)
+
+        mod_log().info('Received %s %s: %d bytes, %d uncompressed (%s)', method, url, compressed, uncompressed,
+                       res.headers.get('Content-Encoding', 'identity'))
+
+    # pylint: disable=too-many-arguments
+    def _execute_with_session(self, session, method, url, params=None, headers=None, body=None, stream=False):
         """Executes the given URL using the given method in
            the common HTTP session.
         """
 
-        req, res = self._retrieve(session, method, url, params=params, headers=headers, body=body)
+        # the token sent in the request - the session header can be replaced
+        # by another thread while waiting for the response
+        csrf_token = session.headers.get('x-csrf-token', None)
+
+        req, res = self._retrieve(session, method, url, params=params, headers=headers, body=body, stream=stream)
+
+        if is_csrf_token_failure(res) and csrf_token is not None:
+            if stream:
+                # return the unread connection to the pool
+                res.close()
+
+            with self._session_lock:
+                # another thread might have already refreshed the token
+                if session.headers.get('x-csrf-token', None) == csrf_token:
+                    mod_log().info('CSRF token validation failed: fetching a new token')
+                    self._fetch_csrf_token(session)
+
+            req, res = self._retrieve(session, method, url, params=params, headers=headers, body=body,
+                                      stream=stream)
 
         if res.status_code >= 400:
             Connection._handle_http_error(req, res)
 
         return res
 
+    @property
+    def _session_key(self):
+        """Identifies stored sessions"""
+
+        return f'{self._base_url}?{self._query_args}&user={self._user}'
+
+    def _fetch_csrf_token(self, session):
+        """Retrieves a new CSRF token, which also populates the session's
+           cookies, and stores the session if configured.
+
+           The request header x-csrf-token overrides the session header
+           so the current token stays usable for other threads until
+           the new one is fetched.
+        """
+
+        url = self._build_adt_url('core/discovery')
+        started = time.perf_counter()
+
+        csrf_token = None
+        if self._options.csrf_fetch == CSRF_FETCH_HEAD:
+            try:
+                response = self._execute_with_session(session, 'HEAD', url, headers={'x-csrf-token': 'Fetch'})
+                csrf_token = response.headers.get('x-csrf-token', None)
+            except HTTPRequestError as ex:
+                mod_log().info('HEAD %s failed: %s', url, ex.response.status_code)
+
+            if csrf_token is None:
+                mod_log().info('CSRF token not returned for HEAD - falling back to GET')
+
+        if csrf_token is None:
+            response = self._execute_with_session(session, 'GET', url, headers={'x-csrf-token': 'Fetch'})
+            csrf_token = response.headers['x-csrf-token']
+
+        mod_log().info('CSRF token fetched in %.3f s', time.perf_counter() - started)
+
+        session.headers['x-csrf-token'] = csrf_token
+
+        if self._options.session_store is not None:
+            self._options.session_store.save(self._session_key, session, csrf_token)
+
+    def _new_session(self):
+        """Creates and initializes a new HTTP session"""
+
+        session = requests.Session()
+        session.auth = self._auth
+
+        adapter = KeepAliveHTTPAdapter(pool_maxsize=self._options.pool_maxsize, pool_block=self._options.pool_block)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        # requests.session.verify is either boolean or path to CA to use!
+        session.verify = os.environ.get('SAP_SSL_SERVER_CERT', session.verify)
+
+        if session.verify is not True:
+            mod_log().info('Using custom SSL Server cert path: SAP_SSL_SERVER_CERT = %s', session.verify)
+        elif self._ssl_verify is False:
+            import urllib3
+            urllib3.disable_warnings()
+            mod_log().info('SSL Server cert will not be verified: SAP_SSL_VERIFY = no')
+            session.verify = False
+
+        csrf_token = None
+        if self._options.session_store is not None:
+            csrf_token = self._options.session_store.load(self._session_key, session)
+
+        if csrf_token is None:
+            self._fetch_csrf_token(session)
+        else:
+            mod_log().info('Reusing stored session: %s', self._options.session_store.path)
+            session.headers['x-csrf-token'] = csrf_token
+
+        return session
+
     def _get_session(self):
         """Returns the working HTTP session.
            The session's cookies are populated by executing a dummy GET which
-           also retrieves X-CSRF-Token.
+           also retrieves X-CSRF-Token or loaded from the session store.
+
+           The session is published only when fully initialized, hence
+           concurrent callers wait for the first one to finish.
         """
 
         if self._session is None:
-            self._session = requests.Session()
-            self._session.auth = self._auth
-            # requests.session.verify is either boolean or path to CA to use!
-            self._session.verify = os.environ.get('SAP_SSL_SERVER_CERT', self._session.verify)
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._new_session()
 
-            if self._session.verify is not True:
-                mod_log().info('Using custom SSL Server cert path: SAP_SSL_SERVER_CERT = %s', self._session.verify)
-            elif self._ssl_verify is False:
-                import urllib3
-                urllib3.disable_warnings()
-                mod_log().info('SSL Server cert will not be verified: SAP_SSL_VERIFY = no')
-                self._session.verify = False
+        return self._session
+
+    def _execute_cached(self, session, url, params=None, headers=None):
+        """Executes conditional GET if the response is already cached and
+           returns the cached response if the server replies 304.
+        """
 
-            url = self._build_adt_url('core/discovery')
+        key = self._options.cache.key(url, params=params, accept=headers.get('Accept', None) if headers else None)
+        cached = self._options.cache.get(key)
 
-            response = self._execute_with_session(self._session, 'GET', url, headers={'x-csrf-token': 'Fetch'})
+        if cached is not None:
+            headers = dict(headers) if headers else {}
+            headers.update(cached.validators)
 
-            self._session.headers.update({'x-csrf-token': response.headers['x-csrf-token']})
+        resp = self._execute_with_session(session, 'GET', url, params=params, headers=headers)
 
-        return self._session
+        if resp.status_code == 304 and cached is not None:
+            mod_log().info('Using cached response: %s', url)
+            self._options.cache.touch(key)
+            return cached.to_response(url)
+
+        if resp.status_code == 200:
+            self._options.cache.put(key, resp)
+
+        return resp
+
+    def _should_compress(self, method, body):
+        """Returns True if the request body is worth compressing"""
 
-    def execute(self, method, adt_uri, params=None, headers=None, body=None, accept=None, content_type=None):
+        return self._options.compress_requests and method == 'PUT' and body is not None \
+            and len(body) >= REQUEST_COMPRESSION_THRESHOLD
+
+    def _execute_compressed(self, session, method, url, params=None, headers=None, body=None):
+        """Sends the body gzipped and sends it again uncompressed if the server
+           does not accept compressed requests.
+        """
+
+        data = body.encode('utf-8') if isinstance(body, str) else body
+
+        compressed_headers = dict(headers) if headers else {}
+        compressed_headers['Content-Encoding'] = 'gzip'
+
+        try:
+            return self._execute_with_session(session, method, url, params=params, headers=compressed_headers,
+                                              body=gzip.compress(data))
+        except (HTTPRequestError, ADTError) as ex:
+            if ex.response is None or ex.response.status_code != 415:
+                raise
+
+        mod_log().info('Compressed requests not supported by the server: sending uncompressed')
+        self._options.compress_requests = False
+
+        return self._execute_with_session(session, method, url, params=params, headers=headers, body=body)
+
+    # pylint: disable=too-many-arguments
+    def _execute_request(self, session, method, url, params=None, headers=None, body=None, stream=False):
+        """Sends the request the streamed, cached, compressed or plain way"""
+
+        if stream:
+            return self._execute_with_session(session, method, url, params=params, headers=headers, body=body,
+                                              stream=True)
+
+        if self._options.cache is not None and method == 'GET':
+            return self._execute_cached(session, url, params=params, headers=headers)
+
+        if self._should_compress(method, body):
+            return self._execute_compressed(session, method, url, params=params, headers=headers, body=body)
+
+        return self._execute_with_session(session, method, url, params=params, headers=headers, body=body)
+
+    # pylint: disable=too-many-arguments
+    def execute(self, method, adt_uri, params=None, headers=None, body=None, accept=None, content_type=None,
+                stream=False):
         """Executes the given ADT URI as an HTTP request and returns
            the requests response object
+
+           If stream is True, the response body is not downloaded until
+           read - e.g. by parse_xml_response(). Streamed responses are
+           never cached.
         """
 
         session = self._get_session()
@@ -162,7 +572,8 @@ class Connection:
         if not headers:
             headers = None
 
-        resp = self._execute_with_session(session, method, url, params=params, headers=headers, body=body)
+        resp = self._execute_request(session, method, url, params=params, headers=headers, body=body,
+                                     stream=stream)
 
         if accept:
             resp_content_type = resp.headers['Content-Type']
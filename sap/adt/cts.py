@@ -1,11 +1,18 @@
 """CTS object proxies"""
 
-import xml.sax
 from xml.sax.handler import ContentHandler
 
 from typing import NamedTuple, Any, List
 
 from sap.adt.core import mod_log
+from sap.adt.xmlparser import parse_xml
+
+
+# Length of class names in the names of class parts
+CLASS_NAME_LENGTH = 30
+
+# LIMU object types of class definition parts whose name is the class name
+CLASS_DEFINITION_PART_TYPES = ('CLSD', 'CPUB', 'CPRO', 'CPRI')
 
 
 # pylint: disable=too-few-public-methods
@@ -132,6 +139,32 @@ class WorkbenchABAPObject(NamedTuple):
     description: str
     locked: bool
 
+    @property
+    def main_object(self):
+        """The pair (type, name) of the R3TR object to which this object
+           belongs or None if the owner is not known - classes for LIMU
+           class parts.
+        """
+
+        if self.pgmid == 'R3TR':
+            return (self.type, self.name)
+
+        if self.pgmid != 'LIMU':
+            return None
+
+        if self.type == 'METH':
+            # the class name padded by spaces and the method name
+            return ('CLAS', self.name[:CLASS_NAME_LENGTH].rstrip(' '))
+
+        if self.type == 'CINC':
+            # the class name padded by = and the include suffix
+            return ('CLAS', self.name[:CLASS_NAME_LENGTH].rstrip('='))
+
+        if self.type in CLASS_DEFINITION_PART_TYPES:
+            return ('CLAS', self.name)
+
+        return None
+
 
 class WorkbenchTask(AbstractWorkbenchRequest):
     """Transport Manager Task"""
@@ -261,6 +294,6 @@ class Workbench:
 
         builder = WorkbenchBuilder(self._connection)
         xml_handler = WorkbenchResponseHandler(builder)
-        xml.sax.parseString(resp.text, xml_handler)
+        parse_xml(resp.text, xml_handler)
 
         return builder.transports
@@ -1,9 +1,10 @@
 """ADT SQL Console wrappers"""
 
-import xml.sax
 from xml.sax.handler import ContentHandler
 
-from sap import get_logger
+from sap import get_logger, is_trace_enabled, TRACE
+from sap.adt.core import parse_xml_response
+from sap.adt.xmlparser import parse_xml
 
 
 def mod_log():
@@ -38,7 +39,9 @@ class FreeStyleTableXMLHandler(ContentHandler):
         self._row[self._column] = content
 
     def startElement(self, name, attrs):
-        mod_log().debug('XML: %s', name)
+        if is_trace_enabled():
+            mod_log().log(TRACE, 'XML: %s', name)
+
         if name == 'dataPreview:totalRows':
             self._datahandler = self._initrows
         elif name == 'dataPreview:metadata':
@@ -50,11 +53,12 @@ class FreeStyleTableXMLHandler(ContentHandler):
             self._row = next(self._iter)
 
     def characters(self, content):
-        mod_log().debug('XML: data: %s', content)
         self._datahandler(content)
 
     def endElement(self, name):
-        mod_log().debug('XML: %s: CLOSING', name)
+        if is_trace_enabled():
+            mod_log().log(TRACE, 'XML: %s: CLOSING', name)
+
         if name == 'dataPreview:totalRows':
             self._datahandler = lambda x: x
         elif name == 'dataPreview:columns':
@@ -73,7 +77,7 @@ def parse_freestyle_table(freestyle_table_xml, rows):
     """Converts XML results into Python representation"""
 
     xml_handler = FreeStyleTableXMLHandler(rows)
-    xml.sax.parseString(freestyle_table_xml, xml_handler)
+    parse_xml(freestyle_table_xml, xml_handler)
 
     return xml_handler.table
 
@@ -99,6 +103,7 @@ class DataPreview:
             params=freestyle_table_params(rows, aging),
             headers={'Accept': 'application/xml, application/vnd.sap.adt.datapreview.table.v1+xml',
                      'Content-Type': 'text/plain'},
-            body=osql_query)
+            body=osql_query,
+            stream=True)
 
-        return parse_freestyle_table(response.text, rows=rows)
+        return parse_xml_response(response, FreeStyleTableXMLHandler(rows)).table
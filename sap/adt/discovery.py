@@ -0,0 +1,250 @@
+"""ADT discovery document - the index of ADT collections and their capabilities"""
+
+import os
+import json
+import time
+import hashlib
+from typing import NamedTuple, Tuple
+
+from xml.sax.handler import ContentHandler
+
+from sap import get_logger
+from sap.adt.xmlparser import parse_xml
+
+
+DISCOVERY_URI = 'core/discovery'
+DISCOVERY_MIME_TYPE = 'application/atomsvc+xml'
+
+# One day
+DISCOVERY_CACHE_TTL = 24 * 60 * 60
+
+
+def mod_log():
+    """ADT Module logger"""
+
+    return get_logger()
+
+
+# pylint: disable=too-few-public-methods
+class TemplateLink(NamedTuple):
+    """adtcomp:templateLink of a collection"""
+
+    rel: str
+    template: str
+    type: str
+
+
+# pylint: disable=too-few-public-methods
+class Collection(NamedTuple):
+    """app:collection of the discovery document"""
+
+    href: str
+    title: str
+    accepts: Tuple[str, ...]
+    template_links: Tuple[TemplateLink, ...]
+
+
+def _local_name(name):
+    return name.rsplit(':', 1)[-1]
+
+
+class DiscoveryXMLHandler(ContentHandler):
+    """ADT Discovery (Atom Service Document) XML parser"""
+
+    def __init__(self):
+        super(DiscoveryXMLHandler, self).__init__()
+
+        self.collections = {}
+
+        self._href = None
+        self._title = None
+        self._accepts = None
+        self._template_links = None
+        self._text = None
+
+    def startElement(self, name, attrs):
+        name = _local_name(name)
+
+        if name == 'collection':
+            self._href = attrs.get('href')
+            self._title = ''
+            self._accepts = []
+            self._template_links = []
+        elif self._href is None:
+            return
+        elif name in ('title', 'accept'):
+            self._text = ''
+        elif name == 'templateLink':
+            self._template_links.append(TemplateLink(attrs.get('rel'), attrs.get('template'), attrs.get('type')))
+
+    def characters(self, content):
+        if self._text is not None:
+            self._text += content
+
+    def endElement(self, name):
+        name = _local_name(name)
+
+        if self._href is None:
+            return
+
+        if name == 'title' and self._text is not None:
+            self._title = self._text.strip()
+        elif name == 'accept':
+            self._accepts.append(self._text.strip())
+        elif name == 'collection':
+            known = self.collections.get(self._href, None)
+            if known is not None:
+                # the same collection can be listed in several workspaces
+                self._accepts = list(known.accepts) + [mime for mime in self._accepts if mime not in known.accepts]
+                self._template_links = list(known.template_links) + self._template_links
+
+            self.collections[self._href] = Collection(self._href, self._title, tuple(self._accepts),
+                                                      tuple(self._template_links))
+            self._href = None
+
+        self._text = None
+
+
+class Discovery:
+    """Index of ADT collections mapping collection href to accepted MIME
+       types and template links.
+    """
+
+    def __init__(self, collections):
+        """:param collections: dictionary href -> :class:`Collection`"""
+
+        self._collections = collections
+
+    def __len__(self):
+        return len(self._collections)
+
+    def __iter__(self):
+        return iter(self._collections.values())
+
+    @staticmethod
+    def _href(adt_uri):
+        if adt_uri.startswith('/'):
+            return adt_uri
+
+        return '/sap/bc/adt/' + adt_uri
+
+    def collection(self, adt_uri):
+        """Returns the collection for the ADT URI (either absolute
+           /sap/bc/adt/... or relative to sap/bc/adt) or None.
+        """
+
+        return self._collections.get(Discovery._href(adt_uri), None)
+
+    def accepts(self, adt_uri):
+        """Returns the tuple of MIME types accepted by the collection"""
+
+        collection = self.collection(adt_uri)
+        if collection is None:
+            return ()
+
+        return collection.accepts
+
+    def pick_accepted(self, adt_uri, candidates):
+        """Returns the first of the candidate MIME types accepted by the
+           collection or None. Pass the candidates from the newest to the
+           oldest to get the newest supported MIME type.
+        """
+
+        accepted = self.accepts(adt_uri)
+
+        for mimetype in candidates:
+            if mimetype in accepted:
+                return mimetype
+
+        return None
+
+    def to_dict(self):
+        """Returns JSON serializable representation"""
+
+        return {href: {'title': collection.title,
+                       'accepts': list(collection.accepts),
+                       'template_links': [list(link) for link in collection.template_links]}
+                for href, collection in self._collections.items()}
+
+    @staticmethod
+    def from_dict(data):
+        """Creates a new instance from the output of to_dict()"""
+
+        return Discovery({href: Collection(href, collection['title'], tuple(collection['accepts']),
+                                           tuple(TemplateLink(*link) for link in collection['template_links']))
+                          for href, collection in data.items()})
+
+
+def parse_discovery(discovery_xml):
+    """Converts the discovery document into :class:`Discovery`"""
+
+    xml_handler = DiscoveryXMLHandler()
+    parse_xml(discovery_xml, xml_handler)
+
+    return Discovery(xml_handler.collections)
+
+
+class DiscoveryCache:
+    """Parsed discovery documents stored in a directory where each ADT system
+       has its own file which expires after the configured time.
+    """
+
+    def __init__(self, directory, ttl=DISCOVERY_CACHE_TTL):
+        self._directory = directory
+        self._ttl = ttl
+
+    def _path(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self._directory, f'discovery-{digest}.json')
+
+    def load(self, key):
+        """Returns the cached Discovery or None if missing or expired"""
+
+        path = self._path(key)
+
+        try:
+            with open(path, 'r', encoding='utf-8') as source:
+                contents = json.load(source)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            mod_log().info('Ignoring corrupted discovery cache: %s', path)
+            return None
+
+        if contents.get('key', None) != key or time.time() - contents['fetched'] > self._ttl:
+            return None
+
+        return Discovery.from_dict(contents['collections'])
+
+    def save(self, key, discovery):
+        """Stores the Discovery"""
+
+        if not os.path.isdir(self._directory):
+            os.makedirs(self._directory, exist_ok=True)
+
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}'
+
+        with open(tmp_path, 'w', encoding='utf-8') as dest:
+            json.dump({'key': key, 'fetched': time.time(), 'collections': discovery.to_dict()}, dest)
+
+        os.replace(tmp_path, path)
+
+
+def fetch_discovery(connection, cache=None, cache_key=None):
+    """Returns :class:`Discovery` of the connected system either from
+       the cache or downloaded and parsed core/discovery.
+    """
+
+    if cache is not None:
+        discovery = cache.load(cache_key)
+        if discovery is not None:
+            return discovery
+
+    resp = connection.execute('GET', DISCOVERY_URI, accept=DISCOVERY_MIME_TYPE)
+    discovery = parse_discovery(resp.text)
+
+    if cache is not None:
+        cache.save(cache_key, discovery)
+
+    return discovery
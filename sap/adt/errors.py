@@ -49,6 +49,8 @@ class ADTError(SAPCliError):
         self.namespace = namespace
         self.type = typ
         self.message = message
+        # the HTTP response carrying the error if it was received
+        self.response = None
 
     def __repr__(self):
         return f'{self.namespace}.{self.type}'
@@ -1,13 +1,16 @@
 """Convert Python Objects to ADT XML entities"""
 
-from functools import partial
+import io
+from types import MappingProxyType
+from typing import Callable, Mapping, NamedTuple, Tuple
 
-import xml.sax
 from xml.sax.handler import ContentHandler
 
-from sap import get_logger
+from sap import get_logger, is_trace_enabled, TRACE
 from sap.errors import FatalError
 from sap.adt.annotations import XmlAttributeProperty, XmlElementProperty, XmlElementKind
+from sap.adt.core import parse_xml_response
+from sap.adt.xmlparser import parse_xml
 
 
 class MarshallingError(FatalError):
@@ -82,68 +85,215 @@ def adt_object_to_element_name(adt_object):
     return f'{objtype.xmlnamespace.name}:{objtype.xmlname}'
 
 
-def factory_with_setter(factory, setter, obj):
-    """Creates a new product, calls the setter and returns the product"""
+class ElementPlan(NamedTuple):
+    """Deserialization of an XML element held by an object's property"""
 
-    product = factory()
-    setter(obj, product)
-    return product
+    name: str
+    prop: XmlElementProperty
+    text: bool
+    factory: Callable
+    setter: bool
+
+    def product(self, parent):
+        """Returns the object for the element - either a new object
+           or the parent's current value - and sets it to the parent.
+        """
+
+        if self.text:
+            return parent
+
+        if self.factory is not None:
+            product = self.factory()
+        else:
+            product = self.prop.__get__(parent)
+
+        if self.setter:
+            self.prop.__set__(parent, product)
+
+        return product
+
+
+class DeserializationPlan(NamedTuple):
+    """XML annotations of a class - XML attribute name to property mapping
+       and the deserialized children elements.
+    """
+
+    attributes: Mapping[str, XmlAttributeProperty]
+    elements: Tuple[ElementPlan, ...]
+    # the pairs relative XPath ('/name') and plan of the children elements
+    children: Tuple[Tuple[str, ElementPlan], ...]
+
+
+_DESERIALIZATION_PLANS = {}
+
+
+def deserialization_plan(cls):
+    """Returns the compiled DeserializationPlan of the class - the class
+       annotations are examined only for the first time.
+    """
+
+    try:
+        return _DESERIALIZATION_PLANS[cls]
+    except KeyError:
+        pass
+
+    attributes = dict()
+    elements = []
+
+    for attr_name in cls.__ordered__:
+        if attr_name.startswith('__'):
+            continue
+
+        attr = getattr(cls, attr_name)
+
+        if isinstance(attr, XmlElementProperty):
+            if not attr.deserialize:
+                get_logger().debug('Found readonly XML element property: %s -> %s', attr_name, attr.name)
+                continue
+
+            get_logger().debug('Found XML element property: %s -> %s', attr_name, attr.name)
+            text = attr.kind == XmlElementKind.TEXT
+            elements.append(ElementPlan(attr.name, attr, text, attr.factory, not text and attr.fset is not None))
+        elif isinstance(attr, XmlAttributeProperty):
+            if not attr.deserialize:
+                get_logger().debug('Found readonly XML attribute property: %s -> %s', attr_name, attr.name)
+                continue
+
+            get_logger().debug('Found XML attribute property: %s -> %s', attr_name, attr.name)
+            attributes[attr.name] = attr
+
+    plan = DeserializationPlan(MappingProxyType(attributes), tuple(elements),
+                               tuple((f'/{element.name}', element) for element in elements))
+    _DESERIALIZATION_PLANS[cls] = plan
+
+    return plan
+
+
+class SerializationStep(NamedTuple):
+    """Serialization of an annotated property"""
+
+    name: str
+    prop: property
+    element: bool
+    kind: XmlElementKind
+
+
+_SERIALIZATION_PLANS = {}
+
+
+def serialization_plan(cls):
+    """Returns the tuple of SerializationSteps of the class in the order
+       of declaration - the class annotations are examined only for the
+       first time.
+    """
+
+    try:
+        return _SERIALIZATION_PLANS[cls]
+    except KeyError:
+        pass
+
+    steps = []
+
+    for attr_name in cls.__ordered__:
+        if attr_name.startswith('_'):
+            continue
+
+        attr = getattr(cls, attr_name)
+
+        if isinstance(attr, XmlElementProperty):
+            steps.append(SerializationStep(attr.name, attr, True, attr.kind))
+        elif isinstance(attr, XmlAttributeProperty) and attr.serialize:
+            steps.append(SerializationStep(attr.name, attr, False, None))
+
+    plan = tuple(steps)
+    _SERIALIZATION_PLANS[cls] = plan
+
+    return plan
 
 
 class ElementHandler:
     """XML element desirialization"""
 
-    def __init__(self, my_xpath, elements, factory=None, textproperty=None):
+    def __init__(self, my_xpath, elements, factory=None, textproperty=None, element=None):
         self.my_xpath = my_xpath
         self.elements = elements
-        self.factory = factory
-        self.attributes = None
         self.obj = None
-        self.textproperty = textproperty
         self._textvalue = None
+        # the root element has no parent and its object comes from the factory
+        if element is None:
+            element = ElementPlan(my_xpath, textproperty, textproperty is not None, factory, False)
+
+        self.element = element
+        self.parent = None
+        # the plan of the current object and the XPaths of its children
+        # elements - the handler belongs to a single parser
+        self._plan = (None, ())
+
+    @property
+    def textproperty(self):
+        """The property receiving the element's text or None"""
+
+        return self.element.prop if self.element.text else None
+
+    @property
+    def attributes(self):
+        """XML attribute name to property mapping of the current object"""
+
+        plan = self._plan[0]
+        return plan.attributes if plan is not None else None
 
     def new(self):
         """Returns a new object"""
 
-        self.obj = self.factory()
+        if self.parent is None:
+            self.obj = self.element.factory()
+        else:
+            self.obj = self.element.product(self.parent)
 
-        if self.textproperty is None:
-            self.attributes = ElementHandler.load_definitions(self, self.obj)
+        if not self.element.text:
+            self._register_children(deserialization_plan(self.obj.__class__))
+
+    def _register_children(self, plan):
+        """Binds handlers of the children elements to the current object"""
+
+        if plan is not self._plan[0]:
+            self._plan = (plan, tuple((self.my_xpath + xpath, element) for xpath, element in plan.children))
+
+        for xml_path, element in self._plan[1]:
+            handler = self.elements.get(xml_path, None)
+
+            # handlers are reused for all repetitions of the element
+            if handler is None or handler.element is not element:
+                handler = ElementHandler(xml_path, self.elements, element=element)
+                self.elements[xml_path] = handler
+
+            handler.parent = self.obj
 
     def set(self, attr_name, value):
         """Sets object's property value"""
 
-        get_logger().debug('Going to set XML attribute property: %s', attr_name)
-
         if self.textproperty is not None:
             # TODO: potentially programming error
             raise MarshallingError()
 
         try:
             self.attributes[attr_name].__set__(self.obj, value)
-            get_logger().debug('Set XML attribute property: %s', attr_name)
         except AttributeError as ex:
             get_logger().error('XML property %s: %s', attr_name, str(ex))
         except KeyError:
-            get_logger().debug('Not an XML attribute property: %s', attr_name)
+            pass
 
     def clear_text(self):
         """Clear text value"""
 
-        get_logger().debug('Going to clear text')
-
         if self.textproperty is None:
-            get_logger().debug('Not a text property')
             return
 
         self._textvalue = ''
-        get_logger().debug('Set the text property to None')
 
     def append_text(self, chunk):
         """Appends text chunk"""
 
-        get_logger().debug('Going to append text')
-
         if self.textproperty is None:
             if not chunk.isspace():
                 # TODO: potentially programming error
@@ -153,69 +303,18 @@ class ElementHandler:
 
         self._textvalue += chunk
 
-        get_logger().debug('Set text to: %s', self._textvalue)
-
     def set_text(self):
         """Sets the text value"""
 
-        get_logger().debug('Going to set text')
-
         if self.textproperty is None:
             if self._textvalue is not None and not self._textvalue.isspace():
                 # TODO: potentially programming error
                 raise MarshallingError()
 
-            get_logger().debug('The property is not a text node')
             return
 
         self.textproperty.__set__(self.obj, self._textvalue)
 
-    def load_definitions(self, obj):
-        """Examines annotations of the current object"""
-
-        attributes = dict()
-        for attr_name in obj.__class__.__ordered__:
-            if attr_name.startswith('__'):
-                continue
-
-            attr = getattr(obj.__class__, attr_name)
-
-            if isinstance(attr, XmlElementProperty):
-                xml_path = f'{self.my_xpath}/{attr.name}'
-
-                if not attr.deserialize:
-                    get_logger().debug('Found readonly XML element property: %s -> %s', attr_name, xml_path)
-                    continue
-
-                if attr.kind == XmlElementKind.TEXT:
-                    get_logger().debug('Found Text XML element property: %s -> %s', attr_name, xml_path)
-                    self.elements[xml_path] = ElementHandler(xml_path,
-                                                             self.elements,
-                                                             factory=lambda: obj,
-                                                             textproperty=attr)
-                    continue
-
-                get_logger().debug('Found XML element property: %s -> %s', attr_name, xml_path)
-
-                factory = attr.factory
-
-                if factory is None:
-                    factory = partial(attr.__get__, obj)
-
-                if attr.fset is not None:
-                    factory = partial(factory_with_setter, factory, attr.__set__, obj)
-
-                self.elements[xml_path] = ElementHandler(xml_path, self.elements, factory)
-            elif isinstance(attr, XmlAttributeProperty):
-                if not attr.deserialize:
-                    get_logger().debug('Found readonly XML attribute property: %s -> %s', attr_name, attr.name)
-                    continue
-
-                get_logger().debug('Found XML attribute property: %s -> %s', attr_name, attr.name)
-                attributes[attr.name] = attr
-
-        return attributes
-
 
 class ADTObjectSAXHandler(ContentHandler):
     """ADT Object XML parser"""
@@ -227,25 +326,31 @@ class ADTObjectSAXHandler(ContentHandler):
         self.current = ''
         self.elements = elements
         self.handler = None
+        self._trace = is_trace_enabled()
 
     def startElement(self, name, attrs):
         self.stack.append(self.current)
         self.current = f'{self.current}/{name}'
-        get_logger().debug('Encountered XML element: %s', self.current)
 
         try:
             self.handler = self.elements[self.current]
         except KeyError:
+            if self._trace:
+                get_logger().log(TRACE, 'Skipping XML element: %s', self.current)
+
             return
 
-        get_logger().debug('Deserializing element: %s', self.current)
+        if self._trace:
+            get_logger().log(TRACE, 'Deserializing element: %s', self.current)
 
         # this loads handlers for children elements!! /o\
         self.handler.new()
         self.handler.clear_text()
 
         for attr_name, value in attrs.items():
-            get_logger().debug('Encountered XML attribute: %s', attr_name)
+            if self._trace:
+                get_logger().log(TRACE, 'Deserializing XML attribute: %s = %s', attr_name, value)
+
             try:
                 self.handler.set(attr_name, value)
             except KeyError:
@@ -255,7 +360,6 @@ class ADTObjectSAXHandler(ContentHandler):
         if self.handler is None:
             return
 
-        get_logger().debug('Trying to set text for the current handler: "%s"', content)
         self.handler.append_text(content)
 
     def endElement(self, name):
@@ -272,144 +376,146 @@ class Marshal:
     def serialize(self, adt_object):
         """Serialized ADT Object"""
 
-        tree = self._object_to_tree(adt_object)
-        return self._tree_to_xml(tree)
+        dest = io.StringIO()
+        self.write(adt_object, dest)
 
-    @staticmethod
-    def deserialize(xml_text, adt_object):
-        """Loads XML and stores values in the given adt_object and
-           for the convenience of use returns the given adt_object.
+        return dest.getvalue()
+
+    def write(self, adt_object, dest):
+        """Writes serialized ADT Object to the text stream dest without
+           building the intermediate tree of Elements.
         """
 
+        objtype = adt_object.objtype
+
+        attributes = dict()
+        declared_ns = self._declare_xmlns(attributes, objtype.xmlnamespace)
+
+        if objtype.code is not None:
+            attributes['adtcore:type'] = objtype.code
+
+        dest.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self._write_element(dest, adt_object_to_element_name(adt_object), attributes, adt_object, declared_ns)
+
+    @staticmethod
+    def _deserialization_handler(adt_object):
+        """Creates SAX handler storing values in the given adt_object"""
+
         name = '/' + adt_object_to_element_name(adt_object)
 
         elements = dict()
         handler = ElementHandler(name, elements, lambda: adt_object)
         elements[name] = handler
 
-        parser = ADTObjectSAXHandler(elements)
-        xml.sax.parseString(xml_text, parser)
+        return ADTObjectSAXHandler(elements)
 
-        return adt_object
+    @staticmethod
+    def deserialize(xml_text, adt_object):
+        """Loads XML and stores values in the given adt_object and
+           for the convenience of use returns the given adt_object.
+        """
 
-    def _object_to_tree(self, adt_object):
-        """Create a DOM like representation of the given ADT object"""
+        parse_xml(xml_text, Marshal._deserialization_handler(adt_object))
 
-        objtype = adt_object.objtype
-        name = adt_object_to_element_name(adt_object)
+        return adt_object
 
-        root = Element(name)
-        declared_ns = self._declare_xmlns(root, objtype.xmlnamespace)
+    @staticmethod
+    def deserialize_response(response, adt_object):
+        """Like deserialize() but reads XML from the HTTP response as it
+           arrives - use with responses of requests executed with stream=True.
+        """
 
-        if objtype.code is not None:
-            root.add_attribute('adtcore:type', objtype.code)
+        parse_xml_response(response, Marshal._deserialization_handler(adt_object))
 
-        self._build_tree(root, adt_object, declared_ns)
-        return root
+        return adt_object
 
     # pylint: disable=no-self-use
     def _declare_xmlns(self, root, xmlns, declared_ns=None):
         """Adds the xmlns attribute if such a Namespace hasn't already been
-           declared any parent nodes.
+           declared any parent nodes. The parameter root is either Element
+           or dictionary of attributes.
 
            Returns set of all declared Namespaces.
         """
 
+        add_attribute = root.__setitem__ if isinstance(root, dict) else root.add_attribute
+
         if declared_ns is None:
             declared = set()
         else:
             declared = set(declared_ns)
 
         if xmlns.name not in declared:
-            root.add_attribute(f'xmlns:{xmlns.name}', xmlns.uri)
+            add_attribute(f'xmlns:{xmlns.name}', xmlns.uri)
             declared.add(xmlns.name)
 
         for parent_ns in xmlns.parents:
             if parent_ns.name in declared:
                 continue
 
-            root.add_attribute(f'xmlns:{parent_ns.name}', parent_ns.uri)
+            add_attribute(f'xmlns:{parent_ns.name}', parent_ns.uri)
             declared.add(parent_ns.name)
 
         return declared
 
-    def _serialize_object_to_node(self, root, node_name, child, declared_ns, kind):
-
-        if not isinstance(child, list):
-            # Put a solo object to a list to simplify
-            # the algorithm below - this might be a bad idea.
-            child = [child]
-
-        for item in child:
-
-            new_ns = None
-            if hasattr(item, 'objtype'):
-                if hasattr(item.objtype, 'xmlnamespace'):
-                    new_ns = item.objtype.xmlnamespace
-
-            if node_name is XmlElementProperty.NAME_FROM_OBJECT:
-                child_name = adt_object_to_element_name(item)
-                child_elem = root.add_child(child_name)
-            else:
-                child_elem = root.add_child(node_name)
-
-            if new_ns is None:
-                child_ns = declared_ns
-            else:
-                child_ns = self._declare_xmlns(child_elem, new_ns, declared_ns)
+    # pylint: disable=too-many-arguments
+    def _write_element(self, dest, name, attributes, obj, declared_ns):
+        """Writes the XML element of the object members"""
 
-            if kind == XmlElementKind.OBJECT:
-                self._build_tree(child_elem, item, child_ns)
-            elif kind == XmlElementKind.TEXT:
-                child_elem.text = item
-            else:
-                raise MarshallingError()
+        children = []
 
-    def _build_tree(self, root, obj, declared_ns):
-        """Convert ADT Object members to XML elements"""
+        if obj is not None:
+            for step in serialization_plan(obj.__class__):
+                value = step.prop.__get__(obj)
 
-        if obj is None:
-            return
+                if step.element:
+                    children.append((step, value))
+                elif value is not None:
+                    attributes[step.name] = value
 
-        for attr_name in obj.__class__.__ordered__:
-            if attr_name.startswith('_'):
-                continue
+        dest.write(f'<{name}')
+        for key, value in attributes.items():
+            dest.write(f' {key}="{value}"')
 
-            attr = getattr(obj.__class__, attr_name)
+        written = False
+        for step, child in children:
+            if not isinstance(child, list):
+                child = [child]
 
-            if isinstance(attr, XmlElementProperty):
-                child = getattr(obj, attr_name)
-                self._serialize_object_to_node(root, attr.name, child, declared_ns, attr.kind)
-            elif isinstance(attr, XmlAttributeProperty):
-                value = getattr(obj, attr_name)
-                if value is not None:
-                    root.add_attribute(attr.name, value)
+            for item in child:
+                dest.write('\n' if written else '>\n')
+                written = True
 
-    def _tree_to_xml(self, tree):
-        """Turn the given abstract XML tree to XML string"""
+                self._write_item(dest, step.name, item, declared_ns, step.kind)
 
-        body = '<?xml version="1.0" encoding="UTF-8"?>\n'
+        dest.write(f'\n</{name}>' if written else '/>')
 
-        return body + self._element_to_xml(tree)
+    # pylint: disable=too-many-arguments
+    def _write_item(self, dest, node_name, item, declared_ns, kind):
+        """Writes the XML element of a property value"""
 
-    def _element_to_xml(self, tree):
-        """ """
+        new_ns = None
+        if hasattr(item, 'objtype'):
+            if hasattr(item.objtype, 'xmlnamespace'):
+                new_ns = item.objtype.xmlnamespace
 
-        xml_str = f'<{tree.name}'
+        if node_name is XmlElementProperty.NAME_FROM_OBJECT:
+            node_name = adt_object_to_element_name(item)
 
-        attributes = ' '.join(f'{key}="{value}"' for key, value in tree.attributes.items())
-        if attributes:
-            xml_str += f' {attributes}'
+        attributes = dict()
 
-        content = tree.text
+        if new_ns is None:
+            child_ns = declared_ns
+        else:
+            child_ns = self._declare_xmlns(attributes, new_ns, declared_ns)
 
-        if content is None and tree.children:
-            subnode = str('\n'.join((self._element_to_xml(child) for child in tree.children)))
-            content = f'\n{subnode}\n'
+        if kind == XmlElementKind.OBJECT:
+            self._write_element(dest, node_name, attributes, item, child_ns)
+        elif kind == XmlElementKind.TEXT:
+            dest.write(f'<{node_name}')
+            for key, value in attributes.items():
+                dest.write(f' {key}="{value}"')
 
-        if content is not None:
-            xml_str += f'>{content}</{tree.name}>'
+            dest.write('/>' if item is None else f'>{item}</{node_name}>')
         else:
-            xml_str += '/>'
-
-        return xml_str
+            raise MarshallingError()
@@ -302,6 +302,7 @@ class ADTObject(metaclass=OrderedClassMembers):
         self._connection = connection
         self._name = name
         self._active_status = active_status
+        self._changed_at = None
 
         self._metadata = metadata if metadata is not None else ADTCoreData()
 
@@ -444,6 +445,18 @@ class ADTObject(metaclass=OrderedClassMembers):
 
         self._active_status = value
 
+    @xml_attribute('adtcore:changedAt', serialize=False)
+    def changed_at(self):
+        """Time stamp of the last modification - read only"""
+
+        return self._changed_at
+
+    @changed_at.setter
+    def changed_at(self, value):
+        """Only for deserialization"""
+
+        self._changed_at = value
+
     @xml_element('adtcore:packageRef')
     def reference(self):
         """The object's package reference"""
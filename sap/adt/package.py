@@ -200,6 +200,29 @@ class Package(ADTObject):
         self._appcomp.name = name
 
 
+def explore(package, repository=None):
+    """Returns the pair (list of sub-package names, list of objects) of
+       the package where objects have the attributes typ, name and uri.
+    """
+
+    if repository is None:
+        repository = Repository(package.connection)
+
+    root_node = repository.read_node(package)
+
+    subpackages = [subpkg.OBJECT_NAME for subpkg in root_node.objects]
+
+    nodekeys = [objtyp.NODE_ID for objtyp in root_node.types if objtyp.OBJECT_TYPE != 'DEVC/K']
+    if not nodekeys:
+        return (subpackages, [])
+
+    objects_node = repository.read_node(package, nodekeys=nodekeys)
+    objects = [SimpleNamespace(typ=obj.OBJECT_TYPE, name=obj.OBJECT_NAME, uri=obj.OBJECT_URI)
+               for obj in objects_node.objects]
+
+    return (subpackages, objects)
+
+
 def walk(package):
     """Returns the same structure as python os.walk"""
 
@@ -211,17 +234,7 @@ def walk(package):
 
     while toexplore:
         explored, path = toexplore.pop()
-        root_node = repository.read_node(explored)
-
-        subpackages = [subpkg.OBJECT_NAME for subpkg in root_node.objects]
-
-        nodekeys = [objtyp.NODE_ID for objtyp in root_node.types if objtyp.OBJECT_TYPE != 'DEVC/K']
-        if nodekeys:
-            objects_node = repository.read_node(explored, nodekeys=nodekeys)
-            objects = [SimpleNamespace(typ=obj.OBJECT_TYPE, name=obj.OBJECT_NAME, uri=obj.OBJECT_URI)
-                       for obj in objects_node.objects]
-        else:
-            objects = []
+        subpackages, objects = explore(explored, repository=repository)
 
         toexplore.extendleft(((Package(package.connection, subpkg), path + [subpkg]) for subpkg in subpackages))
 
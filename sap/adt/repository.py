@@ -1,10 +1,10 @@
 """ADT Repository wrappers"""
 
 from types import SimpleNamespace
-import xml.sax
 from xml.sax.handler import ContentHandler
 
-from sap import get_logger
+from sap import get_logger, is_trace_enabled, TRACE
+from sap.adt.xmlparser import parse_xml
 
 
 def mod_log():
@@ -30,43 +30,41 @@ class NodeStructureXMLHandler(ContentHandler):
 
         self._object = None
         self._property = None
+        self._trace = is_trace_enabled()
 
     def startElement(self, name, attrs):
-        mod_log().debug('XML: start: %s', name)
+        if self._trace:
+            mod_log().log(TRACE, 'XML: start: %s', name)
 
         if name in ['asx:abap', 'asx:values', 'DATA', 'TREE_CONTENT', 'CATEGORIES', 'OBJECT_TYPES']:
             return
 
         if name in self._lists.keys():
-            mod_log().debug('XML: new object: %s', name)
             self._object = SimpleNamespace()
         else:
-            mod_log().debug('XML: object property: %s', name)
             self._property = name
 
     def characters(self, content):
         if self._property is None:
             return
 
-        mod_log().debug('XML: object property value: %s', content)
         setattr(self._object, self._property, content)
 
     def endElement(self, name):
         if name != self._property:
             try:
                 self._lists[name].append(self._object)
-                mod_log().debug('XML: complete object: %s', name)
                 self._object = None
             except KeyError:
                 pass
         else:
             if not hasattr(self._object, self._property):
-                mod_log().debug('XML: object property value: <empty>')
                 setattr(self._object, self._property, '')
 
             self._property = None
 
-        mod_log().debug('XML: end: %s', name)
+        if self._trace:
+            mod_log().log(TRACE, 'XML: end: %s', name)
 
 
 def nodekeys_list_table(nodekeys):
@@ -112,6 +110,6 @@ class Repository:
             return SimpleNamespace(objects=[], types=[], categories=[])
 
         parser = NodeStructureXMLHandler()
-        xml.sax.parseString(resp.text, parser)
+        parse_xml(resp.text, parser)
 
         return SimpleNamespace(objects=parser.tree_content, types=parser.object_types, categories=parser.categories)
@@ -0,0 +1,84 @@
+"""Persistent storage of ADT HTTP session cookies and CSRF tokens"""
+
+import os
+import json
+import threading
+
+from sap import get_logger
+
+
+def mod_log():
+    """ADT Module logger"""
+
+    return get_logger()
+
+
+class SessionStore:
+    """A file holding cookies and CSRF tokens of ADT sessions to let
+       subsequent processes skip the session initialization.
+
+       The file contains credentials so it is readable only by its owner.
+    """
+
+    def __init__(self, path):
+        """Parameters:
+            - path: path to the store file; created if missing
+        """
+
+        self._path = path
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        """Path to the store file"""
+
+        return self._path
+
+    def _read(self):
+        try:
+            with open(self._path, 'r', encoding='utf-8') as source:
+                return json.load(source)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            mod_log().info('Ignoring corrupted session store: %s', self._path)
+            return {}
+
+    def load(self, key, session):
+        """Populates the session with the stored cookies and returns the stored
+           CSRF token or None if nothing has been stored for the key.
+        """
+
+        with self._lock:
+            stored = self._read().get(key, None)
+
+        if stored is None:
+            return None
+
+        for cookie in stored['cookies']:
+            session.cookies.set(cookie['name'], cookie['value'], domain=cookie['domain'], path=cookie['path'],
+                                secure=cookie['secure'], expires=cookie['expires'])
+
+        return stored['csrf_token']
+
+    def save(self, key, session, csrf_token):
+        """Stores the session cookies and the CSRF token"""
+
+        cookies = [{'name': cookie.name, 'value': cookie.value, 'domain': cookie.domain, 'path': cookie.path,
+                    'secure': cookie.secure, 'expires': cookie.expires}
+                   for cookie in session.cookies]
+
+        with self._lock:
+            contents = self._read()
+            contents[key] = {'cookies': cookies, 'csrf_token': csrf_token}
+
+            directory = os.path.dirname(self._path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory, mode=0o700, exist_ok=True)
+
+            tmp_path = f'{self._path}.{os.getpid()}'
+            descriptor = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(descriptor, 'w', encoding='utf-8') as dest:
+                json.dump(contents, dest)
+
+            os.replace(tmp_path, self._path)
@@ -0,0 +1,229 @@
+"""XML parser backends driving xml.sax.handler.ContentHandler objects
+
+The handlers receive qualified element and attribute names (prefix:name)
+as when parsed by xml.sax without namespace processing and the attributes
+as a dictionary like object.
+
+Backends:
+  - sax: the reference implementation xml.sax (default)
+  - expat: pyexpat callbacks bound directly to the handler's methods
+  - lxml: lxml.etree.XMLParser target; if lxml 5 or newer is not installed,
+          expat is used; unlike the others it does not support undeclared
+          namespace prefixes which are dropped
+"""
+
+import os
+
+import xml.sax
+from xml.parsers import expat
+
+from sap import get_logger
+from sap.errors import SAPCliError
+
+try:
+    from lxml import etree
+
+    # older versions cannot resolve internal entities only
+    if etree.LXML_VERSION < (5, 0):
+        etree = None
+except ImportError:
+    etree = None
+
+
+XML_PARSER_SAX = 'sax'
+XML_PARSER_EXPAT = 'expat'
+XML_PARSER_LXML = 'lxml'
+
+XML_PARSERS = (XML_PARSER_SAX, XML_PARSER_EXPAT, XML_PARSER_LXML)
+
+# the handlers are written for xml.sax - the faster backends are opt-in
+DEFAULT_XML_PARSER = XML_PARSER_SAX
+
+
+def mod_log():
+    """ADT Module logger"""
+
+    return get_logger()
+
+
+def xml_parser_backend():
+    """Returns the configured backend name - the environment variable
+       SAPCLI_XML_PARSER or DEFAULT_XML_PARSER.
+    """
+
+    backend = os.environ.get('SAPCLI_XML_PARSER', DEFAULT_XML_PARSER)
+
+    if backend not in XML_PARSERS:
+        raise SAPCliError(f'Unknown XML parser: {backend}')
+
+    if backend == XML_PARSER_LXML and etree is None:
+        mod_log().info('XML parser lxml is not installed: using expat')
+        return XML_PARSER_EXPAT
+
+    return backend
+
+
+class SAXParser:
+    """Incremental xml.sax parser"""
+
+    def __init__(self, handler):
+        self._parser = xml.sax.make_parser()
+        self._parser.setContentHandler(handler)
+
+    def feed(self, data):
+        """Parses the next block of the document"""
+
+        self._parser.feed(data)
+
+    def close(self):
+        """Finishes the document"""
+
+        self._parser.close()
+
+
+class ExpatParser:
+    """Incremental parser calling the handler directly from expat"""
+
+    def __init__(self, handler):
+        self._handler = handler
+
+        self._parser = expat.ParserCreate()
+        # join adjacent text blocks to call characters() only once
+        self._parser.buffer_text = True
+        self._parser.StartElementHandler = handler.startElement
+        self._parser.EndElementHandler = handler.endElement
+        self._parser.CharacterDataHandler = handler.characters
+
+        self._started = False
+
+    def feed(self, data):
+        """Parses the next block of the document"""
+
+        if not self._started:
+            self._handler.startDocument()
+            self._started = True
+
+        self._parser.Parse(data, False)
+
+    def close(self):
+        """Finishes the document"""
+
+        if not self._started:
+            self._handler.startDocument()
+
+        self._parser.Parse(b'', True)
+        self._handler.endDocument()
+
+
+def _qname(clark_name, prefixes):
+    """Converts {uri}name to prefix:name"""
+
+    # names with undeclared prefixes are not resolved
+    if clark_name[0] != '{':
+        return clark_name
+
+    uri, name = clark_name[1:].split('}', 1)
+    prefix = prefixes.get(uri, None)
+
+    return name if prefix is None else f'{prefix}:{name}'
+
+
+class LxmlTarget:
+    """lxml parser target translating resolved namespaces back to prefixes"""
+
+    def __init__(self, handler):
+        self._handler = handler
+        # namespace URI -> prefix of the open elements
+        self._prefixes = [{}]
+
+    def start(self, tag, attrib, nsmap=None):
+        """Element start callback"""
+
+        prefixes = self._prefixes[-1]
+        attributes = {}
+
+        if nsmap:
+            prefixes = dict(prefixes)
+
+            for prefix, uri in nsmap.items():
+                prefixes[uri] = prefix
+                attributes['xmlns' if prefix is None else f'xmlns:{prefix}'] = uri
+
+        self._prefixes.append(prefixes)
+
+        for name, value in attrib.items():
+            attributes[_qname(name, prefixes)] = value
+
+        self._handler.startElement(_qname(tag, prefixes), attributes)
+
+    def end(self, tag):
+        """Element end callback"""
+
+        self._handler.endElement(_qname(tag, self._prefixes.pop()))
+
+    def data(self, content):
+        """Text callback"""
+
+        self._handler.characters(content)
+
+    def close(self):
+        """Document end callback"""
+
+        return None
+
+
+class LxmlParser:
+    """Incremental parser calling the handler from lxml parser target"""
+
+    def __init__(self, handler):
+        self._handler = handler
+        self._parser = etree.XMLParser(target=LxmlTarget(handler), resolve_entities='internal', huge_tree=True)
+        self._started = False
+
+    def feed(self, data):
+        """Parses the next block of the document"""
+
+        if not self._started:
+            self._handler.startDocument()
+            self._started = True
+
+        self._parser.feed(data)
+
+    def close(self):
+        """Finishes the document"""
+
+        if not self._started:
+            self._handler.startDocument()
+
+        self._parser.close()
+        self._handler.endDocument()
+
+
+XML_PARSER_CLASSES = {
+    XML_PARSER_SAX: SAXParser,
+    XML_PARSER_EXPAT: ExpatParser,
+    XML_PARSER_LXML: LxmlParser,
+}
+
+
+def new_xml_parser(handler, backend=None):
+    """Returns an incremental parser with the methods feed(data) and close()
+       calling the methods of the handler.
+    """
+
+    if backend is None:
+        backend = xml_parser_backend()
+
+    return XML_PARSER_CLASSES[backend](handler)
+
+
+def parse_xml(xml_text, handler, backend=None):
+    """Drop-in replacement of xml.sax.parseString() using the configured
+       backend.
+    """
+
+    parser = new_xml_parser(handler, backend=backend)
+    parser.feed(xml_text)
+    parser.close()
+
+    return handler
@@ -54,9 +54,26 @@ def adt_connection_from_args(args):
 
     import sap.adt
 
+    cache = None
+    if args.cache_dir:
+        import sap.adt.cache
+
+        max_size = sap.adt.cache.DEFAULT_CACHE_MAX_SIZE
+        if getattr(args, 'cache_max_size', None):
+            max_size = args.cache_max_size * 1024 * 1024
+
+        cache = sap.adt.cache.ResponseCache(args.cache_dir, max_size=max_size)
+
+    session_store = None
+    if args.session_file:
+        import sap.adt.session
+
+        session_store = sap.adt.session.SessionStore(args.session_file)
+
     return sap.adt.Connection(
         args.ashost, args.client, args.user, args.password,
-        port=args.port, ssl=args.ssl, verify=args.verify)
+        port=args.port, ssl=args.ssl, verify=args.verify,
+        options=sap.adt.ConnectionOptions(cache=cache, session_store=session_store))
 
 
 def get_commands():
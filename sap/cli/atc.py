@@ -1,11 +1,14 @@
 """ATC proxy for ABAP Unit"""
 
 import sys
+import json
+from itertools import chain
+from xml.sax.saxutils import escape
 
 from sap import get_logger
 import sap.adt
 import sap.adt.atc
-from sap.cli.core import printout
+from sap.cli.core import printout, object_lines, InvalidCommandLineError
 from sap.errors import SAPCliError
 
 
@@ -24,15 +27,60 @@ class CommandGroup(sap.cli.core.CommandGroup):
         super(CommandGroup, self).__init__('atc')
 
 
+def _findings_by_object(findings):
+    """Groups the consecutive pairs (ATCObject, ATCFinding) of the same object
+       and yields the pairs (ATCObject, [ATCFinding]) without waiting for
+       the next object.
+    """
+
+    last_obj = None
+    obj_findings = []
+    for obj, finding in findings:
+        if obj is not last_obj:
+            if last_obj is not None:
+                yield (last_obj, obj_findings)
+
+            last_obj = obj
+            obj_findings = []
+
+        obj_findings.append(finding)
+
+    if last_obj is not None:
+        yield (last_obj, obj_findings)
+
+
+def print_findings_to_stream(findings, stream, error_level=99):
+    """Print the pairs (ATCObject, ATCFinding) to stream in the human
+       readable form as they come.
+    """
+
+    pad = ''
+    finiding_pad = pad + ' '
+    ret = 0
+    last_obj = None
+    for obj, finding in findings:
+        if obj is not last_obj:
+            stream.flush()
+            stream.write(f'{obj.object_type_id}/{obj.name}\n')
+            last_obj = obj
+
+        if int(finding.priority) <= error_level:
+            ret += 1
+
+        stream.write(f'*{finiding_pad}{finding.priority} :: {finding.check_title} :: {finding.message_title}\n')
+
+    return ret
+
+
 def print_worklist_to_stream(run_results, stream, error_level=99):
     """Print results to stream"""
 
     pad = ''
     ret = 0
-    for obj in run_results.objects:
+    for obj in run_results.objects or []:
         stream.write(f'{obj.object_type_id}/{obj.name}\n')
         finiding_pad = pad + ' '
-        for finding in obj.findings:
+        for finding in obj.findings or []:
             if int(finding.priority) <= error_level:
                 ret += 1
 
@@ -41,6 +89,94 @@ def print_worklist_to_stream(run_results, stream, error_level=99):
     return ret
 
 
+def _location_line_column(location):
+    """Returns line and column from ATC finding location
+       (e.g. /sap/bc/adt/oo/classes/zcl_foo#start=12,4).
+    """
+
+    if not location:
+        return ('0', '0')
+
+    _, _, fragment = location.partition('#start=')
+    line, _, column = fragment.partition(',')
+
+    return (line or '0', column or '0')
+
+
+def _xml_attr(value):
+    """Escapes XML attribute value"""
+
+    return escape(value or '', {'"': '&quot;'})
+
+
+def print_findings_checkstyle(findings, stream, error_level=99):
+    """Print the pairs (ATCObject, ATCFinding) to stream in the form of
+       Checkstyle XML where findings with priority lower than or equal to
+       error_level are errors and the others are warnings.
+    """
+
+    stream.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    stream.write('<checkstyle version="8.36">\n')
+
+    ret = 0
+    for obj, obj_findings in _findings_by_object(findings):
+        stream.write(f'  <file name="{_xml_attr(obj.object_type_id)}/{_xml_attr(obj.name)}">\n')
+
+        for finding in obj_findings:
+            severity = 'warning'
+            if int(finding.priority) <= error_level:
+                severity = 'error'
+                ret += 1
+
+            line, column = _location_line_column(finding.location)
+            message = _xml_attr(finding.message_title)
+            source = _xml_attr(f'{finding.check_title}/{finding.message_id}')
+
+            stream.write(f'    <error line="{line}" column="{column}" severity="{severity}" message="{message}" \
+source="{source}"/>\n')
+
+        stream.write('  </file>\n')
+        stream.flush()
+
+    stream.write('</checkstyle>\n')
+
+    return ret
+
+
+def print_findings_jsonl(findings, stream, error_level=99):
+    """Print the pairs (ATCObject, ATCFinding) to stream as JSON lines with
+       one finding per line.
+    """
+
+    ret = 0
+    for obj, obj_findings in _findings_by_object(findings):
+        for finding in obj_findings:
+            if int(finding.priority) <= error_level:
+                ret += 1
+
+            stream.write(json.dumps({'object_type_id': obj.object_type_id,
+                                     'object_name': obj.name,
+                                     'package_name': obj.package_name,
+                                     'priority': finding.priority,
+                                     'check_id': finding.check_id,
+                                     'check_title': finding.check_title,
+                                     'message_id': finding.message_id,
+                                     'message_title': finding.message_title,
+                                     'location': finding.location}))
+            stream.write('\n')
+
+        stream.flush()
+
+    return ret
+
+
+FINDINGS_PRINTERS = {
+    'human': print_findings_to_stream,
+    'checkstyle': print_findings_checkstyle,
+    'jsonl': print_findings_jsonl,
+}
+
+
 @CommandGroup.command()
 def customizing(connection, _):
     """Retrieves ATC customizing"""
@@ -50,39 +186,167 @@ def customizing(connection, _):
     printout('System Check Variant:', settings.system_check_variant)
 
 
+def _run_objects(connection, args):
+    """Returns the list of ADT objects to be checked"""
+
+    types = {'program': sap.adt.Program, 'class': sap.adt.Class, 'interface': sap.adt.Interface,
+             'package': sap.adt.Package}
+
+    if args.type is not None and args.type not in types:
+        raise SAPCliError(f'Unknown type: {args.type}')
+
+    if args.type is None and args.name:
+        raise InvalidCommandLineError('Object names given without object type')
+
+    adt_objects = []
+    for typ, name in object_lines(args):
+        try:
+            adt_objects.append(types[typ](connection, name))
+        except KeyError as ex:
+            raise SAPCliError(f'Unknown type: {typ}') from ex
+
+    if not adt_objects:
+        raise InvalidCommandLineError('No objects to check')
+
+    return adt_objects
+
+
+def _shard_objects(adt_objects):
+    """Replaces packages with the objects of their hierarchies"""
+
+    shard_objects = []
+    known = set()
+
+    for adt_object in adt_objects:
+        if isinstance(adt_object, sap.adt.Package):
+            package_objects = sap.adt.atc.package_objects(adt_object)
+        else:
+            package_objects = [adt_object]
+
+        for obj in package_objects:
+            if obj.full_adt_uri in known:
+                continue
+
+            known.add(obj.full_adt_uri)
+            shard_objects.append(obj)
+
+    return shard_objects
+
+
+def _save_worklist_id(cache, connection, args, checks):
+    """Stores the worklist ID of the runner for the next invocations"""
+
+    if args.reuse_worklist and checks.worklist_id is not None:
+        cache.save_worklist_id(connection.system_key, args.variant, checks.worklist_id)
+
+
+@CommandGroup.argument('--cache-customizing', action='store_true', default=False,
+                       help='Read the system check variant from the cache directory (--cache-dir) where it is '
+                            'downloaded again once a day')
+@CommandGroup.argument('--reuse-worklist', action='store_true', default=False,
+                       help='Reuse the worklist of the previous invocation stored in the cache directory '
+                            '(--cache-dir); do not use in concurrent invocations with the same variant')
+@CommandGroup.argument('--retries', default=sap.adt.atc.DEFAULT_SHARD_RETRIES, type=int,
+                       help=f'Number of repeated runs of a failed shard; default == '
+                            f'{sap.adt.atc.DEFAULT_SHARD_RETRIES}')
+@CommandGroup.argument('-j', '--jobs', default=1, type=int,
+                       help='Number of shards checked in parallel; default == 1')
+@CommandGroup.argument('--shard', action='store_true', default=False,
+                       help='Check objects of packages in shards of --chunk-size objects on separate worklists')
+@CommandGroup.argument('--stream', action='store_true', default=False,
+                       help='Print findings as the worklist is being downloaded')
+@CommandGroup.argument('-o', '--output', choices=list(FINDINGS_PRINTERS.keys()), default='human',
+                       help='Output format; default == human')
+@CommandGroup.argument('-c', '--chunk-size', default=sap.adt.atc.DEFAULT_RUN_CHUNK_SIZE, type=int,
+                       help=f'Maximum number of objects checked in one run; default == '
+                            f'{sap.adt.atc.DEFAULT_RUN_CHUNK_SIZE}')
+@CommandGroup.argument('-f', '--objects-file', default=None, type=str,
+                       help='File with lines "TYPE NAME" of further checked objects or - for stdin')
 @CommandGroup.argument('-m', '--max-verdicts', default=100, type=int,
-                       help='Maximum number of findings; default == 100')
+                       help='Maximum number of findings per run; default == 100')
 @CommandGroup.argument('-r', '--variant', default=None, type=str,
                        help='Executed Check Variant; default: the system variant')
 @CommandGroup.argument('-e', '--error-level', default=2, type=int,
                        help='Exit with non zero if a finding with this or higher prio returned')
-@CommandGroup.argument('name')
-@CommandGroup.argument('type', choices=['program', 'class', 'package'])
+@CommandGroup.argument('name', nargs='*')
+@CommandGroup.argument('type', nargs='?', choices=['program', 'class', 'interface', 'package'])
 @CommandGroup.command()
 def run(connection, args):
     """Prints it out based on command line configuration.
 
+       All the given objects are checked with a single worklist in runs of
+       at most --chunk-size objects whose results are merged.
+
+       With --shard, the packages are replaced with the objects of their
+       hierarchies and every run (shard) has its own worklist and --jobs
+       shards are checked in parallel.
+
+       With --reuse-worklist, the worklist ID is stored in the cache
+       directory and reused by the next invocations with the same variant
+       until the server deletes the worklist or the ID expires.
+
+       With --cache-customizing, the system check variant is stored
+       in the cache directory too.
+
        Exceptions:
          - SAPCliError:
            - when the given type does not belong to the type white list
     """
 
-    types = {'program': sap.adt.Program, 'class': sap.adt.Class, 'package': sap.adt.Package}
-    try:
-        typ = types[args.type]
-    except KeyError:
-        raise SAPCliError(f'Unknown type: {args.type}')
+    adt_objects = _run_objects(connection, args)
+
+    cache = None
+    if args.reuse_worklist or args.cache_customizing:
+        if args.reuse_worklist and args.shard:
+            raise InvalidCommandLineError('Sharded runs cannot reuse worklists')
+
+        cache = sap.adt.atc.customizing_cache(connection)
+        if cache is None:
+            raise InvalidCommandLineError('--reuse-worklist and --cache-customizing require the cache directory')
 
-    objects = sap.adt.objects.ADTObjectSets()
-    objects.include_object(typ(connection, args.name))
+    if args.shard:
+        if args.jobs < 1:
+            raise InvalidCommandLineError(f'The number of jobs must be a positive number: {args.jobs}')
+
+        adt_objects = _shard_objects(adt_objects)
 
     if args.variant is None:
-        settings = sap.adt.atc.fetch_customizing(connection)
+        settings = sap.adt.atc.fetch_customizing(connection,
+                                                 cache=cache if args.cache_customizing else None)
         args.variant = settings.system_check_variant
 
     mod_log().info('Variant: %s', args.variant)
 
-    checks = sap.adt.atc.ChecksRunner(connection, args.variant)
-    results = checks.run_for(objects, max_verdicts=args.max_verdicts)
+    chunks = sap.adt.atc.chunked_object_sets(adt_objects, args.chunk_size)
+
+    if args.shard:
+        checks = sap.adt.atc.ShardedChecksRunner(connection, args.variant, jobs=args.jobs, retries=args.retries)
+        worklists = checks.iter_worklists(chunks, max_verdicts=args.max_verdicts)
+
+        if args.stream:
+            findings = chain.from_iterable(worklist.iter_findings() for worklist in worklists)
+            return FINDINGS_PRINTERS[args.output](findings, sys.stdout, error_level=args.error_level)
+
+        worklist = sap.adt.atc.merge_worklists(list(worklists))
+    else:
+        worklist_id = None
+        if args.reuse_worklist:
+            worklist_id = cache.load_worklist_id(connection.system_key, args.variant)
+
+        checks = sap.adt.atc.ChecksRunner(connection, args.variant, worklist_id=worklist_id)
+
+        if args.stream:
+            findings = chain.from_iterable(checks.stream_for(objects, max_verdicts=args.max_verdicts).findings
+                                           for objects in chunks)
+            ret = FINDINGS_PRINTERS[args.output](findings, sys.stdout, error_level=args.error_level)
+            _save_worklist_id(cache, connection, args, checks)
+            return ret
+
+        worklist = sap.adt.atc.merge_worklists([checks.run_for(objects, max_verdicts=args.max_verdicts).worklist
+                                                for objects in chunks])
+        _save_worklist_id(cache, connection, args, checks)
+
+    if args.output == 'human':
+        return print_worklist_to_stream(worklist, sys.stdout, error_level=args.error_level)
 
-    return print_worklist_to_stream(results.worklist, sys.stdout, error_level=args.error_level)
+    return FINDINGS_PRINTERS[args.output](worklist.iter_findings(), sys.stdout, error_level=args.error_level)
@@ -1,15 +1,34 @@
 """ADT proxy for ABAP Unit"""
 
+import os
+import re
 import sys
 from xml.sax.saxutils import escape
-from itertools import islice
 
+from sap import get_logger
 import sap.adt
+import sap.adt.acoverage
 import sap.adt.aunit
+import sap.adt.checkout
 import sap.cli.core
+from sap.adt.aunit import TestMethodStatus
+from sap.cli.core import object_lines, InvalidCommandLineError
 from sap.errors import SAPCliError
 
 
+# Size of text written to the output at once
+OUTPUT_BUFFER_SIZE = 64 * 1024
+
+# Numbers of transport requests and tasks - e.g. C50K000001
+TRANSPORT_NUMBER_RE = re.compile(r'^[A-Z0-9]{3}K[0-9]{6}$')
+
+
+def mod_log():
+    """Module logger"""
+
+    return get_logger()
+
+
 class CommandGroup(sap.cli.core.CommandGroup):
     """Adapter converting command line parameters to sap.adt.Class methods
        calls.
@@ -19,50 +38,131 @@ class CommandGroup(sap.cli.core.CommandGroup):
         super(CommandGroup, self).__init__('aunit')
 
 
-def print_results_to_stream(run_results, stream):
-    """Print results to stream"""
+class BufferedStream:
+    """Collects the written text and writes it to the stream in large
+       blocks.
+    """
+
+    def __init__(self, stream, size=OUTPUT_BUFFER_SIZE):
+        self._stream = stream
+        self._size = size
+        self._parts = []
+        self._length = 0
+
+    def write(self, text):
+        """Buffers the text"""
+
+        self._parts.append(text)
+        self._length += len(text)
+
+        if self._length >= self._size:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered text to the stream"""
+
+        if self._parts:
+            self._stream.write(''.join(self._parts))
+            self._parts = []
+            self._length = 0
+
+
+class HumanWriter:
+    """Writes human readable results of test runs as they are parsed
+       - see sap.adt.aunit.AUnitResponseHandler.
+
+       The alerts received after the first program are written below
+       the programs.
+    """
+
+    def __init__(self, stream):
+        self._output = BufferedStream(stream)
+        self._alerts = set()
+        self._late_alerts = []
+        self._critical = []
+        self._successful = 0
+        self._tolerable = 0
+        self._programs = False
+
+    def alert(self, alert):
+        """Writes the alert which has not been written yet"""
+
+        alert_key = (alert.kind, alert.severity, alert.title)
+        if alert_key in self._alerts:
+            return
+
+        self._alerts.add(alert_key)
+
+        # do not break the listing of programs
+        if self._programs:
+            self._late_alerts.append(alert)
+        else:
+            self._write_alert(alert)
+
+    def _write_alert(self, alert):
+        self._output.write(f'* [{alert.severity}] [{alert.kind}] - {alert.title}\n')
 
-    for alert in run_results.alerts:
-        print(f'* [{alert.severity}] [{alert.kind}] - {alert.title}', file=stream)
+    def program(self, program):
+        """Writes the program name"""
 
-    successful = 0
-    tolerable = 0
-    critical = []
-    for program in run_results.programs:
-        print(f'{program.name}', file=stream)
+        self._programs = True
+        self._output.write(f'{program.name}\n')
 
-        for test_class in program.test_classes:
-            print(f'  {test_class.name}', file=stream)
+    def test_class(self, program, test_class):
+        """Writes the test class and results of its methods"""
 
-            for test_method in test_class.test_methods:
-                result = None
-                if any((alert.is_error for alert in test_method.alerts)):
-                    result = 'ERR'
-                    critical.append((program, test_class, test_method))
-                elif any((alert.is_warning for alert in test_method.alerts)):
-                    result = 'SKIP'
-                    tolerable += 1
-                else:
-                    result = 'OK'
-                    successful += 1
-                print(f'    {test_method.name} [{result}]', file=stream)
+        output = self._output
+        output.write(f'  {test_class.name}\n')
 
-    if run_results.programs:
-        print('', file=stream)
+        for test_method in test_class.test_methods:
+            if test_method.status == TestMethodStatus.ERR:
+                self._critical.append((program, test_class, test_method))
+            elif test_method.status == TestMethodStatus.SKIP:
+                self._tolerable += 1
+            else:
+                self._successful += 1
 
-    for program, test_class, test_method in critical:
-        print(f'{program.name}=>{test_class.name}=>{test_method.name}', file=stream)
-        for alert in test_method.alerts:
-            print(f'*  [{alert.severity}] [{alert.kind}] - {alert.title}', file=stream)
+            output.write(f'    {test_method.name} [{test_method.status}]\n')
 
-    if critical:
-        print('', file=stream)
+    def close(self):
+        """Writes the failed tests and the summary and returns the number of
+           failed tests.
+        """
 
-    print(f'Successful: {successful}', file=stream)
-    print(f'Warnings:   {tolerable}', file=stream)
-    print(f'Errors:     {len(critical)}', file=stream)
+        output = self._output
 
-    return len(critical)
+        if self._programs:
+            output.write('\n')
+
+        if self._late_alerts:
+            for alert in self._late_alerts:
+                self._write_alert(alert)
+
+            output.write('\n')
+
+        for program, test_class, test_method in self._critical:
+            output.write(f'{program.name}=>{test_class.name}=>{test_method.name}\n')
+            for alert in test_method.alerts:
+                output.write(f'*  [{alert.severity}] [{alert.kind}] - {alert.title}\n')
+
+        if self._critical:
+            output.write('\n')
+
+        output.write(f'Successful: {self._successful}\n')
+        output.write(f'Warnings:   {self._tolerable}\n')
+        output.write(f'Errors:     {len(self._critical)}\n')
+        output.flush()
+
+        return len(self._critical)
+
+
+def print_results_to_stream(run_results, stream):
+    """Print results to stream"""
+
+    writer = HumanWriter(stream)
+    sap.adt.aunit.feed_run_results(run_results, writer)
+
+    return writer.close()
 
 
 def print_junit4_system_err(stream, details, elem_pad):
@@ -71,139 +171,611 @@ def print_junit4_system_err(stream, details, elem_pad):
     if not details:
         return
 
-    print(f'{elem_pad}<system-err>', file=stream, end='')
-
-    for detail in islice(details, len(details) - 1):
-        print(escape(detail), file=stream)
-
-    print(escape(details[-1]), file=stream, end='')
-
-    print('</system-err>', file=stream)
+    escaped = '\n'.join(escape(detail) for detail in details)
+    stream.write(f'{elem_pad}<system-err>{escaped}</system-err>\n')
 
 
 def print_junit4_testcase_error(stream, alert, elem_pad):
     """Print AUnit Alert as JUnit4 testcase/error"""
 
-    print(f'{elem_pad}<error type="{escape(alert.kind)}" message="{escape(alert.title)}"',
-          file=stream, end='')
+    stream.write(f'{elem_pad}<error type="{escape(alert.kind)}" message="{escape(alert.title)}"')
 
     if not alert.stack:
-        print('/>', file=stream)
+        stream.write('/>\n')
         return
 
-    print('>', file=stream, end='')
+    escaped = '\n'.join(escape(frame) for frame in alert.stack)
+    stream.write(f'>{escaped}</error>\n')
+
+
+class JUnit4Writer:
+    """Writes results of test runs in the form of JUnit as they are parsed
+       - see sap.adt.aunit.AUnitResponseHandler.
+    """
+
+    def __init__(self, stream, name):
+        self._output = BufferedStream(stream)
+        self._critical = 0
 
-    for frame in islice(alert.stack, len(alert.stack) - 1):
-        print(escape(frame), file=stream)
+        self._output.write('<?xml version="1.0" encoding="UTF-8" ?>\n')
+        self._output.write(f'<testsuites name="{escape(name)}">\n')
 
-    print(escape(alert.stack[-1]), file=stream, end='')
+    def alert(self, _):
+        """Run alerts are not reported"""
 
-    print('</error>', file=stream)
+    def program(self, _):
+        """Programs are reported in test suites"""
 
+    def test_class(self, program, test_class):
+        """Writes the test class as a test suite"""
 
-def print_junit4(run_results, args, stream):
-    """Print results to stream in the form of JUnit"""
+        output = self._output
+        output.write(f'  <testsuite name="{escape(test_class.name)}" package="{escape(program.name)}" '
+                     f'tests="{len(test_class.test_methods)}"')
 
-    print('<?xml version="1.0" encoding="UTF-8" ?>', file=stream)
-    print(f'<testsuites name="{escape(args.name)}">', file=stream)
+        if not test_class.test_methods:
+            output.write('/>\n')
+            return
 
-    critical = 0
-    for program in run_results.programs:
-        for test_class in program.test_classes:
-            print(f'  <testsuite name="{escape(test_class.name)}" package="{escape(program.name)}" \
-tests="{len(test_class.test_methods)}"', file=stream, end='')
+        output.write('>\n')
 
-            if not test_class.test_methods:
-                print('/>', file=stream)
+        tc_class_name = test_class.name
+        if program.name != test_class.name:
+            tc_class_name = f'{program.name}=>{test_class.name}'
+
+        tc_class_name = escape(tc_class_name)
+
+        for test_method in test_class.test_methods:
+            if test_method.status == TestMethodStatus.ERR:
+                self._critical += 1
+
+            output.write(f'    <testcase name="{escape(test_method.name)}" classname="{tc_class_name}" '
+                         f'status="{escape(test_method.status)}"')
+
+            if not test_method.alerts:
+                output.write('/>\n')
                 continue
 
-            print('>', file=stream)
+            output.write('>\n')
 
-            tc_class_name = test_class.name
-            if program.name != test_class.name:
-                tc_class_name = f'{program.name}=>{test_class.name}'
+            for alert in test_method.alerts:
+                print_junit4_system_err(output, alert.details, '      ')
+                print_junit4_testcase_error(output, alert, '      ')
 
-            tc_class_name = escape(tc_class_name)
+            output.write('    </testcase>\n')
 
-            for test_method in test_class.test_methods:
-                status = None
+        output.write('  </testsuite>\n')
 
-                if any((alert.is_error for alert in test_method.alerts)):
-                    critical += 1
-                    status = 'ERR'
-                elif any((alert.is_warning for alert in test_method.alerts)):
-                    status = 'SKIP'
-                else:
-                    status = 'OK'
+    def close(self):
+        """Finishes the document and returns the number of failed tests"""
 
-                print(f'    <testcase name="{escape(test_method.name)}" classname="{tc_class_name}" \
-status="{escape(status)}"',
-                      file=stream, end='')
+        self._output.write('</testsuites>\n')
+        self._output.flush()
 
-                if not test_method.alerts:
-                    print('/>', file=stream)
-                    continue
+        return self._critical
 
-                print('>', file=stream)
 
-                for alert in test_method.alerts:
-                    print_junit4_system_err(stream, alert.details, '      ')
-                    print_junit4_testcase_error(stream, alert, '      ')
+def print_junit4(run_results, name, stream):
+    """Print results to stream in the form of JUnit
 
-                print('    </testcase>', file=stream)
+       The parameter name is the name of the test suites or an object with
+       the member name - e.g. the command line arguments.
+    """
 
-            print('  </testsuite>', file=stream)
+    writer = JUnit4Writer(stream, getattr(name, 'name', name))
+    sap.adt.aunit.feed_run_results(run_results, writer)
 
-    print('</testsuites>', file=stream)
+    return writer.close()
 
-    return critical
 
+def print_raw(aunit_xmls, run_results):
+    """Prints out raw XML results of all test runs"""
 
-def print_raw(aunit_xml, run_results):
-    """Prints out raw XML results"""
+    for aunit_xml in aunit_xmls:
+        print(aunit_xml)
 
-    print(aunit_xml)
+    return sum(1 for program in run_results.programs
+               for test_class in program.test_classes
+               for test_method in test_class.test_methods
+               if test_method.status == TestMethodStatus.ERR)
 
-    critical = 0
-    for program in run_results.programs:
-        for test_class in program.test_classes:
-            for test_method in test_class.test_methods:
-                if any((alert.is_error for alert in test_method.alerts)):
-                    critical += 1
 
-    return critical
+# ADT object type -> abapGit file name suffix
+SOURCE_FILE_SUFFIXES = {'CLAS/OC': 'clas', 'PROG/P': 'prog', 'FUGR/F': 'fugr', 'INTF/OI': 'intf'}
+
+# ADT class include name -> abapGit file name suffix
+INCLUDE_FILE_SUFFIXES = {'definitions': 'locals_def', 'implementations': 'locals_imp'}
+
+
+def _coverage_objects(nodes, package=None):
+    """Yields the pairs (package name, object CoverageNode)"""
+
+    for node in nodes:
+        if node.typ == 'DEVC/K':
+            yield from _coverage_objects(node.nodes, node.name)
+        else:
+            yield (package or node.name, node)
+
+
+def _coverage_sources(coverage):
+    """Returns the dictionary package name -> list of pairs
+       (object CoverageNode, list of SourceCoverage of its includes)
+    """
+
+    includes = sap.adt.acoverage.includes_by_object(coverage.lines)
+
+    packages = {}
+    for package, node in _coverage_objects(coverage.nodes):
+        sources = sap.adt.acoverage.source_coverages(node, coverage.lines, includes)
+        packages.setdefault(package, []).append((node, sources))
+
+    return packages
+
+
+def _include_name(node, source):
+    """Returns the name of the source code include or None for the main source"""
+
+    path = source.uri[len(node.uri):] if source.uri.startswith(node.uri) else source.uri
+    if path.endswith('/source/main'):
+        path = path[:-len('/source/main')]
+
+    return path.rsplit('/', 1)[-1] or None
+
+
+def _source_class_name(node, source):
+    include = _include_name(node, source)
+    if include is None:
+        return node.name
+
+    return f'{node.name}.{include}'
+
+
+def _source_filename(node, source):
+    parts = [node.name.lower()]
+
+    suffix = SOURCE_FILE_SUFFIXES.get(node.typ, None)
+    if suffix is not None:
+        parts.append(suffix)
+
+    include = _include_name(node, source)
+    if include is not None:
+        parts.append(INCLUDE_FILE_SUFFIXES.get(include, include))
+
+    parts.append('abap')
+    return '.'.join(parts)
+
+
+def _methods(node, source):
+    """Returns the procedures of the object in the include"""
+
+    return [procedure for procedure in source.nodes if procedure is not node]
+
+
+def _rate(executed, total):
+    return f'{executed / total:.4f}' if total else '1.0000'
+
+
+def _sum_counter(nodes, typ):
+    """Returns the pair (executed, total) of the sums of the nodes' counters"""
+
+    counters = [node.counter(typ) for node in nodes]
+    return (sum(executed for executed, _ in counters), sum(total for _, total in counters))
+
+
+def _line_counters(source):
+    """Returns (covered, valid) lines of the include or statements if the
+       lines are not available.
+    """
+
+    if source.lines is None:
+        return _sum_counter(source.nodes, sap.adt.acoverage.COVERAGE_STATEMENT)
+
+    return (source.lines.covered, len(source.lines))
+
+
+def print_coverage_cobertura(coverage, _, stream):
+    """Writes the coverage in the form of Cobertura XML - a class per
+       source code include
+    """
+
+    output = BufferedStream(stream)
+
+    totals = [0, 0, 0, 0]
+    package_elems = []
+    for package, objects in _coverage_sources(coverage).items():
+        counters = [0, 0, 0, 0]
+        for _, sources in objects:
+            for source in sources:
+                covered, valid = _line_counters(source)
+                executed, total = _sum_counter(source.nodes, sap.adt.acoverage.COVERAGE_BRANCH)
+                counters[0] += covered
+                counters[1] += valid
+                counters[2] += executed
+                counters[3] += total
+
+        totals = [total + counter for total, counter in zip(totals, counters)]
+        package_elems.append((package, objects, counters))
+
+    output.write('<?xml version="1.0" ?>\n')
+    output.write('<!DOCTYPE coverage SYSTEM "http://cobertura.sourceforge.net/xml/coverage-04.dtd">\n')
+    output.write(f'<coverage line-rate="{_rate(totals[0], totals[1])}" branch-rate="{_rate(totals[2], totals[3])}" '
+                 f'lines-covered="{totals[0]}" lines-valid="{totals[1]}" '
+                 f'branches-covered="{totals[2]}" branches-valid="{totals[3]}" complexity="0" version="sapcli">\n')
+    output.write('  <sources>\n    <source>.</source>\n  </sources>\n')
+    output.write('  <packages>\n')
+
+    for package, objects, counters in package_elems:
+        output.write(f'    <package name="{escape(package)}" line-rate="{_rate(counters[0], counters[1])}" '
+                     f'branch-rate="{_rate(counters[2], counters[3])}" complexity="0">\n')
+        output.write('      <classes>\n')
+
+        for node, sources in objects:
+            for source in sources:
+                _print_cobertura_class(output, node, source)
+
+        output.write('      </classes>\n')
+        output.write('    </package>\n')
+
+    output.write('  </packages>\n')
+    output.write('</coverage>\n')
+    output.flush()
+
+
+def _print_cobertura_class(output, node, source):
+    """Writes Cobertura class of the object's source code include"""
+
+    covered, valid = _line_counters(source)
+    branches = _sum_counter(source.nodes, sap.adt.acoverage.COVERAGE_BRANCH)
 
+    output.write(f'        <class name="{escape(_source_class_name(node, source))}" '
+                 f'filename="{escape(_source_filename(node, source))}" '
+                 f'line-rate="{_rate(covered, valid)}" branch-rate="{_rate(*branches)}" complexity="0">\n')
+    output.write('          <methods>\n')
 
+    for method in _methods(node, source):
+        output.write(f'            <method name="{escape(method.name)}" signature="" '
+                     f'line-rate="{_rate(*method.counter(sap.adt.acoverage.COVERAGE_STATEMENT))}" '
+                     f'branch-rate="{_rate(*method.counter(sap.adt.acoverage.COVERAGE_BRANCH))}" '
+                     f'complexity="0">\n')
+        output.write('              <lines/>\n')
+        output.write('            </method>\n')
+
+    output.write('          </methods>\n')
+    output.write('          <lines>\n')
+
+    for number, hits in source.lines or ():
+        output.write(f'            <line number="{number}" hits="{hits}"/>\n')
+
+    output.write('          </lines>\n')
+    output.write('        </class>\n')
+
+
+# JaCoCo counter -> coverage counter type
+JACOCO_COUNTERS = (('INSTRUCTION', sap.adt.acoverage.COVERAGE_STATEMENT),
+                   ('BRANCH', sap.adt.acoverage.COVERAGE_BRANCH),
+                   ('METHOD', sap.adt.acoverage.COVERAGE_PROCEDURE))
+
+
+def _jacoco_counters(output, pad, nodes, lines=None):
+    """Writes JaCoCo counters of the sums of the nodes' numbers"""
+
+    for counter, typ in JACOCO_COUNTERS:
+        covered, total = _sum_counter(nodes, typ)
+
+        if total:
+            output.write(f'{pad}<counter type="{counter}" missed="{total - covered}" covered="{covered}"/>\n')
+
+    if lines:
+        output.write(f'{pad}<counter type="LINE" missed="{len(lines) - lines.covered}" covered="{lines.covered}"/>\n')
+
+
+def print_coverage_jacoco(coverage, name, stream):
+    """Writes the coverage in the form of JaCoCo XML - a class and
+       a source file per source code include
+    """
+
+    output = BufferedStream(stream)
+
+    output.write('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n')
+    output.write('<!DOCTYPE report PUBLIC "-//JACOCO//DTD Report 1.1//EN" "report.dtd">\n')
+    output.write(f'<report name="{escape(name)}">\n')
+
+    for package, objects in _coverage_sources(coverage).items():
+        output.write(f'  <package name="{escape(package)}">\n')
+
+        for node, sources in objects:
+            for source in sources:
+                output.write(f'    <class name="{escape(_source_class_name(node, source))}" '
+                             f'sourcefilename="{escape(_source_filename(node, source))}">\n')
+
+                for method in _methods(node, source):
+                    output.write(f'      <method name="{escape(method.name)}" desc="()">\n')
+                    _jacoco_counters(output, '        ', [method])
+                    output.write('      </method>\n')
+
+                _jacoco_counters(output, '      ', source.nodes)
+                output.write('    </class>\n')
+
+        for node, sources in objects:
+            for source in sources:
+                output.write(f'    <sourcefile name="{escape(_source_filename(node, source))}">\n')
+
+                # ADT measures branches per procedure only - the lines have no branch counters
+                for number, hits in source.lines or ():
+                    output.write(f'      <line nr="{number}" mi="{0 if hits else 1}" ci="{1 if hits else 0}"/>\n')
+
+                _jacoco_counters(output, '      ', source.nodes, source.lines)
+                output.write('    </sourcefile>\n')
+
+        _jacoco_counters(output, '    ', [node for node, _ in objects])
+        output.write('  </package>\n')
+
+    _jacoco_counters(output, '  ', [node for _, node in _coverage_objects(coverage.nodes)])
+    output.write('</report>\n')
+    output.flush()
+
+
+COVERAGE_PRINTERS = {
+    'cobertura': print_coverage_cobertura,
+    'jacoco': print_coverage_jacoco,
+}
+
+
+def _add_coverage(connection, coverages, run_results, adt_objects):
+    """Fetches coverage of the test run if it was measured"""
+
+    if run_results.coverage_identifier is None:
+        return
+
+    coverages.append(sap.adt.aunit.fetch_coverage(connection, run_results.coverage_identifier, adt_objects))
+
+
+def _run_objects(connection, args):
+    """Returns the list of tested ADT objects"""
+
+    types = {'program': sap.adt.Program, 'class': sap.adt.Class, 'package': sap.adt.Package}
+
+    if args.type is not None and args.type not in types:
+        raise SAPCliError(f'Unknown type: {args.type}')
+
+    if args.type is None and args.name:
+        raise InvalidCommandLineError('Object names given without object type')
+
+    adt_objects = []
+    for typ, name in object_lines(args):
+        try:
+            adt_objects.append(types[typ](connection, name))
+        except KeyError as ex:
+            raise SAPCliError(f'Unknown type: {typ}') from ex
+
+    if args.changed_since is not None:
+        known = set(adt_object.full_adt_uri for adt_object in adt_objects)
+        changed_objects = _changed_objects(connection, args.changed_since)
+        mod_log().info('Changed objects: %i', len(changed_objects))
+
+        # no changes means no tests instead of an error
+        return adt_objects + [obj for obj in changed_objects if obj.full_adt_uri not in known]
+
+    if not adt_objects:
+        raise InvalidCommandLineError('No objects to test')
+
+    return adt_objects
+
+
+def _run_name(args, adt_objects):
+    """Returns the short name of the test run used as the title of reports -
+       the tested object, the objects given on the command line or the source
+       of the other objects.
+    """
+
+    if len(adt_objects) == 1:
+        return adt_objects[0].name
+
+    if args.changed_since is not None:
+        return args.changed_since
+
+    if args.objects_file is not None:
+        return 'stdin' if args.objects_file == '-' else os.path.basename(args.objects_file)
+
+    return ', '.join(args.name)
+
+
+def _changed_objects(connection, changed_since):
+    """Returns the tested objects modified in the checkout whose directory
+       or manifest file is changed_since or else recorded in the transport
+       request or task changed_since.
+    """
+
+    if not os.path.exists(changed_since):
+        if TRANSPORT_NUMBER_RE.match(changed_since) is None:
+            raise InvalidCommandLineError(
+                f'Neither a checkout directory, manifest file nor transport number: {changed_since}')
+
+        return sap.adt.aunit.transport_tested_objects(connection, changed_since)
+
+    repo_dir = changed_since if os.path.isdir(changed_since) else os.path.dirname(changed_since)
+    manifest = sap.adt.checkout.CheckoutManifest.load(repo_dir)
+
+    return sap.adt.aunit.tested_objects(connection, manifest.changed_objects())
+
+
+def _shard_objects(adt_objects):
+    """Replaces packages with the tested objects of their hierarchies"""
+
+    shard_objects = []
+    known = set()
+
+    for adt_object in adt_objects:
+        if isinstance(adt_object, sap.adt.Package):
+            package_objects = sap.adt.aunit.package_tested_objects(adt_object)
+        else:
+            package_objects = [adt_object]
+
+        for obj in package_objects:
+            if obj.full_adt_uri in known:
+                continue
+
+            known.add(obj.full_adt_uri)
+            shard_objects.append(obj)
+
+    return shard_objects
+
+
+def _results_cache(connection, args):
+    """Returns the cache of run results or None if the results must not be
+       cached - with --no-cache or when the coverage is measured
+    """
+
+    if args.no_cache or args.coverage_output is not None:
+        return None
+
+    return sap.adt.aunit.run_results_cache(connection)
+
+
+def _run_sharded(connection, args, adt_objects, name, coverages, results_cache):
+    """Tests the classes and programs of the objects in parallel shards and
+       prints the merged results - returns (run_results, critical)
+    """
+
+    if args.jobs < 1:
+        raise InvalidCommandLineError(f'The number of jobs must be a positive number: {args.jobs}')
+
+    aunit = sap.adt.aunit.ShardedAUnit(connection, jobs=args.jobs, retries=args.retries,
+                                       coverage=args.coverage_output is not None, results_cache=results_cache)
+    shards = sap.adt.aunit.chunked_objects(_shard_objects(adt_objects), args.chunk_size)
+    shard_runs = list(aunit.iter_runs(shards))
+
+    run_results = sap.adt.aunit.merge_run_results([shard_run.run_results for shard_run in shard_runs])
+    coverages.extend(shard_run.coverage for shard_run in shard_runs if shard_run.coverage is not None)
+
+    if args.output == 'raw':
+        critical = print_raw([shard_run.aunit_xml for shard_run in shard_runs], run_results)
+    elif args.output == 'human':
+        critical = print_results_to_stream(run_results, sys.stdout)
+    else:
+        critical = print_junit4(run_results, name, sys.stdout)
+
+    return (run_results, critical)
+
+
+def _run_streamed(connection, args, adt_objects, name, coverages, results_cache):
+    """Tests the objects in chunks and writes the results as they are
+       downloaded - returns (run_results, critical)
+    """
+
+    if args.output == 'human':
+        writer = HumanWriter(sys.stdout)
+    else:
+        writer = JUnit4Writer(sys.stdout, name)
+
+    coverage = args.coverage_output is not None
+    aunit = sap.adt.AUnit(connection, results_cache=results_cache)
+    chunks_results = []
+    for chunk in sap.adt.aunit.chunked_objects(adt_objects, args.chunk_size):
+        chunks_results.append(aunit.execute_and_parse(chunk, consumer=writer, coverage=coverage)[1])
+        if coverage:
+            _add_coverage(connection, coverages, chunks_results[-1], chunk)
+
+    return (sap.adt.aunit.merge_run_results(chunks_results), writer.close())
+
+
+def _run_plain(connection, args, adt_objects, coverages, results_cache):
+    """Tests the objects in chunks and prints the raw results - returns
+       (run_results, critical)
+    """
+
+    coverage = args.coverage_output is not None
+    aunit = sap.adt.AUnit(connection, results_cache=results_cache)
+    aunit_xmls = []
+    chunks_results = []
+    for chunk in sap.adt.aunit.chunked_objects(adt_objects, args.chunk_size):
+        response, chunk_results = aunit.execute_and_parse(chunk, coverage=coverage)
+        aunit_xmls.append(response.text)
+        chunks_results.append(chunk_results)
+        if coverage:
+            _add_coverage(connection, coverages, chunks_results[-1], chunk)
+
+    run_results = sap.adt.aunit.merge_run_results(chunks_results)
+
+    return (run_results, print_raw(aunit_xmls, run_results))
+
+
+def _write_coverage(args, coverages, name):
+    """Writes the merged coverage to --coverage-output in --coverage-format"""
+
+    with open(args.coverage_output, 'w', encoding='utf-8') as dest:
+        COVERAGE_PRINTERS[args.coverage_format](sap.adt.acoverage.merge_coverages(coverages), name, dest)
+
+
+@CommandGroup.argument('--no-cache', action='store_true', default=False,
+                       help='Execute the tests even if the cache directory holds results of unchanged objects; '
+                            'the results of passed runs are cached whenever --cache-dir or SAPCLI_CACHE_DIR '
+                            'is set')
+@CommandGroup.argument('--coverage-format', choices=list(COVERAGE_PRINTERS.keys()), default='cobertura',
+                       help='Format of the code coverage file; default == cobertura')
+@CommandGroup.argument('--coverage-output', default=None, type=str,
+                       help='Measure code coverage and write it to the given file')
+@CommandGroup.argument('--changed-since', default=None, type=str,
+                       help='Test only classes and programs modified in the checkout with the given directory or '
+                            'manifest file or recorded in the given transport request or task')
+@CommandGroup.argument('--retries', default=sap.adt.aunit.DEFAULT_SHARD_RETRIES, type=int,
+                       help=f'Number of repeated runs of a failed shard; default == '
+                            f'{sap.adt.aunit.DEFAULT_SHARD_RETRIES}')
+@CommandGroup.argument('-j', '--jobs', default=1, type=int,
+                       help='Number of shards tested in parallel; default == 1')
+@CommandGroup.argument('--shard', action='store_true', default=False,
+                       help='Test classes and programs of packages in shards of --chunk-size objects')
+@CommandGroup.argument('-c', '--chunk-size', default=sap.adt.aunit.DEFAULT_RUN_CHUNK_SIZE, type=int,
+                       help=f'Maximum number of objects tested in one run; default == '
+                            f'{sap.adt.aunit.DEFAULT_RUN_CHUNK_SIZE}')
+@CommandGroup.argument('-f', '--objects-file', default=None, type=str,
+                       help='File with lines "TYPE NAME" of further tested objects or - for stdin')
 @CommandGroup.argument('--output', choices=['raw', 'human', 'junit4'], default='human')
-@CommandGroup.argument('name')
-@CommandGroup.argument('type', choices=['program', 'class', 'package'])
+@CommandGroup.argument('name', nargs='*')
+@CommandGroup.argument('type', nargs='?', choices=['program', 'class', 'package'])
 @CommandGroup.command()
 def run(connection, args):
     """Prints it out based on command line configuration.
 
+       All the given objects are tested in runs of at most --chunk-size
+       objects whose results are merged.
+
+       With --shard, the packages are replaced with the classes and programs
+       of their hierarchies and --jobs runs (shards) are executed in
+       parallel.
+
+       With --changed-since, the classes and programs modified since the
+       last checkout or recorded in a transport request are tested too.
+
+       With --coverage-output, the code coverage of every run is fetched
+       and written to the file in --coverage-format.
+
+       If the connection has the cache directory, the results of passed
+       runs are stored there and replayed by the next runs of the same
+       unchanged objects unless --no-cache is given.
+
        Exceptions:
          - SAPCliError:
            - when the given type does not belong to the type white list
     """
 
-    types = {'program': sap.adt.Program, 'class': sap.adt.Class, 'package': sap.adt.Package}
-    try:
-        typ = types[args.type]
-    except KeyError:
-        raise SAPCliError(f'Unknown type: {args.type}')
+    adt_objects = _run_objects(connection, args)
+    name = _run_name(args, adt_objects)
 
-    aunit = sap.adt.AUnit(connection)
-    obj = typ(connection, args.name)
-    response = aunit.execute(obj)
-    run_results = sap.adt.aunit.parse_run_results(response.text)
+    if args.output not in ('human', 'raw', 'junit4'):
+        raise SAPCliError(f'Unsupported output type: {args.output}')
 
-    if args.output == 'human':
-        return print_results_to_stream(run_results, sys.stdout)
+    coverages = []
+    results_cache = _results_cache(connection, args)
 
-    if args.output == 'raw':
-        return print_raw(response.text, run_results)
+    if args.shard:
+        _, critical = _run_sharded(connection, args, adt_objects, name, coverages, results_cache)
+    elif args.output in ('human', 'junit4'):
+        _, critical = _run_streamed(connection, args, adt_objects, name, coverages, results_cache)
+    else:
+        _, critical = _run_plain(connection, args, adt_objects, coverages, results_cache)
 
-    if args.output == 'junit4':
-        return print_junit4(run_results, args, sys.stdout)
+    if args.coverage_output is not None:
+        _write_coverage(args, coverages, name)
 
-    raise SAPCliError(f'Unsupported output type: {args.output}')
+    return critical
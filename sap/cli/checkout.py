@@ -2,9 +2,11 @@
 
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 import sap.adt
 import sap.cli.core
+from sap.adt.checkout import CheckoutManifest
 
 from sap.platform.abap.ddic import VSEOCLASS, PROGDIR, TPOOL, VSEOINTERF, DEVC
 from sap.platform.language import iso_code_to_sap_code
@@ -42,6 +44,8 @@ def dump_attributes_to_file(object_name, abap_attributes, typsfx, ag_serializer,
 
         writer.close()
 
+    return filename
+
 
 def download_abap_source(object_name, source_object, typsfx, destdir=None):
     """Reads the text and saves it in the corresponding file"""
@@ -50,6 +54,8 @@ def download_abap_source(object_name, source_object, typsfx, destdir=None):
     with open(filename, 'w') as dest:
         dest.write(source_object.text)
 
+    return filename
+
 
 def build_class_abap_attributes(clas):
     """Returns populated ABAP structure with attributes"""
@@ -70,19 +76,37 @@ def build_class_abap_attributes(clas):
     return vseoclass
 
 
-def checkout_class(connection, name, destdir=None):
+def _checkout_object(adt_object, destdir, manifest, download):
+    """Downloads the object's files without the manifest or if the manifest
+       does not consider the object up to date.
+    """
+
+    if manifest is None:
+        download()
+    else:
+        manifest.checkout(adt_object, destdir, download)
+
+
+def checkout_class(connection, name, destdir=None, manifest=None):
     """Download entire class"""
 
     clas = sap.adt.Class(connection, name)
     clas.fetch()
 
-    download_abap_source(name, clas, '.clas', destdir=destdir)
-    download_abap_source(name, clas.definitions, '.clas.locals_def', destdir=destdir)
-    download_abap_source(name, clas.implementations, '.clas.locals_imp', destdir=destdir)
-    download_abap_source(name, clas.test_classes, '.clas.testclasses', destdir=destdir)
+    def download():
+        files = [
+            download_abap_source(name, clas, '.clas', destdir=destdir),
+            download_abap_source(name, clas.definitions, '.clas.locals_def', destdir=destdir),
+            download_abap_source(name, clas.implementations, '.clas.locals_imp', destdir=destdir),
+            download_abap_source(name, clas.test_classes, '.clas.testclasses', destdir=destdir)
+        ]
+
+        vseoclass = build_class_abap_attributes(clas)
+        files.append(dump_attributes_to_file(name, (vseoclass,), '.clas', 'LCL_OBJECT_CLAS', destdir=destdir))
 
-    vseoclass = build_class_abap_attributes(clas)
-    dump_attributes_to_file(name, (vseoclass,), '.clas', 'LCL_OBJECT_CLAS', destdir=destdir)
+        return files
+
+    _checkout_object(clas, destdir, manifest, download)
 
 
 @CommandGroup.argument('name')
@@ -112,16 +136,19 @@ def build_program_abap_attributes(adt_program):
     return (progdir, tpool)
 
 
-def checkout_program(connection, name, destdir=None):
+def checkout_program(connection, name, destdir=None, manifest=None):
     """Download program sources"""
 
     adt_program = sap.adt.Program(connection, name)
     adt_program.fetch()
 
-    download_abap_source(name, adt_program, '.prog', destdir=destdir)
+    def download():
+        progdir, tpool = build_program_abap_attributes(adt_program)
+
+        return [download_abap_source(name, adt_program, '.prog', destdir=destdir),
+                dump_attributes_to_file(name, (progdir, tpool), '.prog', 'LCL_OBJECT_PROG', destdir=destdir)]
 
-    progdir, tpool = build_program_abap_attributes(adt_program)
-    dump_attributes_to_file(name, (progdir, tpool), '.prog', 'LCL_OBJECT_PROG', destdir=destdir)
+    _checkout_object(adt_program, destdir, manifest, download)
 
 
 @CommandGroup.argument('name')
@@ -148,16 +175,19 @@ def build_interface_abap_attributes(adt_intf):
     return vseointerf
 
 
-def checkout_interface(connection, name, destdir=None):
+def checkout_interface(connection, name, destdir=None, manifest=None):
     """Download interface sources"""
 
     intf = sap.adt.Interface(connection, name)
     intf.fetch()
 
-    download_abap_source(name, intf, '.intf', destdir=destdir)
+    def download():
+        vseointerf = build_interface_abap_attributes(intf)
 
-    vseointerf = build_interface_abap_attributes(intf)
-    dump_attributes_to_file(name, (vseointerf,), '.prog', 'LCL_OBJECT_INTF', destdir=destdir)
+        return [download_abap_source(name, intf, '.intf', destdir=destdir),
+                dump_attributes_to_file(name, (vseointerf,), '.prog', 'LCL_OBJECT_INTF', destdir=destdir)]
+
+    _checkout_object(intf, destdir, manifest, download)
 
 
 @CommandGroup.argument('name')
@@ -168,8 +198,16 @@ def interface(connection, args):
     checkout_interface(connection, args.name.upper())
 
 
-def checkout_objects(connection, objects, destdir=None):
-    """Checkout all objects from the give list"""
+def checkout_objects(connection, objects, destdir=None, executor=None, manifest=None):
+    """Checkout all objects from the give list
+
+       If the parameter executor is not None, the objects are checked out
+       asynchronously via executor.submit() and the function returns the list
+       of tuples (object, future) in the order of the given objects.
+
+       If the parameter manifest is not None, sources of objects recorded in
+       the manifest are downloaded only if the objects were changed.
+    """
 
     # This could be a global variable but it breaks mock patching in tests
     checkouters = {
@@ -181,11 +219,40 @@ def checkout_objects(connection, objects, destdir=None):
     if not os.path.isdir(destdir):
         os.makedirs(destdir)
 
+    submitted = []
+
     for obj in objects:
         try:
-            checkouters[obj.typ](connection, obj.name, destdir)
+            checkouter = checkouters[obj.typ]
         except KeyError:
             print(f'Unsupported object: {obj.typ} {obj.name}', file=sys.stderr)
+            continue
+
+        if executor is None:
+            checkouter(connection, obj.name, destdir, manifest=manifest)
+        else:
+            submitted.append((obj, executor.submit(checkouter, connection, obj.name, destdir, manifest=manifest)))
+
+    return submitted
+
+
+def report_failed_checkouts(submitted):
+    """Waits for all submitted checkouts and prints out the failed objects.
+
+       Returns the number of failed objects.
+    """
+
+    failed = 0
+
+    for obj, future in submitted:
+        error = future.exception()
+        if error is None:
+            continue
+
+        failed += 1
+        print(f'Failed to checkout {obj.typ} {obj.name}: {error}', file=sys.stderr)
+
+    return failed
 
 
 def make_repo_dir_for_package(args):
@@ -226,6 +293,10 @@ def checkout_package(connection, name, destdir=None):
 
 
 # @CommandGroup.argument('--folder-logic', choices=['full', 'prefix'], default='prefix')
+@CommandGroup.argument('-j', '--jobs', type=int, default=1,
+                       help='Number of objects downloaded in parallel; default = 1')
+@CommandGroup.argument('--force', action='store_true', default=False,
+                       help='Download all objects even if they have not been changed since the last checkout')
 @CommandGroup.argument('--recursive', action='store_true', default=False)
 @CommandGroup.argument('--starting-folder', default='src')
 @CommandGroup.argument('directory', nargs='?', default=None,
@@ -235,27 +306,50 @@ def checkout_package(connection, name, destdir=None):
 def package(connection, args):
     """Download sources of objects from the given ABAP package"""
 
+    if args.jobs < 1:
+        raise sap.cli.core.InvalidCommandLineError(f'The number of jobs must be a positive number: {args.jobs}')
+
     repo_dir = make_repo_dir_for_package(args)
     source_code_dir = os.path.join(repo_dir, args.starting_folder)
 
+    manifest = CheckoutManifest.load(repo_dir, force=args.force)
+
     explored = sap.adt.Package(connection, args.name)
 
-    for package_name_hier, _, objects in sap.adt.package.walk(explored):
-        destdir = os.path.abspath(source_code_dir)
+    executor = None
+    if args.jobs > 1:
+        executor = ThreadPoolExecutor(max_workers=args.jobs)
 
-        if len(package_name_hier) == 1:
-            destdir = os.path.join(destdir, package_name_hier[0].lower())
-        elif len(package_name_hier) > 1:
-            hier_path = os.path.join(*package_name_hier)
-            destdir = os.path.join(destdir, hier_path.lower())
+    submitted = []
 
-        if not package_name_hier:
-            package_name = args.name
-        else:
-            package_name = package_name_hier[-1]
+    try:
+        for package_name_hier, _, objects in sap.adt.package.walk(explored):
+            destdir = os.path.abspath(source_code_dir)
+
+            if len(package_name_hier) == 1:
+                destdir = os.path.join(destdir, package_name_hier[0].lower())
+            elif len(package_name_hier) > 1:
+                hier_path = os.path.join(*package_name_hier)
+                destdir = os.path.join(destdir, hier_path.lower())
+
+            if not package_name_hier:
+                package_name = args.name
+            else:
+                package_name = package_name_hier[-1]
+
+            submitted.extend(checkout_objects(connection, objects, destdir=destdir, executor=executor,
+                                              manifest=manifest))
+            checkout_package(connection, package_name.upper(), destdir=destdir)
+
+            if not args.recursive:
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+        manifest.save()
 
-        checkout_objects(connection, objects, destdir=destdir)
-        checkout_package(connection, package_name.upper(), destdir=destdir)
+    if report_failed_checkouts(submitted):
+        return 1
 
-        if not args.recursive:
-            break
+    return 0
@@ -1,5 +1,7 @@
 """CLI basic functionality"""
 
+import sys
+
 from sap.errors import SAPCliError
 
 
@@ -193,3 +195,34 @@ def printout(*objects, sep=' ', end='\n'):
     """A shortcut for get_console().printout()"""
 
     get_console().printout(*objects, sep=sep, end=end)
+
+
+def object_lines(args):
+    """Yields the pairs (type, name) from the command line and the objects
+       file where each line is "TYPE NAME"; empty lines and lines starting
+       with # are ignored.
+    """
+
+    for name in args.name:
+        yield (args.type, name)
+
+    if args.objects_file is None:
+        return
+
+    if args.objects_file == '-':
+        lines = sys.stdin.readlines()
+    else:
+        with open(args.objects_file, 'r', encoding='utf-8') as objects_file:
+            lines = objects_file.readlines()
+
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        try:
+            typ, name = line.split()
+        except ValueError as ex:
+            raise InvalidCommandLineError(f'Invalid object line: {line}') from ex
+
+        yield (typ, name)
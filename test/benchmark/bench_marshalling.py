@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""Measures deserialization of large ADT responses
+
+Run from the repository root:
+
+    PYTHONPATH=. python3 test/benchmark/bench_marshalling.py [--findings N] [--nodes N] [--objects N] [--tests N]
+                                                             [--repeat N]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+from io import StringIO
+from types import SimpleNamespace
+from functools import partial
+
+import xml.sax
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'unit'))
+
+# pylint: disable=wrong-import-position
+import sap.adt  # noqa: E402
+from sap.adt.objects import ADTObjectSets  # noqa: E402
+from sap.adt.atc import RunRequest, WorkList, iter_worklist_response  # noqa: E402
+from sap.adt.annotations import XmlAttributeProperty, XmlElementProperty, XmlElementKind  # noqa: E402
+from sap import get_logger  # noqa: E402
+from sap.adt.marshalling import Marshal, MarshallingError, Element, ADTObjectSAXHandler  # noqa: E402
+from sap.adt.marshalling import adt_object_to_element_name  # noqa: E402
+from sap.adt.repository import NodeStructureXMLHandler  # noqa: E402
+from sap.adt.aunit import parse_run_results, parse_run_results_response  # noqa: E402
+from sap.cli.aunit import print_junit4, JUnit4Writer  # noqa: E402
+
+from fixtures_adt_atc import ADT_XML_ATC_WORKLIST_CLASS  # noqa: E402
+from fixtures_adt_repository import PACKAGE_SOURCE_LIBRARY_NODESTRUCUTRE_XML  # noqa: E402
+from fixtures_adt_aunit import AUNIT_RESULTS_XML  # noqa: E402
+
+
+def _replicate(document, start_tag, end_tag, count):
+    """Repeats the first element enclosed by the tags count times"""
+
+    start = document.index(start_tag)
+    end = document.index(end_tag, start) + len(end_tag)
+
+    return document[:start] + document[start:end] * count + document[end:]
+
+
+def large_worklist(findings):
+    """Returns ATC worklist XML with 10 findings per object"""
+
+    worklist = _replicate(ADT_XML_ATC_WORKLIST_CLASS, '<atcfinding:finding', '</atcfinding:finding>', 10)
+    return _replicate(worklist, '<atcobject:object ', '</atcobject:object>', max(1, findings // 10))
+
+
+def large_node_structure(nodes):
+    """Returns repository node structure XML with the given number of nodes"""
+
+    return _replicate(PACKAGE_SOURCE_LIBRARY_NODESTRUCUTRE_XML, '<SEU_ADT_REPOSITORY_OBJ_NODE>',
+                      '</SEU_ADT_REPOSITORY_OBJ_NODE>', nodes)
+
+
+def large_aunit_results(tests):
+    """Returns AUnit run results XML with 6 test methods per program"""
+
+    return _replicate(AUNIT_RESULTS_XML, '<program ', '</program>', max(1, tests // 6))
+
+
+def large_run_request(objects):
+    """Returns ATC run request for the given number of classes"""
+
+    connection = SimpleNamespace(uri='sap/bc/adt')
+
+    obj_sets = ADTObjectSets()
+    for i in range(objects):
+        obj_sets.include_object(sap.adt.Class(connection, f'ZCL_BENCHMARK_{i:06}'))
+
+    return RunRequest(obj_sets, 100)
+
+
+class TreeMarshal(Marshal):
+    """The former serializer building the intermediate tree of Elements"""
+
+    def serialize(self, adt_object):
+        return self._tree_to_xml(self._object_to_tree(adt_object))
+
+    def _object_to_tree(self, adt_object):
+        """Create a DOM like representation of the given ADT object"""
+
+        objtype = adt_object.objtype
+        name = adt_object_to_element_name(adt_object)
+
+        root = Element(name)
+        declared_ns = self._declare_xmlns(root, objtype.xmlnamespace)
+
+        if objtype.code is not None:
+            root.add_attribute('adtcore:type', objtype.code)
+
+        self._build_tree(root, adt_object, declared_ns)
+        return root
+
+    def _serialize_object_to_node(self, root, node_name, child, declared_ns, kind):
+
+        if not isinstance(child, list):
+            # Put a solo object to a list to simplify
+            # the algorithm below - this might be a bad idea.
+            child = [child]
+
+        for item in child:
+
+            new_ns = None
+            if hasattr(item, 'objtype'):
+                if hasattr(item.objtype, 'xmlnamespace'):
+                    new_ns = item.objtype.xmlnamespace
+
+            if node_name is XmlElementProperty.NAME_FROM_OBJECT:
+                child_name = adt_object_to_element_name(item)
+                child_elem = root.add_child(child_name)
+            else:
+                child_elem = root.add_child(node_name)
+
+            if new_ns is None:
+                child_ns = declared_ns
+            else:
+                child_ns = self._declare_xmlns(child_elem, new_ns, declared_ns)
+
+            if kind == XmlElementKind.OBJECT:
+                self._build_tree(child_elem, item, child_ns)
+            elif kind == XmlElementKind.TEXT:
+                child_elem.text = item
+            else:
+                raise MarshallingError()
+
+    def _build_tree(self, root, obj, declared_ns):
+        """Convert ADT Object members to XML elements"""
+
+        if obj is None:
+            return
+
+        for attr_name in obj.__class__.__ordered__:
+            if attr_name.startswith('_'):
+                continue
+
+            attr = getattr(obj.__class__, attr_name)
+
+            if isinstance(attr, XmlElementProperty):
+                child = getattr(obj, attr_name)
+                self._serialize_object_to_node(root, attr.name, child, declared_ns, attr.kind)
+            elif isinstance(attr, XmlAttributeProperty):
+                if not attr.serialize:
+                    continue
+
+                value = getattr(obj, attr_name)
+                if value is not None:
+                    root.add_attribute(attr.name, value)
+
+    def _tree_to_xml(self, tree):
+        """Turn the given abstract XML tree to XML string"""
+
+        body = '<?xml version="1.0" encoding="UTF-8"?>\n'
+
+        return body + self._element_to_xml(tree)
+
+    def _element_to_xml(self, tree):
+        """Turn the given element and its children to XML string"""
+
+        xml_str = f'<{tree.name}'
+
+        attributes = ' '.join(f'{key}="{value}"' for key, value in tree.attributes.items())
+        if attributes:
+            xml_str += f' {attributes}'
+
+        content = tree.text
+
+        if content is None and tree.children:
+            subnode = str('\n'.join((self._element_to_xml(child) for child in tree.children)))
+            content = f'\n{subnode}\n'
+
+        if content is not None:
+            xml_str += f'>{content}</{tree.name}>'
+        else:
+            xml_str += '/>'
+
+        return xml_str
+
+
+def _factory_with_setter(factory, setter, obj):
+    product = factory()
+    setter(obj, product)
+    return product
+
+
+class AnnotationsElementHandler:
+    """The former element handler examining the annotations of every
+       deserialized object
+    """
+
+    def __init__(self, my_xpath, elements, factory=None, textproperty=None):
+        self.my_xpath = my_xpath
+        self.elements = elements
+        self.factory = factory
+        self.attributes = None
+        self.obj = None
+        self.textproperty = textproperty
+        self._textvalue = None
+
+    def new(self):
+        """Returns a new object"""
+
+        self.obj = self.factory()
+
+        if self.textproperty is None:
+            self.attributes = self.load_definitions(self.obj)
+
+    def set(self, attr_name, value):
+        """Sets object's property value"""
+
+        get_logger().debug('Going to set XML attribute property: %s', attr_name)
+
+        if self.textproperty is not None:
+            raise MarshallingError()
+
+        try:
+            self.attributes[attr_name].__set__(self.obj, value)
+            get_logger().debug('Set XML attribute property: %s', attr_name)
+        except AttributeError as ex:
+            get_logger().error('XML property %s: %s', attr_name, str(ex))
+        except KeyError:
+            get_logger().debug('Not an XML attribute property: %s', attr_name)
+
+    def clear_text(self):
+        """Clear text value"""
+
+        if self.textproperty is not None:
+            self._textvalue = ''
+
+    def append_text(self, chunk):
+        """Appends text chunk"""
+
+        if self.textproperty is None:
+            if not chunk.isspace():
+                raise MarshallingError()
+
+            return
+
+        self._textvalue += chunk
+
+    def set_text(self):
+        """Sets the text value"""
+
+        if self.textproperty is None:
+            if self._textvalue is not None and not self._textvalue.isspace():
+                raise MarshallingError()
+
+            return
+
+        self.textproperty.__set__(self.obj, self._textvalue)
+
+    def load_definitions(self, obj):
+        """Examines annotations of the current object"""
+
+        attributes = {}
+        for attr_name in obj.__class__.__ordered__:
+            if attr_name.startswith('__'):
+                continue
+
+            attr = getattr(obj.__class__, attr_name)
+
+            if isinstance(attr, XmlElementProperty):
+                if not attr.deserialize:
+                    continue
+
+                xml_path = f'{self.my_xpath}/{attr.name}'
+
+                if attr.kind == XmlElementKind.TEXT:
+                    self.elements[xml_path] = AnnotationsElementHandler(xml_path, self.elements,
+                                                                        factory=lambda: obj, textproperty=attr)
+                    continue
+
+                factory = attr.factory
+
+                if factory is None:
+                    factory = partial(attr.__get__, obj)
+
+                if attr.fset is not None:
+                    factory = partial(_factory_with_setter, factory, attr.__set__, obj)
+
+                self.elements[xml_path] = AnnotationsElementHandler(xml_path, self.elements, factory)
+            elif isinstance(attr, XmlAttributeProperty):
+                if attr.deserialize:
+                    attributes[attr.name] = attr
+
+        return attributes
+
+
+def annotations_deserialize(xml_text, adt_object):
+    """The former deserialization examining annotations of every object"""
+
+    name = '/' + adt_object_to_element_name(adt_object)
+
+    elements = {}
+    elements[name] = AnnotationsElementHandler(name, elements, lambda: adt_object)
+
+    xml.sax.parseString(xml_text, ADTObjectSAXHandler(elements))
+
+    return adt_object
+
+
+def _worklist_findings(worklist):
+    return [(obj.name, finding.location, finding.message_id, finding.priority)
+            for obj in worklist.objects for finding in obj.findings]
+
+
+def measure(title, func, repeat):
+    """Prints the best time of the repeated runs"""
+
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    print(f'{title:<50} {best:8.3f} s')
+
+
+def measure_memory(title, func):
+    """Prints the memory allocated by the objects returned from func"""
+
+    tracemalloc.start()
+    try:
+        result = func()
+        allocated, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    del result
+    print(f'{title:<50} {allocated / 2**20:8.1f} MiB')
+
+
+def measure_peak_memory(title, func):
+    """Prints the peak memory allocated while running func"""
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    print(f'{title:<50} {peak / 2**20:8.1f} MiB')
+
+
+class StreamedResponse:
+    """HTTP response of a request executed with stream=True"""
+
+    def __init__(self, text):
+        self._content = text.encode('utf-8')
+
+    def iter_content(self, chunk_size):
+        """Yields the body block by block"""
+
+        for start in range(0, len(self._content), chunk_size):
+            yield self._content[start:start + chunk_size]
+
+    def close(self):
+        """Releases the connection"""
+
+
+def consume_worklist_stream(response):
+    """Iterates over the streamed worklist without keeping the findings"""
+
+    for _ in iter_worklist_response(response, WorkList()):
+        pass
+
+
+def junit4_from_tree(aunit_xml):
+    """Parses the whole results and writes JUnit"""
+
+    print_junit4(parse_run_results(aunit_xml), 'BENCHMARK', StringIO())
+
+
+def junit4_from_stream(response):
+    """Writes JUnit as the results are parsed"""
+
+    writer = JUnit4Writer(StringIO(), 'BENCHMARK')
+    parse_run_results_response(response, writer)
+    writer.close()
+
+
+def main(argv):
+    """Runs the benchmarks"""
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--findings', type=int, default=50000)
+    parser.add_argument('--nodes', type=int, default=20000)
+    parser.add_argument('--objects', type=int, default=20000)
+    parser.add_argument('--tests', type=int, default=30000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    worklist_xml = large_worklist(args.findings)
+    node_structure_xml = large_node_structure(args.nodes)
+
+    if _worklist_findings(annotations_deserialize(worklist_xml, WorkList())) != \
+            _worklist_findings(Marshal.deserialize(worklist_xml, WorkList())):
+        sys.exit('The annotations and plan deserializers produce different objects')
+
+    measure(f'ATC worklist ({args.findings} findings) - annotations',
+            lambda: annotations_deserialize(worklist_xml, WorkList()), args.repeat)
+    measure(f'ATC worklist ({args.findings} findings)',
+            lambda: Marshal.deserialize(worklist_xml, WorkList()), args.repeat)
+    measure_memory(f'ATC worklist ({args.findings} findings) - memory',
+                   lambda: Marshal.deserialize(worklist_xml, WorkList()))
+    # the body is allocated before the measurement as it would be on the wire
+    response = StreamedResponse(worklist_xml)
+    measure(f'ATC worklist ({args.findings} findings) - stream',
+            lambda: consume_worklist_stream(response), args.repeat)
+    measure_peak_memory(f'ATC worklist ({args.findings} findings) - peak',
+                        lambda: Marshal.deserialize_response(response, WorkList()))
+    measure_peak_memory(f'ATC worklist ({args.findings} findings) - stream peak',
+                        lambda: consume_worklist_stream(response))
+    measure(f'Node structure ({args.nodes} nodes)',
+            lambda: xml.sax.parseString(node_structure_xml, NodeStructureXMLHandler()), args.repeat)
+
+    aunit_xml = large_aunit_results(args.tests)
+    response = StreamedResponse(aunit_xml)
+    measure(f'AUnit JUnit4 ({args.tests} tests) - tree',
+            lambda: junit4_from_tree(aunit_xml), args.repeat)
+    measure(f'AUnit JUnit4 ({args.tests} tests) - stream',
+            lambda: junit4_from_stream(response), args.repeat)
+    measure_peak_memory(f'AUnit JUnit4 ({args.tests} tests) - tree peak',
+                        lambda: junit4_from_tree(aunit_xml))
+    measure_peak_memory(f'AUnit JUnit4 ({args.tests} tests) - stream peak',
+                        lambda: junit4_from_stream(response))
+
+    run_request = large_run_request(args.objects)
+    tree_marshal = TreeMarshal()
+    marshal = Marshal()
+
+    if tree_marshal.serialize(run_request) != marshal.serialize(run_request):
+        sys.exit('The tree and writer serializers produce different XML')
+
+    measure(f'ATC run request ({args.objects} objects) - tree',
+            lambda: tree_marshal.serialize(run_request), args.repeat)
+    measure(f'ATC run request ({args.objects} objects) - writer',
+            lambda: marshal.serialize(run_request), args.repeat)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Compares XML parser backends on large ADT responses
+
+Run from the repository root:
+
+    PYTHONPATH=. python3 test/benchmark/bench_xmlparser.py [--findings N] [--nodes N] [--programs N] [--repeat N]
+"""
+
+import os
+import sys
+import argparse
+from xml.sax.handler import ContentHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'unit'))
+
+# pylint: disable=wrong-import-position
+import sap.adt.xmlparser  # noqa: E402
+from sap.adt.atc import WorkList  # noqa: E402
+from sap.adt.aunit import AUnitResponseHandler  # noqa: E402
+from sap.adt.marshalling import Marshal  # noqa: E402
+from sap.adt.repository import NodeStructureXMLHandler  # noqa: E402
+
+from fixtures_adt_aunit import AUNIT_RESULTS_XML  # noqa: E402
+
+from bench_marshalling import large_worklist, large_node_structure, measure, _replicate  # noqa: E402
+
+
+def large_aunit_results(programs):
+    """Returns AUnit run results XML with the given number of programs"""
+
+    return _replicate(AUNIT_RESULTS_XML, '<program ', '</program>', programs)
+
+
+def main(argv):
+    """Runs the benchmarks"""
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--findings', type=int, default=50000)
+    parser.add_argument('--nodes', type=int, default=20000)
+    parser.add_argument('--programs', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    worklist_xml = large_worklist(args.findings)
+    node_structure_xml = large_node_structure(args.nodes)
+    aunit_results_xml = large_aunit_results(args.programs)
+
+    backends = [backend for backend in sap.adt.xmlparser.XML_PARSERS
+                if backend != sap.adt.xmlparser.XML_PARSER_LXML or sap.adt.xmlparser.etree is not None]
+
+    for backend in backends:
+        os.environ['SAPCLI_XML_PARSER'] = backend
+
+        # the cost of the parser alone without any processing in handlers
+        measure(f'{backend}: ATC worklist - no-op handler',
+                lambda: sap.adt.xmlparser.parse_xml(worklist_xml, ContentHandler()), args.repeat)
+
+        measure(f'{backend}: ATC worklist ({args.findings} findings)',
+                lambda: Marshal.deserialize(worklist_xml, WorkList()), args.repeat)
+        measure(f'{backend}: Node structure - no-op handler',
+                lambda: sap.adt.xmlparser.parse_xml(node_structure_xml, ContentHandler()), args.repeat)
+        measure(f'{backend}: Node structure ({args.nodes} nodes)',
+                lambda: sap.adt.xmlparser.parse_xml(node_structure_xml, NodeStructureXMLHandler()), args.repeat)
+        measure(f'{backend}: AUnit results ({args.programs} programs)',
+                lambda: sap.adt.xmlparser.parse_xml(aunit_results_xml, AUnitResponseHandler()), args.repeat)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,82 @@
+"""ABAP Unit Code Coverage ADT fixtures"""
+
+AUNIT_COVERAGE_RESULTS_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<aunit:runResult xmlns:aunit="http://www.sap.com/adt/aunit">
+  <external>
+    <coverage xmlns:adtcore="http://www.sap.com/adt/core" adtcore:uri="/sap/bc/adt/runtime/traces/coverage/measurements/FOOBAR"/>
+  </external>
+  <program xmlns:adtcore="http://www.sap.com/adt/core" adtcore:uri="/sap/bc/adt/oo/classes/zcl_test_class" adtcore:type="CLAS/OC" adtcore:name="ZCL_TEST_CLASS" uriType="semantic">
+    <testClasses>
+      <testClass adtcore:uri="/sap/bc/adt/oo/classes/zcl_test_class/includes/testclasses#type=CLAS%2FOCL;name=LTCL_TEST" adtcore:type="CLAS/OL" adtcore:name="LTCL_TEST" uriType="semantic">
+        <testMethods>
+          <testMethod adtcore:uri="/sap/bc/adt/oo/classes/zcl_test_class/includes/testclasses#type=CLAS%2FOLD;name=LTCL_TEST%20%20%20%20%20%20%20%20%20%20%20%20%20%20%20%20%20%20%20%20%20DO_THE_TEST" adtcore:type="CLAS/OLI" adtcore:name="DO_THE_TEST" executionTime="0" uriType="semantic" unit="s"/>
+        </testMethods>
+      </testClass>
+    </testClasses>
+  </program>
+</aunit:runResult>
+'''
+
+ACOVERAGE_RESULTS_XML = '''<?xml version="1.0" encoding="utf-8"?>
+<cov:result xmlns:cov="http://www.sap.com/adt/cov" xmlns:adtcore="http://www.sap.com/adt/core" xmlns:atom="http://www.w3.org/2005/Atom">
+  <nodes>
+    <node adtcore:uri="/sap/bc/adt/packages/test_pkg" adtcore:type="DEVC/K" adtcore:name="TEST_PKG">
+      <coverages>
+        <coverage type="branch" executed="3" total="4"/>
+        <coverage type="procedure" executed="1" total="2"/>
+        <coverage type="statement" executed="5" total="8"/>
+      </coverages>
+      <nodes>
+        <node adtcore:uri="/sap/bc/adt/oo/classes/zcl_test_class" adtcore:type="CLAS/OC" adtcore:name="ZCL_TEST_CLASS">
+          <coverages>
+            <coverage type="branch" executed="3" total="4"/>
+            <coverage type="procedure" executed="1" total="2"/>
+            <coverage type="statement" executed="5" total="8"/>
+          </coverages>
+          <nodes>
+            <node adtcore:uri="/sap/bc/adt/oo/classes/zcl_test_class/source/main#start=10,2" adtcore:type="CLAS/OM" adtcore:name="METHOD_A">
+              <atom:link href="/sap/bc/adt/runtime/traces/coverage/results/FOOBAR/statements?uri=method_a" rel="http://www.sap.com/adt/relations/runtime/traces/coverage/statements" type="application/xml"/>
+              <coverages>
+                <coverage type="branch" executed="3" total="4"/>
+                <coverage type="procedure" executed="1" total="1"/>
+                <coverage type="statement" executed="5" total="5"/>
+              </coverages>
+            </node>
+            <node adtcore:uri="/sap/bc/adt/oo/classes/zcl_test_class/source/main#start=20,2" adtcore:type="CLAS/OM" adtcore:name="METHOD_B">
+              <atom:link href="/sap/bc/adt/runtime/traces/coverage/results/FOOBAR/statements?uri=method_b" rel="http://www.sap.com/adt/relations/runtime/traces/coverage/statements" type="application/xml"/>
+              <coverages>
+                <coverage type="branch" executed="0" total="0"/>
+                <coverage type="procedure" executed="0" total="1"/>
+                <coverage type="statement" executed="0" total="3"/>
+              </coverages>
+            </node>
+          </nodes>
+        </node>
+      </nodes>
+    </node>
+  </nodes>
+</cov:result>
+'''
+
+ACOVERAGE_STATEMENTS_RESULTS_XML = '''<?xml version="1.0" encoding="utf-8"?>
+<cov:statementsBulkResponse xmlns:cov="http://www.sap.com/adt/cov" xmlns:adtcore="http://www.sap.com/adt/core">
+  <statementResponse>
+    <name adtcore:name="METHOD_A"/>
+    <statement executed="2">
+      <adtcore:objectReference adtcore:uri="/sap/bc/adt/oo/classes/zcl_test_class/source/main#start=11,4;end=11,20" adtcore:type="CLAS/OM" adtcore:name="METHOD_A"/>
+    </statement>
+    <statement executed="1">
+      <adtcore:objectReference adtcore:uri="/sap/bc/adt/oo/classes/zcl_test_class/source/main#start=12,4;end=12,30" adtcore:type="CLAS/OM" adtcore:name="METHOD_A"/>
+    </statement>
+    <statement executed="3">
+      <adtcore:objectReference adtcore:uri="/sap/bc/adt/oo/classes/zcl_test_class/source/main#start=12,31;end=12,40" adtcore:type="CLAS/OM" adtcore:name="METHOD_A"/>
+    </statement>
+  </statementResponse>
+  <statementResponse>
+    <name adtcore:name="METHOD_B"/>
+    <statement executed="0">
+      <adtcore:objectReference adtcore:uri="/sap/bc/adt/oo/classes/zcl_test_class/source/main#start=21,4;end=21,20" adtcore:type="CLAS/OM" adtcore:name="METHOD_B"/>
+    </statement>
+  </statementResponse>
+</cov:statementsBulkResponse>
+'''
@@ -0,0 +1,35 @@
+DISCOVERY_ADT_XML = '''<?xml version="1.0" encoding="utf-8"?>
+<app:service xmlns:app="http://www.w3.org/2007/app" xmlns:atom="http://www.w3.org/2005/Atom">
+  <app:workspace>
+    <atom:title>ABAP Unit</atom:title>
+    <app:collection href="/sap/bc/adt/abapunit/testruns">
+      <atom:title>ABAP Unit Test Runs</atom:title>
+      <app:accept>application/vnd.sap.adt.abapunit.testruns.config.v1+xml</app:accept>
+      <app:accept>application/vnd.sap.adt.abapunit.testruns.config.v2+xml</app:accept>
+      <app:accept>application/vnd.sap.adt.abapunit.testruns.config.v3+xml</app:accept>
+      <app:accept>application/vnd.sap.adt.abapunit.testruns.config.v4+xml</app:accept>
+      <atom:category term="testruns" scheme="http://www.sap.com/adt/categories/abapunit"/>
+      <adtcomp:templateLinks xmlns:adtcomp="http://www.sap.com/adt/compatibility"/>
+    </app:collection>
+  </app:workspace>
+  <app:workspace>
+    <atom:title>Programs</atom:title>
+    <app:collection href="/sap/bc/adt/programs/programs">
+      <atom:title>Programs</atom:title>
+      <app:accept>application/vnd.sap.adt.programs.programs.v2+xml</app:accept>
+      <atom:category term="programs" scheme="http://www.sap.com/adt/categories/programs"/>
+      <adtcomp:templateLinks xmlns:adtcomp="http://www.sap.com/adt/compatibility">
+        <adtcomp:templateLink title="Program Source" rel="http://www.sap.com/adt/relations/source" template="/sap/bc/adt/programs/programs/{program_name}/source/main" type="text/plain"/>
+      </adtcomp:templateLinks>
+    </app:collection>
+  </app:workspace>
+  <app:workspace>
+    <atom:title>Sources</atom:title>
+    <app:collection href="/sap/bc/adt/programs/programs">
+      <atom:title>Programs</atom:title>
+      <app:accept>application/vnd.sap.adt.programs.programs.v2+xml</app:accept>
+      <app:accept>application/vnd.sap.adt.programs.programs+xml</app:accept>
+    </app:collection>
+  </app:workspace>
+</app:service>
+'''
@@ -16,6 +16,15 @@ class Response:
 
             self.headers['Content-Type'] = content_type
 
+    def iter_content(self, chunk_size=1):
+        content = self.text.encode('utf-8') if isinstance(self.text, str) else self.text
+
+        for start in range(0, len(content), chunk_size):
+            yield content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
 
 class Request(NamedTuple):
 
@@ -26,6 +35,12 @@ class Request(NamedTuple):
     params: Dict
 
 
+class BogusSession:
+
+    def __init__(self):
+        self.headers = {}
+
+
 def ok_responses():
 
     yield Response(text='', status_code=200, headers={})
@@ -37,15 +52,16 @@ class Connection(sap.adt.Connection):
         super(Connection, self).__init__('mockhost', 'mockclient', user, 'mockpass')
 
         self.execs = list()
+        self._bogus_session = BogusSession()
         self._resp_iter = ok_responses() if responses is None else iter(responses)
 
     def _get_session(self):
-        return 'bogus session'
+        return self._bogus_session
 
     def _build_adt_url(self, adt_uri):
         return '/' + self.uri + '/' + adt_uri
 
-    def _retrieve(self, session, method, url, params=None, headers=None, body=None):
+    def _retrieve(self, session, method, url, params=None, headers=None, body=None, stream=False):
         req = Request(method, url, headers, body, params)
         self.execs.append(req)
 
@@ -38,7 +38,8 @@ class TestParseCommandLine(unittest.TestCase):
         self.assertEqual(
             vars(args),
             {'ashost':'fixtures', 'client':'975', 'ssl':False, 'port':3579,
-             'user':'fantomas', 'password':'Down1oad', 'verify':False, 'verbose_count':0})
+             'user':'fantomas', 'password':'Down1oad', 'verify':False, 'verbose_count':0,
+             'cache_dir': None, 'cache_max_size': None, 'session_file': None})
 
     def test_args_no_ashost(self):
         test_params = ALL_PARAMETERS.copy()
@@ -152,6 +153,64 @@ class TestParseCommandLine(unittest.TestCase):
         self.assertTrue(args.verify)
 
 
+    def test_args_cache_dir(self):
+        test_params = ALL_PARAMETERS.copy()
+
+        os.environ['SAPCLI_CACHE_DIR'] = '/var/cache/sapcli'
+
+        try:
+            args = sapcli.parse_command_line(test_params)
+            self.assertEqual(args.cache_dir, '/var/cache/sapcli')
+
+            args = sapcli.parse_command_line(test_params + ['--cache-dir', '/tmp/sapcli'])
+            self.assertEqual(args.cache_dir, '/tmp/sapcli')
+        finally:
+            del os.environ['SAPCLI_CACHE_DIR']
+
+    def test_args_cache_max_size(self):
+        test_params = ALL_PARAMETERS.copy()
+
+        os.environ['SAPCLI_CACHE_MAX_SIZE'] = '64'
+
+        try:
+            args = sapcli.parse_command_line(test_params)
+            self.assertEqual(args.cache_max_size, 64)
+
+            args = sapcli.parse_command_line(test_params + ['--cache-max-size', '128'])
+            self.assertEqual(args.cache_max_size, 128)
+        finally:
+            del os.environ['SAPCLI_CACHE_MAX_SIZE']
+
+    def test_args_invalid_cache_max_size(self):
+        test_params = ALL_PARAMETERS.copy()
+
+        os.environ['SAPCLI_CACHE_MAX_SIZE'] = 'big'
+
+        try:
+            with patch('sys.stderr', new_callable=StringIO) as fake_output, \
+                 self.assertRaises(SystemExit) as exit_cm:
+                sapcli.parse_command_line(test_params)
+        finally:
+            del os.environ['SAPCLI_CACHE_MAX_SIZE']
+
+        self.assertEqual(str(exit_cm.exception), '3')
+        self.assertTrue(fake_output.getvalue().startswith(
+            'Invalid cache size in the environment variable SAPCLI_CACHE_MAX_SIZE: big'))
+
+    def test_args_session_file(self):
+        test_params = ALL_PARAMETERS.copy()
+
+        os.environ['SAPCLI_SESSION_FILE'] = '/run/user/1000/sapcli.session'
+
+        try:
+            args = sapcli.parse_command_line(test_params)
+            self.assertEqual(args.session_file, '/run/user/1000/sapcli.session')
+
+            args = sapcli.parse_command_line(test_params + ['--session-file', '/tmp/sapcli.session'])
+            self.assertEqual(args.session_file, '/tmp/sapcli.session')
+        finally:
+            del os.environ['SAPCLI_SESSION_FILE']
+
     def test_args_env_no_ssl_variants(self):
         test_params = ALL_PARAMETERS.copy()
         test_params.remove('--no-ssl')
@@ -0,0 +1,112 @@
+#!/bin/python
+
+import unittest
+
+import sap.adt.acoverage
+from sap.adt.acoverage import ACoverage, Coverage, CoverageNode, LineCoverage
+
+from mock import Connection, Response
+from fixtures_adt_coverage import ACOVERAGE_RESULTS_XML, ACOVERAGE_STATEMENTS_RESULTS_XML
+
+
+class TestACoverage(unittest.TestCase):
+
+    def test_build_query(self):
+        self.assertEqual(ACoverage.build_query(['/sap/bc/adt/oo/classes/zcl_a', '/sap/bc/adt/packages/test_pkg']),
+'''<?xml version="1.0" encoding="UTF-8"?>
+<cov:query xmlns:cov="http://www.sap.com/adt/cov">
+  <adtcore:objectSets xmlns:adtcore="http://www.sap.com/adt/core">
+    <objectSet kind="inclusive">
+      <adtcore:objectReferences>
+        <adtcore:objectReference adtcore:uri="/sap/bc/adt/oo/classes/zcl_a"/>
+        <adtcore:objectReference adtcore:uri="/sap/bc/adt/packages/test_pkg"/>
+      </adtcore:objectReferences>
+    </objectSet>
+  </adtcore:objectSets>
+</cov:query>''')
+
+    def test_fetch(self):
+        connection = Connection([Response(status_code=200, text=ACOVERAGE_RESULTS_XML, headers={'Content-Type': 'application/xml'}),
+                                 Response(status_code=200, text=ACOVERAGE_STATEMENTS_RESULTS_XML, headers={'Content-Type': 'application/xml'})])
+
+        coverage = ACoverage(connection).fetch('FOOBAR', ['/sap/bc/adt/packages/test_pkg'])
+
+        self.assertEqual(len(connection.execs), 2)
+        self.assertEqual(connection.execs[0].adt_uri, '/sap/bc/adt/runtime/traces/coverage/measurements/FOOBAR')
+        self.assertIn('adtcore:uri="/sap/bc/adt/packages/test_pkg"', connection.execs[0].body)
+        self.assertEqual(connection.execs[1].adt_uri, '/sap/bc/adt/runtime/traces/coverage/results/FOOBAR/statements')
+        self.assertEqual(connection.execs[1].body,
+'''<?xml version="1.0" encoding="UTF-8"?>
+<cov:statementsBulkRequest xmlns:cov="http://www.sap.com/adt/cov">
+  <statementsRequest get="/sap/bc/adt/runtime/traces/coverage/results/FOOBAR/statements?uri=method_a"/>
+  <statementsRequest get="/sap/bc/adt/runtime/traces/coverage/results/FOOBAR/statements?uri=method_b"/>
+</cov:statementsBulkRequest>''')
+
+        package = coverage.nodes[0]
+        self.assertEqual((package.name, package.typ, package.counter('statement')),
+                         ('TEST_PKG', 'DEVC/K', (5, 8)))
+
+        clas = package.nodes[0]
+        self.assertEqual((clas.name, clas.uri), ('ZCL_TEST_CLASS', '/sap/bc/adt/oo/classes/zcl_test_class'))
+        self.assertEqual([(method.name, method.counter('branch'), method.counter('procedure'))
+                          for method in clas.iter_leaves()],
+                         [('METHOD_A', (3, 4), (1, 1)), ('METHOD_B', (0, 0), (0, 1))])
+        self.assertEqual(clas.counter('unknown'), (0, 0))
+
+        self.assertEqual(list(coverage.lines.keys()), ['/sap/bc/adt/oo/classes/zcl_test_class/source/main'])
+        self.assertEqual(list(coverage.lines['/sap/bc/adt/oo/classes/zcl_test_class/source/main']),
+                         [(11, 2), (12, 3), (21, 0)])
+
+    def test_fetch_without_statements(self):
+        connection = Connection([Response(status_code=200, text=ACOVERAGE_RESULTS_XML.replace('atom:link', 'atom:ref'),
+                                          headers={'Content-Type': 'application/xml'})])
+
+        coverage = ACoverage(connection).fetch('FOOBAR', ['/sap/bc/adt/packages/test_pkg'])
+
+        self.assertEqual(len(connection.execs), 1)
+        self.assertEqual(coverage.lines, {})
+
+    def test_line_coverage(self):
+        lines = LineCoverage({20: 0, 3: 5, 10: 1})
+
+        self.assertEqual(list(lines), [(3, 5), (10, 1), (20, 0)])
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines.covered, 2)
+
+    def test_merge_coverages(self):
+        first = Coverage([CoverageNode('ZCL_A', 'CLAS/OC', '/zcl_a')], {'/zcl_a': LineCoverage({1: 1})})
+        second = Coverage([CoverageNode('ZPROG', 'PROG/P', '/zprog')], {'/zprog': LineCoverage({2: 0})})
+
+        merged = sap.adt.acoverage.merge_coverages([first, second])
+
+        self.assertEqual([node.name for node in merged.nodes], ['ZCL_A', 'ZPROG'])
+        self.assertEqual(sorted(merged.lines.keys()), ['/zcl_a', '/zprog'])
+        self.assertIs(sap.adt.acoverage.merge_coverages([first]), first)
+
+    def test_source_coverages(self):
+        clas = CoverageNode('ZCL_A', 'CLAS/OC', '/zcl_a')
+        method = CoverageNode('METHOD', 'CLAS/OM', '/zcl_a/source/main#start=10,2')
+        test_method = CoverageNode('DO_THE_TEST', 'CLAS/OM', '/zcl_a/includes/testclasses#start=5,2')
+        clas.nodes = [test_method, method]
+
+        lines = {'/zcl_a/includes/testclasses': LineCoverage({6: 1}),
+                 '/zcl_a/source/main': LineCoverage({11: 0}),
+                 '/zcl_b/source/main': LineCoverage({1: 1})}
+        includes = sap.adt.acoverage.includes_by_object(lines)
+
+        sources = sap.adt.acoverage.source_coverages(clas, lines, includes)
+
+        self.assertEqual([(source.uri, source.nodes, list(source.lines)) for source in sources],
+                         [('/zcl_a/source/main', [method], [(11, 0)]),
+                          ('/zcl_a/includes/testclasses', [test_method], [(6, 1)])])
+
+    def test_source_coverages_without_procedures(self):
+        prog = CoverageNode('ZPROG', 'PROG/P', '/zprog')
+
+        sources = sap.adt.acoverage.source_coverages(prog, {}, {})
+
+        self.assertEqual(sources, [sap.adt.acoverage.SourceCoverage('/zprog', [prog], None)])
+
+
+if __name__ == '__main__':
+    unittest.main()
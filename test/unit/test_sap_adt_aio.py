@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+import sap.adt
+import sap.adt.aio
+from sap.adt.aio import AsyncConnection
+
+from mock import Connection, Request, Response
+
+from fixtures_adt_program import GET_EXECUTABLE_PROGRAM_ADT_XML
+from fixtures_adt_repository import (PACKAGE_ROOT_NODESTRUCTURE_OK_RESPONSE,
+                                     PACKAGE_ROOT_REQUEST_XML,
+                                     PACKAGE_SOURCE_LIBRARY_NODESTRUCUTRE_OK_RESPONSE,
+                                     PACKAGE_EMPTY_NODESTRUCTURE_OK_RESPONSE)
+
+
+class RoutingConnection(Connection):
+    """Responses are selected by request instead of their order because
+       concurrent requests are not executed in a deterministic order.
+    """
+
+    def __init__(self, routes):
+        super(RoutingConnection, self).__init__()
+
+        self._routes = routes
+
+    def _retrieve(self, session, method, url, params=None, headers=None, body=None, stream=False):
+        req = Request(method, url, headers, body, params)
+        self.execs.append(req)
+
+        if params is not None and 'parent_name' in params:
+            key = (params['parent_name'], body == PACKAGE_ROOT_REQUEST_XML)
+        else:
+            key = url
+
+        return (req, self._routes[key])
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class TestAsyncConnection(unittest.TestCase):
+
+    def test_execute_and_get_text(self):
+        conn = RoutingConnection({
+            '/sap/bc/adt/programs/programs/z_one/source/main': Response(text='REPORT z_one.', status_code=200,
+                                                                         headers={}),
+            '/sap/bc/adt/programs/programs/z_two/source/main': Response(text='REPORT z_two.', status_code=200,
+                                                                         headers={})})
+
+        async def download():
+            async with AsyncConnection(conn, concurrency=2) as async_conn:
+                return await asyncio.gather(async_conn.get_text('programs/programs/z_one/source/main'),
+                                            async_conn.get_text('programs/programs/z_two/source/main'))
+
+        self.assertEqual(run(download()), ['REPORT z_one.', 'REPORT z_two.'])
+        self.assertEqual(len(conn.execs), 2)
+
+    def test_fetch_and_text(self):
+        conn = RoutingConnection({
+            '/sap/bc/adt/programs/programs/zhello_world': Response(text=GET_EXECUTABLE_PROGRAM_ADT_XML,
+                                                                   status_code=200, headers={}),
+            '/sap/bc/adt/programs/programs/zhello_world/source/main': Response(text='REPORT zhello_world.',
+                                                                               status_code=200, headers={})})
+
+        program = sap.adt.Program(conn, 'ZHELLO_WORLD')
+
+        async def download():
+            async with AsyncConnection(conn) as async_conn:
+                return await asyncio.gather(sap.adt.aio.fetch(async_conn, program),
+                                            sap.adt.aio.text(async_conn, program))
+
+        fetched, text = run(download())
+
+        self.assertIs(fetched, program)
+        self.assertEqual(program.description, 'Say hello!')
+        self.assertEqual(text, 'REPORT zhello_world.')
+
+    def test_walk(self):
+        conn = RoutingConnection({
+            ('$VICTORY', True): PACKAGE_ROOT_NODESTRUCTURE_OK_RESPONSE,
+            ('$VICTORY', False): PACKAGE_SOURCE_LIBRARY_NODESTRUCUTRE_OK_RESPONSE,
+            ('$VICTORY_TESTS', True): PACKAGE_EMPTY_NODESTRUCTURE_OK_RESPONSE})
+
+        async def walk():
+            async with AsyncConnection(conn) as async_conn:
+                return [item async for item in sap.adt.aio.walk(async_conn, sap.adt.Package(conn, '$VICTORY'))]
+
+        self.assertEqual(run(walk()),
+                         [([], ['$VICTORY_TESTS'],
+                           [SimpleNamespace(typ='CLAS/OC', name='ZCL_HELLO_WORLD',
+                                            uri='/sap/bc/adt/oo/classes/zcl_hello_world'),
+                            SimpleNamespace(typ='INTF/OI', name='ZIF_HELLO_WORLD',
+                                            uri='/sap/bc/adt/oo/interfaces/zif_hello_world'),
+                            SimpleNamespace(typ='PROG/P', name='Z_HELLO_WORLD',
+                                            uri='/sap/bc/adt/programs/programs/z_hello_world')]),
+                          (['$VICTORY_TESTS'], [], [])])
+
+        self.assertEqual(len(conn.execs), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
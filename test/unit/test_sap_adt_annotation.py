@@ -1,10 +1,12 @@
 #!/bin/python
 
+import sys
 import unittest
 
 import sap.adt
 from sap.adt.annotations import xml_attribute, xml_element, XmlElementKind, XmlNodeProperty, XmlElementProperty, \
-                                XmlAttributeProperty, XmlNodeAttributeProperty, XmlContainer, XmlListNodeProperty
+                                XmlAttributeProperty, XmlNodeAttributeProperty, XmlContainer, XmlListNodeProperty, \
+                                XmlInternedAttributeProperty
 
 
 class DummyClass:
@@ -102,6 +104,14 @@ class TestADTAnnotation(unittest.TestCase):
         readonly = xml_element('readonly', deserialize=False)
         self.assertFalse(readonly(None).deserialize)
 
+    def test_xml_attribute_serialize(self):
+        serialized = xml_attribute('serialized')
+        self.assertTrue(serialized(None).serialize)
+
+        readonly = xml_attribute('readonly', serialize=False)
+        self.assertFalse(readonly(None).serialize)
+        self.assertFalse(readonly(None).setter(None).serialize)
+
     def test_xml_element_factory(self):
         wo_factory = xml_element('wo_factory')
         self.assertIsNone(wo_factory(None).factory)
@@ -170,6 +180,26 @@ class TestADTAnnotation(unittest.TestCase):
         self.assertEqual(node.get(obj), 'foo2')
         self.assertEqual(node.default_value, 'value2')
 
+    def test_xml_interned_attribute_property_set(self):
+        node = XmlInternedAttributeProperty('attribute4')
+        obj = node
+
+        value = ''.join(['interned', 'value'])
+        node.set(obj, value)
+        self.assertIs(node.get(obj), sys.intern('internedvalue'))
+
+    def test_xml_interned_attribute_property_setter(self):
+        node = XmlInternedAttributeProperty('attribute5', deserialize=False)
+        values = []
+
+        prop = node.setter(lambda obj, value: values.append(value))
+        self.assertIsInstance(prop, XmlAttributeProperty)
+        self.assertEqual(prop.name, 'attribute5')
+        self.assertFalse(prop.deserialize)
+
+        prop.fset(None, ''.join(['interned', 'setter']))
+        self.assertIs(values[0], sys.intern('internedsetter'))
+
     def test_xml_container_instance(self):
         the_list = DummyList()
 
@@ -1,13 +1,21 @@
 #!/usr/bin/env python3
 
 import os
+import sys
+import time
+import tempfile
 import unittest
-from unittest.mock import Mock
+from unittest.mock import Mock, patch, call
+from types import SimpleNamespace
+from itertools import chain
 
 import sap
 import sap.adt
 import sap.adt.atc
+import sap.adt.cache
+import sap.adt.errors
 import sap.adt.objects
+import sap.errors
 from sap.adt.marshalling import Marshal
 
 from mock import Connection, Response, Request
@@ -47,6 +55,71 @@ class TestCustomizing(unittest.TestCase):
         self.assertEqual(conn.execs, [ATC_CUSTOMIZIN_REQUEST])
 
 
+class TestCustomizingCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_customizing(self):
+        cache = sap.adt.atc.CustomizingCache(self.tmpdir.name)
+        cache.save_customizing('https://example.org?sap-client=001', sap.adt.atc.Customizing('STANDARD'))
+
+        self.assertEqual(cache.load_customizing('https://example.org?sap-client=001').system_check_variant,
+                         'STANDARD')
+        self.assertIsNone(cache.load_customizing('https://example.org?sap-client=002'))
+
+    def test_expired(self):
+        cache = sap.adt.atc.CustomizingCache(self.tmpdir.name, ttl=-1)
+        cache.save_customizing('key', sap.adt.atc.Customizing('STANDARD'))
+
+        self.assertIsNone(cache.load_customizing('key'))
+
+    def test_worklist_id(self):
+        cache = sap.adt.atc.CustomizingCache(self.tmpdir.name)
+        cache.save_customizing('key', sap.adt.atc.Customizing('STANDARD'))
+        cache.save_worklist_id('key', 'STANDARD', 'WORKLIST_ID')
+
+        self.assertEqual(cache.load_worklist_id('key', 'STANDARD'), 'WORKLIST_ID')
+        self.assertEqual(cache.load_customizing('key').system_check_variant, 'STANDARD')
+        self.assertIsNone(cache.load_worklist_id('key', 'OTHER'))
+        self.assertIsNone(cache.load_worklist_id('other', 'STANDARD'))
+
+        cache.save_worklist_id('key', 'STANDARD', 'NEW_ID')
+        self.assertEqual(cache.load_worklist_id('key', 'STANDARD'), 'NEW_ID')
+
+    def test_worklist_id_expired(self):
+        cache = sap.adt.atc.CustomizingCache(self.tmpdir.name, ttl=-1)
+        cache.save_worklist_id('key', 'STANDARD', 'WORKLIST_ID')
+
+        self.assertIsNone(cache.load_worklist_id('key', 'STANDARD'))
+
+    def test_fetch_customizing_cached(self):
+        conn = Connection([Response(status_code=200,
+                                    content_type='application/xml',
+                                    text=ADT_XML_ATC_CUSTOMIZING)])
+        cache = sap.adt.atc.CustomizingCache(self.tmpdir.name)
+
+        self.assertEqual(sap.adt.atc.fetch_customizing(conn, cache=cache).system_check_variant, 'STANDARD')
+
+        conn = Connection([])
+
+        self.assertEqual(sap.adt.atc.fetch_customizing(conn, cache=cache).system_check_variant, 'STANDARD')
+        self.assertEqual(conn.execs, [])
+
+    def test_fetch_customizing_not_cached_implicitly(self):
+        conn = Connection([Response(status_code=200, content_type='application/xml', text=ADT_XML_ATC_CUSTOMIZING),
+                           Response(status_code=200, content_type='application/xml', text=ADT_XML_ATC_CUSTOMIZING)])
+        conn.options.cache = sap.adt.cache.ResponseCache(self.tmpdir.name)
+
+        sap.adt.atc.fetch_customizing(conn)
+        sap.adt.atc.fetch_customizing(conn)
+
+        self.assertEqual(conn.execs, [ATC_CUSTOMIZIN_REQUEST, ATC_CUSTOMIZIN_REQUEST])
+
+
 class TestRunRequest(unittest.TestCase):
 
     def test_run_request_serialization(self):
@@ -161,6 +234,213 @@ class TestWorkList(unittest.TestCase):
         self.assertEqual(finding.exemption_approval, '-')
         self.assertEqual(finding.exemption_kind, '')
 
+    def test_deserialize_compact(self):
+        worklist = sap.adt.atc.WorkList()
+        sap.adt.marshalling.Marshal.deserialize(ADT_XML_ATC_WORKLIST_CLASS, worklist)
+
+        atcobject = worklist.objects[0]
+        finding = atcobject.findings[0]
+
+        self.assertFalse(hasattr(atcobject, '__dict__'))
+        self.assertFalse(hasattr(finding, '__dict__'))
+
+        self.assertIs(finding.check_title, sys.intern('Test Environment  (SLIN_UMFLD)'))
+        self.assertIs(atcobject.object_type_id, sys.intern('CLAS/OC'))
+
+    def test_iter_findings(self):
+        worklist = sap.adt.atc.WorkList()
+        sap.adt.marshalling.Marshal.deserialize(ADT_XML_ATC_WORKLIST_CLASS, worklist)
+
+        atcobject = worklist.objects[0]
+        self.assertEqual(list(worklist.iter_findings()), [(atcobject, atcobject.findings[0])])
+
+    def test_iter_findings_empty(self):
+        worklist = sap.adt.atc.WorkList()
+        self.assertEqual(list(worklist.iter_findings()), [])
+
+        sap.adt.marshalling.Marshal.deserialize(ADT_XML_ATC_WORKLIST_EMPTY, worklist)
+        self.assertEqual(list(worklist.iter_findings()), [])
+
+
+class TestWorkListStream(unittest.TestCase):
+
+    def test_iter_worklist_response(self):
+        worklist = sap.adt.atc.WorkList()
+        findings = list(sap.adt.atc.iter_worklist_response(Response(text=ADT_XML_ATC_WORKLIST_CLASS), worklist))
+
+        self.assertEqual(worklist.worklist_id, '0242AC1100021EE9AAE43D24739F1C3A')
+        self.assertEqual(worklist.object_set_is_complete, 'true')
+        self.assertEqual([object_set.kind for object_set in worklist.object_sets], ['ALL', 'LAST_RUN'])
+
+        self.assertEqual(len(findings), 1)
+        atcobject, finding = findings[0]
+
+        self.assertEqual(atcobject.name, 'ZCL_Z001_DPC')
+        self.assertEqual(atcobject.object_type_id, 'CLAS/OC')
+        self.assertEqual(finding.priority, '3')
+        self.assertEqual(finding.check_title, 'Test Environment  (SLIN_UMFLD)')
+        self.assertEqual(finding.location, '/sap/bc/adt/oo/classes/zcl_z001_dpc#start=1,0')
+
+    def test_iter_worklist_response_incremental(self):
+        xml = ADT_XML_ATC_WORKLIST_CLASS
+        end = xml.index('</atcfinding:finding>') + len('</atcfinding:finding>')
+
+        consumed = []
+
+        def chunks(_):
+            for chunk in (xml[:end], xml[end:]):
+                consumed.append(chunk)
+                yield chunk.encode('utf-8')
+
+        response = Mock()
+        response.iter_content.side_effect = chunks
+
+        findings = sap.adt.atc.iter_worklist_response(response, sap.adt.atc.WorkList())
+
+        next(findings)
+        self.assertEqual(len(consumed), 1)
+
+        self.assertEqual(list(findings), [])
+        response.close.assert_called_once()
+
+
+class TestChunkedObjectSets(unittest.TestCase):
+
+    def test_chunks(self):
+        conn = Connection()
+        classes = [sap.adt.Class(conn, f'ZCL_CHUNK_{i}') for i in range(5)]
+
+        chunks = list(sap.adt.atc.chunked_object_sets(classes, 2))
+
+        self.assertEqual([[ref.name for ref in chunk.inclusive.references.references] for chunk in chunks],
+                         [['ZCL_CHUNK_0', 'ZCL_CHUNK_1'], ['ZCL_CHUNK_2', 'ZCL_CHUNK_3'], ['ZCL_CHUNK_4']])
+
+    def test_invalid_chunk_size(self):
+        with self.assertRaises(sap.errors.SAPCliError) as caught:
+            list(sap.adt.atc.chunked_object_sets([], 0))
+
+        self.assertEqual(str(caught.exception), 'Invalid number of objects per ATC run: 0')
+
+
+class TestMergeWorkLists(unittest.TestCase):
+
+    def test_merge_single(self):
+        worklist = sap.adt.atc.WorkList()
+        self.assertIs(sap.adt.atc.merge_worklists([worklist]), worklist)
+
+    def test_merge(self):
+        first = Marshal.deserialize(ADT_XML_ATC_WORKLIST_CLASS, sap.adt.atc.WorkList())
+        empty = Marshal.deserialize(ADT_XML_ATC_WORKLIST_EMPTY, sap.adt.atc.WorkList())
+        second = Marshal.deserialize(ADT_XML_ATC_WORKLIST_CLASS, sap.adt.atc.WorkList())
+
+        merged = sap.adt.atc.merge_worklists([first, empty, second])
+
+        self.assertEqual(merged.timestamp, '2019-07-20T19:18:57Z')
+        self.assertEqual(len(merged.objects), 1)
+        self.assertEqual(list(merged.iter_findings()),
+                         [(first.objects[0], first.objects[0].findings[0]),
+                          (first.objects[0], second.objects[0].findings[0])])
+
+
+def worklist_for(obj_sets):
+    """Returns a worklist with one finding per checked object"""
+
+    worklist = sap.adt.atc.WorkList()
+    worklist.objects = sap.adt.atc.ATCObjectList()
+
+    for ref in obj_sets.inclusive.references.references:
+        atcobject = sap.adt.atc.ATCObject()
+        atcobject.uri = ref.uri
+        atcobject.name = ref.name
+        atcobject.object_type_id = 'CLAS/OC'
+        atcobject.findings = sap.adt.atc.ATCFindingList()
+
+        finding = sap.adt.atc.ATCFinding()
+        finding.priority = '1'
+        atcobject.findings.append(finding)
+
+        worklist.objects.append(atcobject)
+
+    return worklist
+
+
+class TestShardedChecks(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = Connection()
+
+        patcher = patch('sap.adt.atc.ChecksRunner')
+        self.fake_runner = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def shards(self, *names):
+        objects = [sap.adt.atc.ShardObject('CLAS/OC', name, f'/sap/bc/adt/oo/classes/{name.lower()}')
+                   for name in names]
+        return list(sap.adt.atc.chunked_object_sets(objects, 1))
+
+    def test_package_objects(self):
+        walk = [([], ['$SUB'], [SimpleNamespace(typ='PROG/P', name='ZPROG', uri='/prog/zprog'),
+                                SimpleNamespace(typ='CLAS/OC', name='ZCL_B', uri='/clas/zcl_b')]),
+                (['$SUB'], [], [SimpleNamespace(typ='CLAS/OC', name='ZCL_A', uri='/clas/zcl_a')])]
+
+        with patch('sap.adt.package.walk', return_value=iter(walk)) as fake_walk:
+            objects = sap.adt.atc.package_objects('$ROOT')
+
+        fake_walk.assert_called_once_with('$ROOT')
+        self.assertEqual(objects, [sap.adt.atc.ShardObject('CLAS/OC', 'ZCL_A', '/clas/zcl_a'),
+                                   sap.adt.atc.ShardObject('CLAS/OC', 'ZCL_B', '/clas/zcl_b'),
+                                   sap.adt.atc.ShardObject('PROG/P', 'ZPROG', '/prog/zprog')])
+
+    def test_parallel_order(self):
+        def run_for(obj_sets, max_verdicts):
+            # the first shard finishes last
+            if obj_sets.inclusive.references.references[0].name == 'ZCL_FIRST':
+                time.sleep(0.05)
+
+            return SimpleNamespace(worklist=worklist_for(obj_sets))
+
+        self.fake_runner.return_value.run_for.side_effect = run_for
+
+        checks = sap.adt.atc.ShardedChecksRunner(self.conn, 'VARIANT', jobs=3)
+        worklist = checks.run_for(self.shards('ZCL_FIRST', 'ZCL_SECOND', 'ZCL_THIRD'), max_verdicts=5)
+
+        self.assertEqual([obj.name for obj in worklist.objects], ['ZCL_FIRST', 'ZCL_SECOND', 'ZCL_THIRD'])
+        self.assertEqual(self.fake_runner.call_args_list, [call(self.conn, 'VARIANT')] * 3)
+        self.assertEqual([call_args[1] for call_args in self.fake_runner.return_value.run_for.call_args_list],
+                         [{'max_verdicts': 5}] * 3)
+
+    def test_shard_sorted(self):
+        self.fake_runner.return_value.run_for.side_effect = \
+            lambda obj_sets, max_verdicts: SimpleNamespace(worklist=worklist_for(obj_sets))
+
+        checks = sap.adt.atc.ShardedChecksRunner(self.conn, 'VARIANT')
+        objects = [sap.adt.atc.ShardObject('CLAS/OC', name, f'/{name}') for name in ('ZCL_B', 'ZCL_A')]
+        worklist = checks.run_for(sap.adt.atc.chunked_object_sets(objects, 2))
+
+        self.assertEqual([obj.name for obj in worklist.objects], ['ZCL_A', 'ZCL_B'])
+
+    def test_retry(self):
+        self.fake_runner.return_value.run_for.side_effect = [
+            sap.errors.SAPCliError('Time out'),
+            SimpleNamespace(worklist=sap.adt.atc.WorkList())]
+
+        checks = sap.adt.atc.ShardedChecksRunner(self.conn, 'VARIANT', retries=1)
+        with self.assertLogs(level='WARNING') as logs:
+            worklist = checks.run_for(self.shards('ZCL_FIRST'))
+
+        self.assertIsNone(worklist.objects)
+        self.assertEqual(self.fake_runner.call_count, 2)
+        self.assertIn('retrying (1/1): Time out', logs.output[0])
+
+    def test_retry_exhausted(self):
+        self.fake_runner.return_value.run_for.side_effect = sap.errors.SAPCliError('Time out')
+
+        checks = sap.adt.atc.ShardedChecksRunner(self.conn, 'VARIANT', retries=2)
+        with self.assertRaises(sap.errors.SAPCliError), self.assertLogs(level='WARNING'):
+            checks.run_for(self.shards('ZCL_FIRST'))
+
+        self.assertEqual(self.fake_runner.call_count, 3)
+
 
 class TestATCRunner(unittest.TestCase):
 
@@ -221,6 +501,107 @@ class TestATCRunner(unittest.TestCase):
         self.assertIsNotNone(results.run_response)
         self.assertIsNotNone(results.worklist)
 
+    def test_deleted_worklist(self):
+        self.conn._resp_iter = chain(self.conn._resp_iter,
+                                     [Response(status_code=404, text='Not found',
+                                               headers={'content-type': 'text/plain'}),
+                                      Response(status_code=200, text='NEW_ID',
+                                               headers={'Content-Type': 'text/plain'}),
+                                      Response(status_code=200, text=ADT_XML_ATC_RUN_RESPONSE_NO_OBJECTS,
+                                               headers={'Content-Type': 'application/xml'}),
+                                      Response(status_code=200, text=ADT_XML_ATC_WORKLIST_EMPTY,
+                                               headers={'Content-Type': 'application/atc.worklist.v1+xml'})])
+
+        self.checks_runner.run_for(sap.adt.objects.ADTObjectSets())
+        self.checks_runner.run_for(sap.adt.objects.ADTObjectSets())
+
+        self.assertEqual([(req.method, req.adt_uri) for req in self.conn.execs],
+                         [('POST', '/sap/bc/adt/atc/worklists'),
+                          ('POST', '/sap/bc/adt/atc/runs'),
+                          ('GET', f'/sap/bc/adt/atc/worklists/{self.worklist_id}'),
+                          ('POST', '/sap/bc/adt/atc/runs'),
+                          ('POST', '/sap/bc/adt/atc/worklists'),
+                          ('POST', '/sap/bc/adt/atc/runs'),
+                          ('GET', '/sap/bc/adt/atc/worklists/NEW_ID')])
+
+    def test_given_worklist(self):
+        self.conn = Connection([Response(status_code=200, text=ADT_XML_ATC_RUN_RESPONSE_NO_OBJECTS,
+                                         headers={'Content-Type': 'application/xml'}),
+                                Response(status_code=200, text=ADT_XML_ATC_WORKLIST_EMPTY,
+                                         headers={'Content-Type': 'application/atc.worklist.v1+xml'})])
+
+        checks_runner = sap.adt.atc.ChecksRunner(self.conn, self.variant, worklist_id='CACHED_ID')
+        checks_runner.run_for(sap.adt.objects.ADTObjectSets())
+
+        self.assertEqual([(req.method, req.adt_uri, req.params) for req in self.conn.execs],
+                         [('POST', '/sap/bc/adt/atc/runs', {'worklistId': 'CACHED_ID'}),
+                          ('GET', '/sap/bc/adt/atc/worklists/CACHED_ID', {'includeExemptedFindings': 'false'})])
+        self.assertEqual(checks_runner.worklist_id, 'CACHED_ID')
+
+    def test_given_worklist_deleted(self):
+        self.conn = Connection([Response(status_code=404, text='Not found',
+                                         headers={'content-type': 'text/plain'}),
+                                Response(status_code=200, text='NEW_ID',
+                                         headers={'Content-Type': 'text/plain'}),
+                                Response(status_code=200, text=ADT_XML_ATC_RUN_RESPONSE_NO_OBJECTS,
+                                         headers={'Content-Type': 'application/xml'}),
+                                Response(status_code=200, text=ADT_XML_ATC_WORKLIST_EMPTY,
+                                         headers={'Content-Type': 'application/atc.worklist.v1+xml'})])
+
+        checks_runner = sap.adt.atc.ChecksRunner(self.conn, self.variant, worklist_id='DELETED_ID')
+        checks_runner.run_for(sap.adt.objects.ADTObjectSets())
+
+        self.assertEqual([(req.method, req.adt_uri) for req in self.conn.execs],
+                         [('POST', '/sap/bc/adt/atc/runs'),
+                          ('POST', '/sap/bc/adt/atc/worklists'),
+                          ('POST', '/sap/bc/adt/atc/runs'),
+                          ('GET', '/sap/bc/adt/atc/worklists/NEW_ID')])
+        self.assertEqual(checks_runner.worklist_id, 'NEW_ID')
+
+    def test_new_worklist_not_found(self):
+        self.conn = Connection([Response(status_code=200, text=self.worklist_id,
+                                         headers={'Content-Type': 'text/plain'}),
+                                Response(status_code=404, text='Not found',
+                                         headers={'content-type': 'text/plain'})])
+
+        checks_runner = sap.adt.atc.ChecksRunner(self.conn, self.variant)
+        with self.assertRaises(sap.adt.errors.HTTPRequestError):
+            checks_runner.run_for(sap.adt.objects.ADTObjectSets())
+
+        self.assertEqual(len(self.conn.execs), 2)
+
+    def test_reused_worklist_other_error(self):
+        self.conn._resp_iter = chain(self.conn._resp_iter,
+                                     [Response(status_code=500, text='Internal error',
+                                               headers={'content-type': 'text/plain'})])
+
+        self.checks_runner.run_for(sap.adt.objects.ADTObjectSets())
+        with self.assertRaises(sap.adt.errors.HTTPRequestError):
+            self.checks_runner.run_for(sap.adt.objects.ADTObjectSets())
+
+        self.assertEqual(len(self.conn.execs), 4)
+
+    def test_is_unknown_worklist_error(self):
+        not_found = sap.adt.errors.ADTError('com.sap.adt', 'ExceptionResourceNotFound', 'No worklist')
+        locked = sap.adt.errors.ADTError('com.sap.adt', 'ExceptionResourceLocked', 'Locked')
+
+        self.assertTrue(sap.adt.atc.is_unknown_worklist_error(not_found))
+        self.assertFalse(sap.adt.atc.is_unknown_worklist_error(locked))
+
+    def test_stream_for(self):
+        objects = sap.adt.objects.ADTObjectSets()
+        objects.include_object(sap.adt.Package(self.conn, '$iamtheking'))
+
+        results = self.checks_runner.stream_for(objects, max_verdicts=69)
+
+        self.assertEqual(self.conn.execs, [self.request_create_worklist,
+                                           self.request_run_worklist,
+                                           self.request_get_worklist])
+
+        self.assertIsNotNone(results.run_response)
+        self.assertEqual(list(results.findings), [])
+        self.assertEqual(results.worklist.worklist_id, '0242AC1100021EE9AAE43D24739F1C3A')
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=100)
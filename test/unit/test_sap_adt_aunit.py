@@ -1,13 +1,26 @@
 #!/bin/python
 
+import os
+import time
+import tempfile
 import unittest
+from unittest.mock import patch, Mock, PropertyMock
+from types import SimpleNamespace
 
 import sap
 import sap.adt
+import sap.adt.cache
 from sap.adt.aunit import Alert, AlertSeverity
+from sap.adt.discovery import parse_discovery
+from sap.adt.cts import WorkbenchTransport, WorkbenchTask, WorkbenchABAPObject
 
+from sap.errors import SAPCliError
+
+from mock import Connection, Response
 from fixtures_adt import DummyADTObject
-from fixtures_adt_aunit import AUNIT_RESULTS_XML, AUNIT_NO_TEST_RESULTS_XML
+from fixtures_adt_aunit import AUNIT_RESULTS_XML, AUNIT_NO_TEST_RESULTS_XML, GLOBAL_TEST_CLASS_AUNIT_RESULTS_XML
+from fixtures_adt_discovery import DISCOVERY_ADT_XML
+from fixtures_adt_coverage import AUNIT_COVERAGE_RESULTS_XML, ACOVERAGE_RESULTS_XML, ACOVERAGE_STATEMENTS_RESULTS_XML
 
 
 connection = sap.adt.Connection('nohost', 'noclient', 'nouser', 'nopassword')
@@ -20,6 +33,365 @@ class TestAUnit(unittest.TestCase):
         victory_uri = sap.adt.AUnit.build_tested_object_uri(connection, victory)
         self.assertEquals(victory_uri, '/sap/bc/adt/awesome/success/noobject')
 
+    def test_build_test_configuration_many_objects(self):
+        test_config = sap.adt.AUnit.build_test_configuration(['/sap/bc/adt/first', '/sap/bc/adt/second'])
+
+        self.assertIn('''      <adtcore:objectReferences>
+        <adtcore:objectReference adtcore:uri="/sap/bc/adt/first"/>
+        <adtcore:objectReference adtcore:uri="/sap/bc/adt/second"/>
+      </adtcore:objectReferences>
+''', test_config)
+        self.assertEqual(sap.adt.AUnit.build_test_configuration('/sap/bc/adt/first'),
+                         sap.adt.AUnit.build_test_configuration(['/sap/bc/adt/first']))
+
+    def test_build_test_configuration_coverage(self):
+        self.assertIn('<coverage active="false"/>', sap.adt.AUnit.build_test_configuration('/sap/bc/adt/first'))
+        self.assertIn('<coverage active="true"/>',
+                      sap.adt.AUnit.build_test_configuration('/sap/bc/adt/first', coverage=True))
+
+    def test_run_configuration_mime_type_without_cache(self):
+        conn = Connection([Response(status_code=200, text=AUNIT_NO_TEST_RESULTS_XML, headers={})])
+
+        sap.adt.AUnit(conn).execute_objects([DummyADTObject()])
+
+        self.assertEqual(conn.execs[0].headers['Content-Type'],
+                         'application/vnd.sap.adt.abapunit.testruns.config.v4+xml')
+
+    def test_run_configuration_mime_type_discovery(self):
+        conn = Connection()
+        conn.options.cache = Mock()
+
+        with patch('sap.adt.Connection.discovery', new_callable=PropertyMock) as fake_discovery:
+            fake_discovery.return_value = parse_discovery(DISCOVERY_ADT_XML)
+            aunit = sap.adt.AUnit(conn)
+
+            self.assertEqual(aunit.run_configuration_mime_type,
+                             'application/vnd.sap.adt.abapunit.testruns.config.v4+xml')
+            self.assertEqual(aunit.run_configuration_mime_type,
+                             'application/vnd.sap.adt.abapunit.testruns.config.v4+xml')
+
+        self.assertEqual(fake_discovery.call_count, 1)
+
+    def test_run_configuration_mime_type_unsupported(self):
+        conn = Connection()
+        conn.options.cache = Mock()
+
+        discovery = parse_discovery(DISCOVERY_ADT_XML.replace('config.v4+xml', 'config.v5+xml'))
+        with patch('sap.adt.Connection.discovery', new_callable=PropertyMock, return_value=discovery), \
+                self.assertRaises(SAPCliError) as caught:
+            sap.adt.AUnit(conn).execute_objects([DummyADTObject()])
+
+        self.assertEqual(str(caught.exception),
+                         'The system does not accept any supported AUnit run configuration: '
+                         'application/vnd.sap.adt.abapunit.testruns.config.v1+xml, '
+                         'application/vnd.sap.adt.abapunit.testruns.config.v2+xml, '
+                         'application/vnd.sap.adt.abapunit.testruns.config.v3+xml, '
+                         'application/vnd.sap.adt.abapunit.testruns.config.v5+xml')
+        self.assertEqual(conn.execs, [])
+
+    def test_run_configuration_mime_type_not_listed(self):
+        conn = Connection()
+        conn.options.cache = Mock()
+
+        with patch('sap.adt.Connection.discovery', new_callable=PropertyMock,
+                   return_value=parse_discovery(DISCOVERY_ADT_XML.replace('abapunit/testruns', 'abapunit/other'))):
+            self.assertEqual(sap.adt.AUnit(conn).run_configuration_mime_type,
+                             'application/vnd.sap.adt.abapunit.testruns.config.v4+xml')
+
+    def test_run_chunks(self):
+        conn = Connection([Response(status_code=200, text=AUNIT_NO_TEST_RESULTS_XML, headers={})] * 2)
+        objects = [DummyADTObject(name=name) for name in ('first', 'second', 'third')]
+
+        responses = list(sap.adt.AUnit(conn).run(objects, chunk_size=2))
+
+        self.assertEqual(len(responses), 2)
+        self.assertEqual(len(conn.execs), 2)
+        self.assertEqual(conn.execs[0].adt_uri, '/sap/bc/adt/abapunit/testruns')
+        self.assertIn('/success/first"', conn.execs[0].body)
+        self.assertIn('/success/second"', conn.execs[0].body)
+        self.assertNotIn('/success/third"', conn.execs[0].body)
+        self.assertIn('/success/third"', conn.execs[1].body)
+
+    def test_run_invalid_chunk_size(self):
+        with self.assertRaises(SAPCliError) as caught:
+            list(sap.adt.AUnit(Connection()).run([DummyADTObject()], chunk_size=0))
+
+        self.assertEqual(str(caught.exception), 'The chunk size must be a positive number: 0')
+
+
+class TestShardedAUnit(unittest.TestCase):
+
+    def test_package_tested_objects(self):
+        walk = [([], ['$SUB'], [SimpleNamespace(typ='PROG/P', name='ZPROG', uri='/prog/zprog'),
+                                SimpleNamespace(typ='TABL/DT', name='ZTABLE', uri='/tabl/ztable'),
+                                SimpleNamespace(typ='CLAS/OC', name='ZCL_B', uri='/clas/zcl_b')]),
+                (['$SUB'], [], [SimpleNamespace(typ='CLAS/OC', name='ZCL_A', uri='/clas/zcl_a')])]
+
+        package = sap.adt.Package(connection, '$ROOT')
+        with patch('sap.adt.package.walk', return_value=iter(walk)) as fake_walk:
+            objects = sap.adt.aunit.package_tested_objects(package)
+
+        fake_walk.assert_called_once_with(package)
+        self.assertEqual([(type(obj), obj.name) for obj in objects],
+                         [(sap.adt.Class, 'ZCL_A'), (sap.adt.Class, 'ZCL_B'), (sap.adt.Program, 'ZPROG')])
+
+    def test_tested_objects(self):
+        objects = sap.adt.aunit.tested_objects(connection, [('PROG/P', 'ZPROG'), ('INTF/OI', 'ZIF_A'),
+                                                            ('CLAS/OC', 'ZCL_A'), ('PROG/P', 'ZPROG')])
+
+        self.assertEqual([(type(obj), obj.name) for obj in objects],
+                         [(sap.adt.Class, 'ZCL_A'), (sap.adt.Program, 'ZPROG')])
+
+    def transports(self):
+        def cts_object(pgmid, typ, name):
+            return WorkbenchABAPObject(pgmid, typ, name, '', name, False)
+
+        task = WorkbenchTask('C50K000001', [cts_object('R3TR', 'CLAS', 'ZCL_A'),
+                                            cts_object('LIMU', 'METH', 'ZCL_B                         DO_IT'),
+                                            cts_object('LIMU', 'CINC', 'ZCL_C=========================CCAU'),
+                                            cts_object('R3TR', 'PROG', 'ZPROG'),
+                                            cts_object('R3TR', 'TABL', 'ZTABLE'),
+                                            cts_object('LIMU', 'REPS', 'ZINCLUDE')],
+                             connection, 'C50K000002')
+        other = WorkbenchTask('C50K000001', [cts_object('R3TR', 'CLAS', 'ZCL_OTHER')], connection, 'C50K000003')
+
+        return [WorkbenchTransport([task, other], connection, 'C50K000001')]
+
+    def test_transport_tested_objects(self):
+        with patch('sap.adt.cts.Workbench.get_transport_requests', return_value=self.transports()):
+            objects = sap.adt.aunit.transport_tested_objects(connection, 'C50K000001')
+
+        self.assertEqual([(type(obj), obj.name) for obj in objects],
+                         [(sap.adt.Class, 'ZCL_A'), (sap.adt.Class, 'ZCL_B'), (sap.adt.Class, 'ZCL_C'),
+                          (sap.adt.Class, 'ZCL_OTHER'), (sap.adt.Program, 'ZPROG')])
+
+    def test_task_tested_objects(self):
+        with patch('sap.adt.cts.Workbench.get_transport_requests', return_value=self.transports()):
+            objects = sap.adt.aunit.transport_tested_objects(connection, 'C50K000003')
+
+        self.assertEqual([obj.name for obj in objects], ['ZCL_OTHER'])
+
+    def test_transport_not_found(self):
+        with patch('sap.adt.cts.Workbench.get_transport_requests', return_value=self.transports()), \
+                self.assertRaises(SAPCliError) as caught:
+            sap.adt.aunit.transport_tested_objects(connection, 'C50K999999')
+
+        self.assertEqual(str(caught.exception), 'Transport request not found: C50K999999')
+
+    def test_parallel_order(self):
+        def execute_objects(adt_objects, stream=False, coverage=False):
+            # the first shard finishes last
+            if adt_objects[0].name == 'first':
+                time.sleep(0.05)
+                return Response(status_code=200, text=AUNIT_RESULTS_XML, headers={})
+
+            return Response(status_code=200, text=AUNIT_NO_TEST_RESULTS_XML, headers={})
+
+        shards = [[DummyADTObject(name='first')], [DummyADTObject(name='second')]]
+        with patch('sap.adt.aunit.AUnit.execute_objects', side_effect=execute_objects):
+            shard_runs = list(sap.adt.aunit.ShardedAUnit(connection, jobs=2).iter_runs(shards))
+
+        self.assertEqual([shard_run.aunit_xml for shard_run in shard_runs],
+                         [AUNIT_RESULTS_XML, AUNIT_NO_TEST_RESULTS_XML])
+
+    def test_shard_sorted(self):
+        response = Response(status_code=200, text=AUNIT_RESULTS_XML.replace('ZEXAMPLE_TESTS', 'ZAEXAMPLE_TESTS'),
+                            headers={})
+
+        with patch('sap.adt.aunit.AUnit.execute_objects', return_value=response):
+            run_results = sap.adt.aunit.ShardedAUnit(connection).run([[DummyADTObject()]])
+
+        self.assertEqual([program.name for program in run_results.programs],
+                         ['ZAEXAMPLE_TESTS', 'ZCL_THEKING_MANUAL_HARDCORE'])
+
+    def test_retry(self):
+        response = Response(status_code=200, text=AUNIT_RESULTS_XML, headers={})
+
+        with patch('sap.adt.aunit.AUnit.execute_objects', side_effect=[SAPCliError('Time out'), response]) \
+                as fake_execute, self.assertLogs(level='WARNING') as logs:
+            run_results = sap.adt.aunit.ShardedAUnit(connection, retries=1).run([[DummyADTObject()]])
+
+        self.assertEqual(len(run_results.programs), 2)
+        self.assertEqual(fake_execute.call_count, 2)
+        self.assertIn('retrying (1/1): Time out', logs.output[0])
+
+    def test_retry_exhausted(self):
+        with patch('sap.adt.aunit.AUnit.execute_objects', side_effect=SAPCliError('Time out')) as fake_execute, \
+                self.assertRaises(SAPCliError), self.assertLogs(level='WARNING'):
+            sap.adt.aunit.ShardedAUnit(connection, retries=2).run([[DummyADTObject()]])
+
+        self.assertEqual(fake_execute.call_count, 3)
+
+    def test_shard_coverage(self):
+        conn = Connection([Response(status_code=200, text=AUNIT_COVERAGE_RESULTS_XML, headers={}),
+                           Response(status_code=200, text=ACOVERAGE_RESULTS_XML,
+                                    headers={'Content-Type': 'application/xml'}),
+                           Response(status_code=200, text=ACOVERAGE_STATEMENTS_RESULTS_XML,
+                                    headers={'Content-Type': 'application/xml'})])
+
+        shard_runs = list(sap.adt.aunit.ShardedAUnit(conn, coverage=True).iter_runs([[DummyADTObject()]]))
+
+        self.assertIn('<coverage active="true"/>', conn.execs[0].body)
+        self.assertEqual(conn.execs[1].adt_uri, '/sap/bc/adt/runtime/traces/coverage/measurements/FOOBAR')
+        self.assertIn('adtcore:uri="/sap/bc/adt/awesome/success/noobject"', conn.execs[1].body)
+        self.assertEqual([node.name for node in shard_runs[0].coverage.nodes], ['TEST_PKG'])
+
+    def test_shard_without_coverage(self):
+        conn = Connection([Response(status_code=200, text=AUNIT_COVERAGE_RESULTS_XML, headers={})])
+
+        shard_runs = list(sap.adt.aunit.ShardedAUnit(conn).iter_runs([[DummyADTObject()]]))
+
+        self.assertEqual(len(conn.execs), 1)
+        self.assertIsNone(shard_runs[0].coverage)
+
+
+CLASS_METADATA_XML = '''<?xml version="1.0" encoding="utf-8"?>
+<class:abapClass xmlns:class="http://www.sap.com/adt/oo/classes" xmlns:adtcore="http://www.sap.com/adt/core" adtcore:name="ZCL_FOO" adtcore:changedAt="2020-01-01T10:00:00Z">
+  <class:include class:includeType="definitions" adtcore:changedAt="2020-01-01T10:00:00Z"/>
+  <class:include class:includeType="testclasses" adtcore:changedAt="{testclasses}"/>
+</class:abapClass>'''
+
+PROGRAM_METADATA_XML = '''<?xml version="1.0" encoding="utf-8"?>
+<program:abapProgram xmlns:program="http://www.sap.com/adt/programs/programs" xmlns:adtcore="http://www.sap.com/adt/core" adtcore:name="ZPROGRAM" adtcore:changedAt="{changed_at}"/>'''
+
+NOT_FOUND_XML = '''<?xml version="1.0" encoding="utf-8"?><exc:exception xmlns:exc="http://www.sap.com/abapxml/types/communicationframework"><namespace id="com.sap.adt"/><type id="ExceptionResourceNotFound"/><message lang="EN">Not found.</message><localizedMessage lang="EN">Not found.</localizedMessage><properties/></exc:exception>'''
+
+
+def metadata_responses(*changed_ats):
+    return [Response(status_code=200, text=PROGRAM_METADATA_XML.format(changed_at=changed_at), headers={})
+            for changed_at in changed_ats]
+
+
+class TestRunResultsCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_object_version_class(self):
+        conn = Connection([Response(status_code=200, text=CLASS_METADATA_XML.format(testclasses='2020-01-02T10:00:00Z'),
+                                    headers={})])
+
+        version = sap.adt.aunit.object_version(sap.adt.Class(conn, 'ZCL_FOO'))
+
+        self.assertEqual(conn.mock_methods(), [('GET', '/sap/bc/adt/oo/classes/zcl_foo')])
+        self.assertEqual(version, 'class:abapClass=2020-01-01T10:00:00Z definitions=2020-01-01T10:00:00Z '
+                                  'testclasses=2020-01-02T10:00:00Z')
+
+        conn = Connection([Response(status_code=200, text=CLASS_METADATA_XML.format(testclasses='2020-01-03T10:00:00Z'),
+                                    headers={})])
+        self.assertNotEqual(sap.adt.aunit.object_version(sap.adt.Class(conn, 'ZCL_FOO')), version)
+
+    def test_object_version_etag(self):
+        conn = Connection([Response(status_code=200, text=PROGRAM_METADATA_XML.format(changed_at='now'),
+                                    headers={'ETag': '"201912181207340011"'})])
+
+        self.assertEqual(sap.adt.aunit.object_version(sap.adt.Program(conn, 'ZPROGRAM')), '"201912181207340011"')
+
+    def test_object_version_unknown(self):
+        conn = Connection([Response(status_code=200, text='<program/>', headers={}),
+                           Response(status_code=404, text=NOT_FOUND_XML, headers={'content-type': 'application/xml'})])
+
+        self.assertIsNone(sap.adt.aunit.object_version(sap.adt.Program(conn, 'ZPROGRAM')))
+        self.assertIsNone(sap.adt.aunit.object_version(sap.adt.Program(conn, 'ZMISSING')))
+        self.assertIsNone(sap.adt.aunit.object_version(sap.adt.Package(conn, '$ROOT')))
+        self.assertEqual(len(conn.execs), 2)
+
+    def test_run_results_key(self):
+        def run_key(*changed_ats):
+            conn = Connection(metadata_responses(*changed_ats))
+            return sap.adt.aunit.run_results_key(conn, [sap.adt.Program(conn, 'ZFIRST'), sap.adt.Program(conn, 'ZSECOND')])
+
+        self.assertEqual(run_key('first', 'second'), run_key('first', 'second'))
+        self.assertNotEqual(run_key('first', 'second'), run_key('first', 'changed'))
+
+        conn = Connection()
+        self.assertIsNone(sap.adt.aunit.run_results_key(conn, [sap.adt.Package(conn, '$ROOT')]))
+
+    def test_load_save(self):
+        cache = sap.adt.aunit.RunResultsCache(self.tmpdir.name)
+        cache.save('key', AUNIT_NO_TEST_RESULTS_XML)
+
+        self.assertEqual(cache.load('key'), AUNIT_NO_TEST_RESULTS_XML)
+        self.assertIsNone(cache.load('other'))
+
+    def test_expired(self):
+        cache = sap.adt.aunit.RunResultsCache(self.tmpdir.name, ttl=-1)
+        cache.save('key', AUNIT_NO_TEST_RESULTS_XML)
+
+        self.assertIsNone(cache.load('key'))
+        self.assertEqual(os.listdir(self.tmpdir.name), [])
+
+    def test_run_results_cache(self):
+        self.assertIsNone(sap.adt.aunit.run_results_cache(Connection()))
+
+        conn = Connection()
+        conn.options.cache = sap.adt.cache.ResponseCache(self.tmpdir.name)
+        self.assertIsInstance(sap.adt.aunit.run_results_cache(conn), sap.adt.aunit.RunResultsCache)
+
+    def test_run_results_passed(self):
+        self.assertTrue(sap.adt.aunit.run_results_passed(sap.adt.aunit.parse_run_results(AUNIT_NO_TEST_RESULTS_XML)))
+        self.assertTrue(sap.adt.aunit.run_results_passed(sap.adt.aunit.parse_run_results(AUNIT_COVERAGE_RESULTS_XML)))
+        self.assertFalse(sap.adt.aunit.run_results_passed(sap.adt.aunit.parse_run_results(AUNIT_RESULTS_XML)))
+
+    def test_execute_cached(self):
+        cache = sap.adt.aunit.RunResultsCache(self.tmpdir.name)
+
+        conn = Connection(metadata_responses('now') + [Response(status_code=200, text=AUNIT_NO_TEST_RESULTS_XML,
+                                                                headers={})])
+        response, run_results = sap.adt.AUnit(conn, results_cache=cache).execute_and_parse(
+            [sap.adt.Program(conn, 'ZPROGRAM')])
+
+        self.assertEqual(response.text, AUNIT_NO_TEST_RESULTS_XML)
+        self.assertEqual(len(run_results.alerts), 1)
+        self.assertEqual([request.method for request in conn.execs], ['GET', 'POST'])
+
+        conn = Connection(metadata_responses('now'))
+        consumer = Mock()
+        response, run_results = sap.adt.AUnit(conn, results_cache=cache).execute_and_parse(
+            [sap.adt.Program(conn, 'ZPROGRAM')], consumer=consumer)
+
+        self.assertEqual([request.method for request in conn.execs], ['GET'])
+        self.assertEqual(response.headers['Content-Type'], 'application/xml')
+        self.assertEqual(response.text, AUNIT_NO_TEST_RESULTS_XML)
+        self.assertEqual(consumer.alert.call_count, 1)
+        self.assertEqual(run_results.alerts, [])
+
+    def test_execute_failed_not_cached(self):
+        cache = sap.adt.aunit.RunResultsCache(self.tmpdir.name)
+
+        conn = Connection(metadata_responses('now') + [Response(status_code=200, text=AUNIT_RESULTS_XML, headers={})])
+        consumer = Mock()
+        sap.adt.AUnit(conn, results_cache=cache).execute_and_parse([sap.adt.Program(conn, 'ZPROGRAM')],
+                                                                   consumer=consumer)
+
+        self.assertTrue(consumer.test_class.called)
+        self.assertEqual(os.listdir(self.tmpdir.name), [])
+
+    def test_execute_unknown_version_not_cached(self):
+        cache = sap.adt.aunit.RunResultsCache(self.tmpdir.name)
+
+        conn = Connection([Response(status_code=200, text=AUNIT_NO_TEST_RESULTS_XML, headers={})])
+        with patch('sap.adt.aunit.AUnit.execute_objects', wraps=sap.adt.AUnit(conn).execute_objects) as fake_execute:
+            sap.adt.AUnit(conn, results_cache=cache).execute_and_parse([sap.adt.Package(conn, '$ROOT')],
+                                                                       consumer=Mock())
+
+        self.assertEqual(fake_execute.call_args[1]['stream'], True)
+        self.assertEqual([request.method for request in conn.execs], ['POST'])
+        self.assertEqual(os.listdir(self.tmpdir.name), [])
+
+    def test_execute_coverage_not_cached(self):
+        cache = sap.adt.aunit.RunResultsCache(self.tmpdir.name)
+
+        conn = Connection([Response(status_code=200, text=AUNIT_COVERAGE_RESULTS_XML, headers={})])
+        sap.adt.AUnit(conn, results_cache=cache).execute_and_parse([sap.adt.Program(conn, 'ZPROGRAM')],
+                                                                   coverage=True)
+
+        self.assertEqual([request.method for request in conn.execs], ['POST'])
+        self.assertEqual(os.listdir(self.tmpdir.name), [])
+
 
 class TestAlert(unittest.TestCase):
 
@@ -70,6 +442,85 @@ class TestAUnitParseResults(unittest.TestCase):
         self.assertEqual([(alert.kind, alert.severity, alert.title) for alert in run_results.alerts],
                          [('noTestClasses', 'tolerable', 'The task definition does not refer to any test')])
 
+    def test_parse_coverage_identifier(self):
+        self.assertEqual(sap.adt.aunit.parse_run_results(AUNIT_COVERAGE_RESULTS_XML).coverage_identifier, 'FOOBAR')
+        self.assertIsNone(sap.adt.aunit.parse_run_results(AUNIT_RESULTS_XML).coverage_identifier)
+
+    def test_parse_status(self):
+        run_results = sap.adt.aunit.parse_run_results(AUNIT_RESULTS_XML)
+
+        self.assertEqual([(test_method.name, test_method.status)
+                          for test_method in run_results.programs[0].test_classes[0].test_methods],
+                         [('DO_THE_FAIL', sap.adt.aunit.TestMethodStatus.ERR),
+                          ('DO_THE_TEST', sap.adt.aunit.TestMethodStatus.OK)])
+
+    def test_method_status(self):
+        def alert(severity):
+            return Alert(severity=severity, kind=None, title=None, details=None, stack=None)
+
+        self.assertEqual(sap.adt.aunit.test_method_status([]), 'OK')
+        self.assertEqual(sap.adt.aunit.test_method_status([alert(AlertSeverity.TOLERABLE)]), 'SKIP')
+        self.assertEqual(sap.adt.aunit.test_method_status([alert(AlertSeverity.TOLERABLE),
+                                                           alert(AlertSeverity.FATAL)]), 'ERR')
+
+    def test_test_method_default_status(self):
+        error = Alert(severity=AlertSeverity.CRITICAL, kind=None, title=None, details=None, stack=None)
+
+        self.assertEqual(sap.adt.aunit.TestMethod('DO_THE_TEST', []).status, 'OK')
+        self.assertEqual(sap.adt.aunit.TestMethod('DO_THE_FAIL', [error]).status, 'ERR')
+        self.assertEqual(sap.adt.aunit.TestMethod('DO_THE_SKIP', [], 'SKIP').status, 'SKIP')
+
+    def test_parse_response_consumer(self):
+        events = []
+        consumer = Mock()
+        consumer.alert.side_effect = lambda alert: events.append(('alert', alert.kind))
+        consumer.program.side_effect = lambda program: events.append(('program', program.name))
+        consumer.test_class.side_effect = lambda program, test_class: events.append(
+            ('test_class', program.name, test_class.name, [test_method.name for test_method in test_class.test_methods]))
+
+        sap.adt.aunit.parse_run_results_response(Response(text=GLOBAL_TEST_CLASS_AUNIT_RESULTS_XML), consumer)
+        sap.adt.aunit.parse_run_results_response(Response(text=AUNIT_NO_TEST_RESULTS_XML), consumer)
+
+        self.assertEqual(events, [('program', 'ZCL_TEST_CLASS'),
+                                  ('alert', 'warning'),
+                                  ('test_class', 'ZCL_TEST_CLASS', 'ZCL_TEST_CLASS', ['DO_THE_TEST']),
+                                  ('alert', 'noTestClasses')])
+
+    def test_feed_run_results(self):
+        consumer = Mock()
+        run_results = sap.adt.aunit.parse_run_results(AUNIT_RESULTS_XML)
+
+        sap.adt.aunit.feed_run_results(run_results, consumer)
+
+        consumer.alert.assert_not_called()
+        self.assertEqual([call_args[0][0].name for call_args in consumer.program.call_args_list],
+                         ['ZCL_THEKING_MANUAL_HARDCORE', 'ZEXAMPLE_TESTS'])
+        self.assertEqual([(call_args[0][0].name, call_args[0][1].name)
+                          for call_args in consumer.test_class.call_args_list],
+                         [('ZCL_THEKING_MANUAL_HARDCORE', 'LTCL_TEST'),
+                          ('ZCL_THEKING_MANUAL_HARDCORE', 'LTCL_TEST_HARDER'),
+                          ('ZEXAMPLE_TESTS', 'LTCL_TEST')])
+
+    def test_merge_run_results(self):
+        full = sap.adt.aunit.parse_run_results(AUNIT_RESULTS_XML)
+        partial = sap.adt.aunit.parse_run_results(AUNIT_RESULTS_XML)
+        del partial.programs[0].test_classes[0]
+        empty = sap.adt.aunit.parse_run_results(AUNIT_NO_TEST_RESULTS_XML)
+
+        merged = sap.adt.aunit.merge_run_results([empty, partial, full, empty])
+
+        self.assertEqual([(alert.kind, alert.title) for alert in merged.alerts],
+                         [('noTestClasses', 'The task definition does not refer to any test')])
+        self.assertEqual([(program.name, [test_class.name for test_class in program.test_classes])
+                          for program in merged.programs],
+                         [('ZCL_THEKING_MANUAL_HARDCORE', ['LTCL_TEST_HARDER', 'LTCL_TEST']),
+                          ('ZEXAMPLE_TESTS', ['LTCL_TEST'])])
+
+    def test_merge_run_results_single(self):
+        run_results = sap.adt.aunit.parse_run_results(AUNIT_RESULTS_XML)
+
+        self.assertIs(sap.adt.aunit.merge_run_results([run_results]), run_results)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import requests
+
+import sap.adt
+import sap.adt.cache
+from sap.adt.cache import ResponseCache
+
+from mock import Connection, Response
+
+
+def new_response(content, headers):
+    response = requests.Response()
+    response.status_code = 200
+    response.headers = requests.structures.CaseInsensitiveDict(headers)
+    response.encoding = 'utf-8'
+    response._content = content
+
+    return response
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(os.path.join(self.tmpdir.name, 'cache'), max_size=1024)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_key_accept_and_params(self):
+        key = ResponseCache.key('url', params={'a': '1', 'b': '2'}, accept='text/plain')
+
+        self.assertEqual(key, ResponseCache.key('url', params={'b': '2', 'a': '1'}, accept='text/plain'))
+        self.assertNotEqual(key, ResponseCache.key('url', params={'a': '1', 'b': '2'}, accept='text/html'))
+        self.assertNotEqual(key, ResponseCache.key('url', accept='text/plain'))
+
+    def test_get_missing(self):
+        self.assertIsNone(self.cache.get('missing'))
+
+    def test_put_and_get(self):
+        self.assertTrue(self.cache.put('key', new_response(b'REPORT z.', {'Content-Type': 'text/plain',
+                                                                          'ETag': '201902102016330011',
+                                                                          'X-Ignored': 'yes'})))
+
+        entry = self.cache.get('key')
+        self.assertEqual(entry.content, b'REPORT z.')
+        self.assertEqual(entry.headers, {'Content-Type': 'text/plain', 'ETag': '201902102016330011'})
+        self.assertEqual(entry.validators, {'If-None-Match': '201902102016330011'})
+
+        response = entry.to_response('url')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, 'REPORT z.')
+        self.assertEqual(response.headers['content-type'], 'text/plain')
+        self.assertEqual(b''.join(response.iter_content(4)), b'REPORT z.')
+
+    def test_put_without_validators(self):
+        self.assertFalse(self.cache.put('key', new_response(b'REPORT z.', {'Content-Type': 'text/plain'})))
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_last_modified_validator(self):
+        self.cache.put('key', new_response(b'REPORT z.', {'Last-Modified': 'Sun, 10 Feb 2019 20:16:33 GMT'}))
+
+        self.assertEqual(self.cache.get('key').validators,
+                         {'If-Modified-Since': 'Sun, 10 Feb 2019 20:16:33 GMT'})
+
+    def test_evict_least_recently_used(self):
+        for key in ('first', 'second', 'third'):
+            self.cache.put(key, new_response(b'x' * 400, {'ETag': key}))
+            path = os.path.join(self.cache.directory, key + sap.adt.cache.CACHE_ENTRY_SUFFIX)
+            if os.path.exists(path):
+                os.utime(path, (0, {'first': 100, 'second': 200, 'third': 300}[key]))
+
+        self.assertIsNone(self.cache.get('first'))
+        self.assertIsNotNone(self.cache.get('second'))
+        self.assertIsNotNone(self.cache.get('third'))
+
+
+class TestConnectionWithCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_get_text_not_modified(self):
+        cache = ResponseCache(self.tmpdir.name)
+
+        conn = Connection([new_response(b'REPORT z.', {'Content-Type': 'text/plain', 'ETag': 'v1'}),
+                           Response(text='', status_code=304, headers={})])
+        conn.options.cache = cache
+
+        self.assertEqual(conn.get_text('programs/programs/z/source/main'), 'REPORT z.')
+        self.assertEqual(conn.get_text('programs/programs/z/source/main'), 'REPORT z.')
+
+        self.assertEqual(conn.execs[0].headers, {'Accept': 'text/plain'})
+        self.assertEqual(conn.execs[1].headers, {'Accept': 'text/plain', 'If-None-Match': 'v1'})
+
+    def test_get_text_modified(self):
+        cache = ResponseCache(self.tmpdir.name)
+
+        conn = Connection([new_response(b'REPORT z.', {'Content-Type': 'text/plain', 'ETag': 'v1'}),
+                           new_response(b'REPORT z2.', {'Content-Type': 'text/plain', 'ETag': 'v2'}),
+                           Response(text='', status_code=304, headers={})])
+        conn.options.cache = cache
+
+        self.assertEqual(conn.get_text('source'), 'REPORT z.')
+        self.assertEqual(conn.get_text('source'), 'REPORT z2.')
+        self.assertEqual(conn.get_text('source'), 'REPORT z2.')
+
+        self.assertEqual(conn.execs[2].headers, {'Accept': 'text/plain', 'If-None-Match': 'v2'})
+
+    def test_post_not_cached(self):
+        cache = ResponseCache(self.tmpdir.name)
+
+        conn = Connection([new_response(b'<xml/>', {'Content-Type': 'application/xml', 'ETag': 'v1'})])
+        conn.options.cache = cache
+
+        with patch('sap.adt.cache.ResponseCache.put') as fake_put:
+            conn.execute('POST', 'atc/runs')
+
+        fake_put.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
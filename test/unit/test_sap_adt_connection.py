@@ -1,11 +1,22 @@
 #!/usr/bin/env python3
 
+import io
+import gzip
+import time
+import threading
 import unittest
 from unittest.mock import Mock, patch
+from xml.sax.handler import ContentHandler
+
+import requests
+import urllib3
 
 import sap.adt
+import sap.adt.core
 import sap.adt.errors
+from sap.errors import SAPCliError
 
+from mock import Connection, Response
 from fixtures_adt import ERROR_XML_PACKAGE_ALREADY_EXISTS
 
 class TestADTConnection(unittest.TestCase):
@@ -204,5 +215,288 @@ class TestADTConnection(unittest.TestCase):
                          'Unexpected Content-Type: text/plain with: mock')
 
 
+class TestADTConnectionCSRFFetch(unittest.TestCase):
+
+    def fetch_csrf_token(self, connection, responses):
+        with patch('sap.adt.core.Connection._retrieve') as fake_retrieve:
+            fake_retrieve.side_effect = [(None, response) for response in responses]
+            session = connection._get_session()
+
+        return session, [(call[0][1], call[0][2]) for call in fake_retrieve.call_args_list]
+
+    def test_head_default(self):
+        connection = sap.adt.Connection('example.org', '001', 'DEVELOPER', 'Down1oad')
+
+        session, requests = self.fetch_csrf_token(
+            connection,
+            [Response(text='', status_code=200, headers={'x-csrf-token': 'token'})])
+
+        self.assertEqual(session.headers['x-csrf-token'], 'token')
+        self.assertEqual(requests,
+                         [('HEAD', 'https://example.org:443/sap/bc/adt/core/discovery?sap-client=001&saml2=disabled')])
+
+    def test_head_fallback_to_discovery(self):
+        connection = sap.adt.Connection('example.org', '001', 'DEVELOPER', 'Down1oad',
+                                        options=sap.adt.ConnectionOptions(csrf_fetch=sap.adt.core.CSRF_FETCH_HEAD))
+
+        session, requests = self.fetch_csrf_token(
+            connection,
+            [Response(text='Method not allowed', status_code=405, headers={'content-type': 'text/plain'}),
+             Response(text='<discovery/>', status_code=200, headers={'x-csrf-token': 'token'})])
+
+        self.assertEqual(session.headers['x-csrf-token'], 'token')
+        self.assertEqual([method for method, _ in requests], ['HEAD', 'GET'])
+
+    def test_discovery(self):
+        connection = sap.adt.Connection('example.org', '001', 'DEVELOPER', 'Down1oad',
+                                        options=sap.adt.ConnectionOptions(csrf_fetch=sap.adt.core.CSRF_FETCH_DISCOVERY))
+
+        session, requests = self.fetch_csrf_token(
+            connection,
+            [Response(text='<discovery/>', status_code=200, headers={'x-csrf-token': 'token'})])
+
+        self.assertEqual(session.headers['x-csrf-token'], 'token')
+        self.assertEqual([method for method, _ in requests], ['GET'])
+
+    def test_environment(self):
+        with patch.dict('os.environ', {'SAPCLI_CSRF_FETCH': 'discovery'}):
+            connection = sap.adt.Connection('example.org', '001', 'DEVELOPER', 'Down1oad')
+
+        self.assertEqual(connection.options.csrf_fetch, sap.adt.core.CSRF_FETCH_DISCOVERY)
+
+    def test_unknown(self):
+        with self.assertRaises(SAPCliError):
+            sap.adt.ConnectionOptions(csrf_fetch='magic')
+
+
+class TestADTConnectionThreads(unittest.TestCase):
+
+    def new_connection(self, **kwargs):
+        return sap.adt.Connection('example.org', '001', 'DEVELOPER', 'Down1oad',
+                                  options=sap.adt.ConnectionOptions(**kwargs))
+
+    def run_threads(self, target, count=4):
+        threads = [threading.Thread(target=target) for _ in range(count)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+    def test_pool_default(self):
+        connection = self.new_connection()
+
+        with patch('sap.adt.core.Connection._fetch_csrf_token'):
+            adapter = connection._get_session().get_adapter('https://example.org')
+
+        self.assertIsInstance(adapter, sap.adt.core.KeepAliveHTTPAdapter)
+        self.assertEqual(adapter._pool_maxsize, sap.adt.core.DEFAULT_POOL_MAXSIZE)
+        self.assertTrue(adapter._pool_block)
+
+    def test_pool_environment(self):
+        with patch.dict('os.environ', {'SAPCLI_HTTP_POOL_SIZE': '32'}):
+            connection = self.new_connection(pool_block=False)
+
+        with patch('sap.adt.core.Connection._fetch_csrf_token'):
+            adapter = connection._get_session().get_adapter('http://example.org')
+
+        self.assertEqual(adapter._pool_maxsize, 32)
+        self.assertFalse(adapter._pool_block)
+
+    def test_pool_invalid(self):
+        with patch.dict('os.environ', {'SAPCLI_HTTP_POOL_SIZE': 'many'}):
+            with self.assertRaises(SAPCliError):
+                self.new_connection()
+
+        with self.assertRaises(SAPCliError):
+            self.new_connection(pool_maxsize=0)
+
+    def test_session_initialized_once(self):
+        connection = self.new_connection()
+        sessions = []
+
+        def slow_fetch(session):
+            time.sleep(0.05)
+            session.headers['x-csrf-token'] = 'token'
+
+        with patch('sap.adt.core.Connection._fetch_csrf_token', side_effect=slow_fetch) as fake_fetch:
+            self.run_threads(lambda: sessions.append(connection._get_session()))
+
+        fake_fetch.assert_called_once()
+        self.assertEqual(len(sessions), 4)
+        self.assertTrue(all(session is sessions[0] for session in sessions))
+        self.assertEqual(sessions[0].headers['x-csrf-token'], 'token')
+
+    def test_csrf_token_refreshed_once(self):
+        connection = self.new_connection()
+        barrier = threading.Barrier(4)
+        fetches = []
+
+        def fake_retrieve(session, method, url, params=None, headers=None, body=None, stream=False):
+            if method == 'HEAD':
+                fetches.append(url)
+                return (None, Response(text='', status_code=200, headers={'x-csrf-token': 'fresh'}))
+
+            if session.headers['x-csrf-token'] == 'expired':
+                # let all threads fail before refreshing the token
+                barrier.wait()
+                return (None, Response(text='CSRF token validation failed', status_code=403,
+                                       headers={'x-csrf-token': 'Required', 'content-type': 'text/plain'}))
+
+            return (None, Response(text='', status_code=200, headers={}))
+
+        with patch('sap.adt.core.Connection._retrieve', side_effect=fake_retrieve):
+            connection._get_session().headers['x-csrf-token'] = 'expired'
+            fetches.clear()
+
+            self.run_threads(lambda: connection.execute('POST', 'activation'))
+
+        self.assertEqual(len(fetches), 1)
+        self.assertEqual(connection._get_session().headers['x-csrf-token'], 'fresh')
+
+
+class TestADTConnectionCompression(unittest.TestCase):
+
+    def test_accept_encoding(self):
+        connection = sap.adt.Connection('example.org', '001', 'DEVELOPER', 'Down1oad')
+
+        with patch('sap.adt.core.Connection._fetch_csrf_token'):
+            session = connection._get_session()
+
+        # requests asks for compressed responses which are decompressed on the fly while being read
+        self.assertIn('gzip', session.headers['Accept-Encoding'])
+
+    def test_transfer_stats(self):
+        content = b'<atcworklist/>' * 1000
+
+        def fake_send(request, **kwargs):
+            raw = urllib3.HTTPResponse(body=io.BytesIO(gzip.compress(content)), status=200,
+                                       headers={'Content-Encoding': 'gzip'}, preload_content=False)
+            return requests.adapters.HTTPAdapter().build_response(request, raw)
+
+        connection = sap.adt.Connection('example.org', '001', 'DEVELOPER', 'Down1oad')
+        session = requests.Session()
+
+        with patch.object(session, 'send', side_effect=fake_send):
+            _, res = connection._retrieve(session, 'GET', 'https://example.org/sap/bc/adt/atc/worklists/1')
+
+        self.assertEqual(res.content, content)
+
+        stats = connection.transfer_stats
+        self.assertEqual(stats.requests, 1)
+        self.assertEqual(stats.uncompressed, len(content))
+        self.assertEqual(stats.compressed, len(gzip.compress(content)))
+        self.assertEqual(stats.saved, stats.uncompressed - stats.compressed)
+
+    def test_compress_large_put(self):
+        connection = Connection([Response(text='', status_code=200, headers={}) for _ in range(3)])
+        connection.options.compress_requests = True
+
+        body = 'WRITE: / 1.\n' * sap.adt.core.REQUEST_COMPRESSION_THRESHOLD
+        connection.execute('PUT', 'source', headers={'Content-Type': 'text/plain'}, body=body)
+        connection.execute('PUT', 'source', headers={'Content-Type': 'text/plain'}, body='small')
+        connection.execute('POST', 'source', body=body)
+
+        self.assertEqual(connection.execs[0].headers, {'Content-Type': 'text/plain', 'Content-Encoding': 'gzip'})
+        self.assertEqual(gzip.decompress(connection.execs[0].body), body.encode('utf-8'))
+        self.assertEqual(connection.execs[1].headers, {'Content-Type': 'text/plain'})
+        self.assertEqual(connection.execs[2].body, body)
+
+    def test_compressed_put_not_supported(self):
+        connection = Connection([Response(text='Unsupported', status_code=415, headers={'content-type': 'text/plain'}),
+                                 Response(text='', status_code=200, headers={}),
+                                 Response(text='', status_code=200, headers={})])
+        connection.options.compress_requests = True
+
+        body = b'x' * sap.adt.core.REQUEST_COMPRESSION_THRESHOLD
+        connection.execute('PUT', 'source', body=body)
+        connection.execute('PUT', 'source', body=body)
+
+        self.assertEqual(connection.execs[0].headers, {'Content-Encoding': 'gzip'})
+        self.assertIsNone(connection.execs[1].headers)
+        self.assertEqual(connection.execs[1].body, body)
+        self.assertIsNone(connection.execs[2].headers)
+
+    def test_compressed_put_not_supported_adt_error(self):
+        connection = Connection([Response(text=ERROR_XML_PACKAGE_ALREADY_EXISTS, status_code=415,
+                                          headers={'content-type': 'application/xml'}),
+                                 Response(text='', status_code=200, headers={})])
+        connection.options.compress_requests = True
+
+        body = b'x' * sap.adt.core.REQUEST_COMPRESSION_THRESHOLD
+        connection.execute('PUT', 'source', body=body)
+
+        self.assertEqual(connection.execs[0].headers, {'Content-Encoding': 'gzip'})
+        self.assertEqual(connection.execs[1].body, body)
+        self.assertFalse(connection.options.compress_requests)
+
+    def test_compressed_put_adt_error(self):
+        connection = Connection([Response(text=ERROR_XML_PACKAGE_ALREADY_EXISTS, status_code=400,
+                                          headers={'content-type': 'application/xml'})])
+        connection.options.compress_requests = True
+
+        with self.assertRaises(sap.adt.errors.ADTError) as caught:
+            connection.execute('PUT', 'source', body=b'x' * sap.adt.core.REQUEST_COMPRESSION_THRESHOLD)
+
+        self.assertEqual(caught.exception.response.status_code, 400)
+        self.assertEqual(len(connection.execs), 1)
+
+    def test_compress_environment(self):
+        with patch.dict('os.environ', {'SAPCLI_HTTP_COMPRESS_REQUESTS': 'true'}):
+            connection = sap.adt.Connection('example.org', '001', 'DEVELOPER', 'Down1oad')
+
+        self.assertTrue(connection.options.compress_requests)
+
+
+class TestADTConnectionStreaming(unittest.TestCase):
+
+    def test_execute_stream(self):
+        connection = Connection([Response(text='<root/>', status_code=200, content_type='application/xml')])
+        connection.options.cache = Mock()
+
+        with patch.object(connection, '_retrieve', wraps=connection._retrieve) as fake_retrieve:
+            resp = connection.execute('GET', 'atc/worklists/1', accept='application/xml', stream=True)
+
+        self.assertEqual(resp.text, '<root/>')
+        self.assertTrue(fake_retrieve.call_args[1]['stream'])
+        connection.options.cache.get.assert_not_called()
+
+    def test_parse_xml_response(self):
+        content = '<?xml version="1.0" encoding="utf-8"?><root>' + '<item>Šárka</item>' * 10000 + '</root>'
+        response = Mock()
+        response.iter_content.side_effect = \
+            lambda chunk_size: (content.encode('utf-8')[i:i + 1000] for i in range(0, len(content.encode('utf-8')), 1000))
+
+        class ItemHandler(ContentHandler):
+
+            def __init__(self):
+                super(ItemHandler, self).__init__()
+                self.items = 0
+                self.text = ''
+
+            def startElement(self, name, attrs):
+                if name == 'item':
+                    self.items += 1
+
+            def characters(self, content):
+                self.text += content
+
+        handler = sap.adt.core.parse_xml_response(response, ItemHandler())
+
+        self.assertEqual(handler.items, 10000)
+        self.assertEqual(handler.text, 'Šárka' * 10000)
+        response.close.assert_called_once()
+
+    def test_debug_log_truncated(self):
+        res = requests.Response()
+        res._content = b'x' * (sap.adt.core.DEBUG_RESPONSE_LIMIT + 10)
+        res.encoding = 'utf-8'
+
+        text = sap.adt.core._truncated_text(res)
+
+        self.assertEqual(text, 'x' * sap.adt.core.DEBUG_RESPONSE_LIMIT + '\n... truncated 10 bytes')
+
+
 if __name__ == '__main__':
     unittest.main()
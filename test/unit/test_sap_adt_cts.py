@@ -293,6 +293,17 @@ class TestADTCTSWorkbenchBuilder(unittest.TestCase):
         self.assertEqual(transport.owner, 'FILAK')
         self.assertEqual(transport._connection, connection)
 
+    def test_main_object(self):
+        def main_object(pgmid, typ, name):
+            return sap.adt.cts.WorkbenchABAPObject(pgmid, typ, name, '', name, False).main_object
+
+        self.assertEqual(main_object('R3TR', 'PROG', 'ZPROG'), ('PROG', 'ZPROG'))
+        self.assertEqual(main_object('LIMU', 'METH', 'ZCL_A                         DO_IT'), ('CLAS', 'ZCL_A'))
+        self.assertEqual(main_object('LIMU', 'CINC', 'ZCL_A=========================CCAU'), ('CLAS', 'ZCL_A'))
+        self.assertEqual(main_object('LIMU', 'CPUB', 'ZCL_A'), ('CLAS', 'ZCL_A'))
+        self.assertIsNone(main_object('LIMU', 'REPS', 'ZINCLUDE'))
+        self.assertIsNone(main_object('CORR', 'RELE', 'C50K000001 20190216 142210 DEVELOPER'))
+
     def test_process_abap_object_foreign(self):
         builder = sap.adt.cts.WorkbenchBuilder('noconnection')
         wb_object = builder.process_abap_object_xml(Element(FOREIGN_ABAP_OBJECT_ATTRIBUTES, []))
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import tempfile
+import unittest
+
+import sap.adt.cache
+import sap.adt.discovery
+from sap.adt.discovery import Discovery, DiscoveryCache, TemplateLink, parse_discovery
+
+from mock import Connection, Response
+from fixtures_adt_discovery import DISCOVERY_ADT_XML
+
+
+AUNIT_CONFIG_MIME_TYPES = ['application/vnd.sap.adt.abapunit.testruns.config.v5+xml',
+                           'application/vnd.sap.adt.abapunit.testruns.config.v4+xml',
+                           'application/vnd.sap.adt.abapunit.testruns.config.v3+xml']
+
+
+class TestParseDiscovery(unittest.TestCase):
+
+    def test_parse_collections(self):
+        discovery = parse_discovery(DISCOVERY_ADT_XML)
+
+        self.assertEqual(len(discovery), 2)
+
+        testruns = discovery.collection('abapunit/testruns')
+        self.assertEqual(testruns.href, '/sap/bc/adt/abapunit/testruns')
+        self.assertEqual(testruns.title, 'ABAP Unit Test Runs')
+        self.assertEqual(len(testruns.accepts), 4)
+        self.assertEqual(testruns.template_links, ())
+
+    def test_merge_workspaces(self):
+        discovery = parse_discovery(DISCOVERY_ADT_XML)
+
+        programs = discovery.collection('/sap/bc/adt/programs/programs')
+        self.assertEqual(programs.accepts, ('application/vnd.sap.adt.programs.programs.v2+xml',
+                                            'application/vnd.sap.adt.programs.programs+xml'))
+        self.assertEqual(programs.template_links,
+                         (TemplateLink('http://www.sap.com/adt/relations/source',
+                                       '/sap/bc/adt/programs/programs/{program_name}/source/main',
+                                       'text/plain'),))
+
+    def test_pick_accepted(self):
+        discovery = parse_discovery(DISCOVERY_ADT_XML)
+
+        self.assertEqual(discovery.pick_accepted('abapunit/testruns', AUNIT_CONFIG_MIME_TYPES),
+                         'application/vnd.sap.adt.abapunit.testruns.config.v4+xml')
+        self.assertIsNone(discovery.pick_accepted('abapunit/testruns', ['application/xml']))
+        self.assertIsNone(discovery.pick_accepted('unknown', AUNIT_CONFIG_MIME_TYPES))
+
+    def test_dict_roundtrip(self):
+        discovery = parse_discovery(DISCOVERY_ADT_XML)
+
+        restored = Discovery.from_dict(json.loads(json.dumps(discovery.to_dict())))
+
+        self.assertEqual(list(restored), list(discovery))
+
+
+class TestDiscoveryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_save_and_load(self):
+        cache = DiscoveryCache(self.tmpdir.name)
+        cache.save('https://example.org?sap-client=001', parse_discovery(DISCOVERY_ADT_XML))
+
+        self.assertEqual(len(cache.load('https://example.org?sap-client=001')), 2)
+        self.assertIsNone(cache.load('https://example.org?sap-client=002'))
+
+    def test_expired(self):
+        cache = DiscoveryCache(self.tmpdir.name, ttl=-1)
+        cache.save('key', parse_discovery(DISCOVERY_ADT_XML))
+
+        self.assertIsNone(cache.load('key'))
+
+
+class TestConnectionDiscovery(unittest.TestCase):
+
+    def test_fetch_once(self):
+        conn = Connection([Response(text=DISCOVERY_ADT_XML, status_code=200,
+                                    content_type='application/atomsvc+xml')])
+
+        self.assertIs(conn.discovery, conn.discovery)
+        self.assertEqual(conn.mock_methods(), [('GET', '/sap/bc/adt/core/discovery')])
+        self.assertEqual(conn.execs[0].headers, {'Accept': 'application/atomsvc+xml'})
+
+    def test_cached_on_disk(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            conn = Connection([Response(text=DISCOVERY_ADT_XML, status_code=200,
+                                        content_type='application/atomsvc+xml')])
+            conn.options.cache = sap.adt.cache.ResponseCache(cache_dir)
+            self.assertEqual(len(conn.discovery), 2)
+
+            conn = Connection([])
+            conn.options.cache = sap.adt.cache.ResponseCache(cache_dir)
+            self.assertEqual(len(conn.discovery), 2)
+
+            self.assertEqual(conn.execs, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
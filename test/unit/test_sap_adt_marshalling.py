@@ -1,13 +1,14 @@
 #!/bin/python
 
+import io
 import unittest
 
-from sap import get_logger
+from sap import get_logger, TRACE
 from sap.adt import ADTObject, ADTObjectType, ADTCoreData, OrderedClassMembers
 from sap.adt.objects import XMLNamespace
 from sap.adt.annotations import xml_element, xml_attribute, XmlElementProperty, XmlElementKind, XmlNodeProperty, \
                                 XmlNodeAttributeProperty, XmlContainer, XmlListNodeProperty
-from sap.adt.marshalling import Marshal, Element, adt_object_to_element_name, ElementHandler
+from sap.adt.marshalling import Marshal, MarshallingError, Element, adt_object_to_element_name, ElementHandler, deserialization_plan
 
 
 class Dummy(ADTObject):
@@ -393,33 +394,32 @@ class DummyWithTheTextList(metaclass=OrderedClassMembers):
 class TestADTAnnotation(unittest.TestCase):
 
 
-    def test_tree_generation(self):
+    def test_serialization(self):
         obj = Dummy()
         marshal = Marshal()
-        xmltree = marshal._object_to_tree(obj)
 
-        self.assertEqual(xmltree.name, 'dummyxmlns:dummyelem')
-        self.assertEqual(xmltree.attributes['attr_first'], '11111')
-        self.assertEqual(xmltree.attributes['attr_second'], '22222')
-        self.assertEqual(xmltree.attributes['attr_third'], '3333')
-
-        self.assertEqual(xmltree.children[0].name, 'adtcore:packageRef')
-
-        self.assertEqual(xmltree.children[1].name, 'first_elem')
-        self.assertEqual(xmltree.children[1].attributes['nst_fst'], 'nst_fst_val')
-        self.assertEqual(xmltree.children[1].attributes['nst_scn'], 'nst_scn_val')
-
-        self.assertEqual(xmltree.children[1].children[0].name, 'child_nst')
-        self.assertEqual(xmltree.children[1].children[0].attributes['sup_nst_fst'], 'yetanother')
-
-    def test_xml_formatting(self):
-        marshal = Marshal()
+        self.assertEqual(marshal.serialize(obj), '''<?xml version="1.0" encoding="UTF-8"?>
+<dummyxmlns:dummyelem xmlns:dummyxmlns="http://www.sap.com/adt/xmlns/dummy" adtcore:type="CODE" adtcore:description="Description" adtcore:language="CZ" adtcore:name="dmtname" adtcore:masterLanguage="EN" adtcore:masterSystem="NPL" adtcore:responsible="FILAK" attr_first="11111" attr_second="22222" attr_third="3333">
+<adtcore:packageRef/>
+<first_elem nst_fst="nst_fst_val" nst_scn="nst_scn_val">
+<child_nst sup_nst_fst="yetanother"/>
+</first_elem>
+<readonly_elem nst_fst="nst_fst_val" nst_scn="nst_scn_val">
+<child_nst sup_nst_fst="yetanother"/>
+</readonly_elem>
+</dummyxmlns:dummyelem>''')
+
+    def test_element(self):
         elem = Element('root')
         elem.add_attribute('one', '1')
         elem.add_attribute('two', '2')
         child = elem.add_child('child')
-        xml = marshal._tree_to_xml(elem)
-        self.assertEqual(xml, '<?xml version="1.0" encoding="UTF-8"?>\n<root one="1" two="2">\n<child/>\n</root>')
+
+        self.assertEqual(elem.attributes, {'one': '1', 'two': '2'})
+        self.assertEqual(elem.children, [child])
+
+        with self.assertRaises(MarshallingError):
+            elem.text = 'text'
 
     def test_element_handler(self):
         adt_object = DummyWithSetters()
@@ -456,6 +456,38 @@ class TestADTAnnotation(unittest.TestCase):
         grand_child_handler.set('sup_nst_fst', 'X')
         self.assertEqual(adt_object.value.supernested.yetanother, 'X')
 
+    def test_deserialization_plan(self):
+        plan = deserialization_plan(DummyWithSetters)
+
+        self.assertIs(plan, deserialization_plan(DummyWithSetters))
+        self.assertIn('attr_first', plan.attributes)
+        self.assertIn('first_elem', [element.name for element in plan.elements])
+        self.assertEqual([(xpath, element.name) for xpath, element in plan.children],
+                         [(f'/{element.name}', element.name) for element in plan.elements])
+
+        with self.assertRaises(TypeError):
+            plan.attributes['attr_first'] = None
+
+    def test_element_handler_reused(self):
+        adt_object = DummyWithSetters()
+        name = '/' + adt_object_to_element_name(adt_object)
+
+        elements = dict()
+        handler = ElementHandler(name, elements, lambda: adt_object)
+        elements[name] = handler
+
+        handler.new()
+        child_handler = elements[f'{name}/first_elem']
+
+        handler.new()
+        self.assertIs(child_handler, elements[f'{name}/first_elem'])
+
+
+    def test_write_to_stream(self):
+        dest = io.StringIO()
+        Marshal().write(Dummy(), dest)
+
+        self.assertEqual(dest.getvalue(), Marshal().serialize(Dummy()))
 
     def test_deserialization(self):
         obj = Dummy()
@@ -473,6 +505,23 @@ class TestADTAnnotation(unittest.TestCase):
         self.assertEqual(obj.value.second, clone.value.second)
         self.assertEqual(obj.value.supernested.yetanother, clone.value.supernested.yetanother)
 
+    def test_deserialization_trace(self):
+        xml_data = Marshal().serialize(Dummy())
+
+        with self.assertLogs(level=TRACE) as logs:
+            Marshal.deserialize(xml_data, DummyWithSetters())
+
+        self.assertIn('TRACE:root:Deserializing element: /dummyxmlns:dummyelem/first_elem', logs.output)
+
+    def test_deserialization_no_trace(self):
+        xml_data = Marshal().serialize(Dummy())
+
+        with self.assertLogs(level='DEBUG') as logs:
+            get_logger().debug('Deserializing')
+            Marshal.deserialize(xml_data, DummyWithSetters())
+
+        self.assertFalse([line for line in logs.output if line.startswith('TRACE:')])
+
     def test_deserialize_with_factory(self):
         dummy = DummyWithChildFactory()
 
@@ -73,6 +73,9 @@ class TestADTProgram(unittest.TestCase):
         self.assertEqual(program.fix_point_arithmetic, True)
         self.assertEqual(program.case_sensitive, True)
         self.assertEqual(program.application_database, 'S')
+        self.assertEqual(program.changed_at, '2019-02-10T20:16:33Z')
+
+        self.assertNotIn('adtcore:changedAt', sap.adt.marshalling.Marshal().serialize(program))
 
 
 if __name__ == '__main__':
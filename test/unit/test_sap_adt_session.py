@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+import os
+import stat
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import requests
+
+import sap.adt
+from sap.adt.session import SessionStore
+
+from mock import Response
+
+
+class TestSessionStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'sessions', 'sapcli.json')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_load_missing(self):
+        store = SessionStore(self.path)
+
+        self.assertIsNone(store.load('key', requests.Session()))
+
+    def test_save_and_load(self):
+        session = requests.Session()
+        session.cookies.set('SAP_SESSIONID_NPL_001', 'cookie', domain='example.org', path='/')
+
+        store = SessionStore(self.path)
+        store.save('key', session, 'token')
+
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+
+        restored = requests.Session()
+        self.assertEqual(store.load('key', restored), 'token')
+        self.assertEqual(restored.cookies.get('SAP_SESSIONID_NPL_001', domain='example.org'), 'cookie')
+
+        self.assertIsNone(store.load('other', requests.Session()))
+
+    def test_load_corrupted(self):
+        with open(self.tmpdir.name + '/corrupted', 'w') as dest:
+            dest.write('{')
+
+        self.assertIsNone(SessionStore(self.tmpdir.name + '/corrupted').load('key', requests.Session()))
+
+
+class TestConnectionWithSessionStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = SessionStore(os.path.join(self.tmpdir.name, 'sapcli.json'))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def new_connection(self):
+        return sap.adt.Connection('example.org', '001', 'DEVELOPER', 'Down1oad',
+                                  options=sap.adt.ConnectionOptions(session_store=self.store))
+
+    def test_reuse_stored_session(self):
+        responses = [Response(text='', status_code=200, headers={'x-csrf-token': 'token'}),
+                     Response(text='', status_code=200, headers={}),
+                     Response(text='', status_code=200, headers={})]
+
+        with patch('sap.adt.core.Connection._retrieve') as fake_retrieve:
+            fake_retrieve.side_effect = [(None, response) for response in responses]
+
+            self.new_connection().execute('POST', 'activation')
+
+            connection = self.new_connection()
+            connection.execute('POST', 'activation')
+
+        self.assertEqual([call[0][2] for call in fake_retrieve.call_args_list],
+                         ['https://example.org:443/sap/bc/adt/core/discovery?sap-client=001&saml2=disabled',
+                          'https://example.org:443/sap/bc/adt/activation?sap-client=001&saml2=disabled',
+                          'https://example.org:443/sap/bc/adt/activation?sap-client=001&saml2=disabled'])
+
+        self.assertEqual(connection._get_session().headers['x-csrf-token'], 'token')
+
+    def test_refresh_invalid_token(self):
+        self.store.save(self.new_connection()._session_key, requests.Session(), 'expired')
+
+        responses = [Response(text='CSRF token validation failed', status_code=403,
+                              headers={'x-csrf-token': 'Required', 'content-type': 'text/plain'}),
+                     Response(text='', status_code=200, headers={'x-csrf-token': 'fresh'}),
+                     Response(text='', status_code=200, headers={})]
+
+        connection = self.new_connection()
+
+        with patch('sap.adt.core.Connection._retrieve') as fake_retrieve:
+            fake_retrieve.side_effect = [(None, response) for response in responses]
+
+            resp = connection.execute('POST', 'activation')
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([call[0][1] for call in fake_retrieve.call_args_list], ['POST', 'HEAD', 'POST'])
+        self.assertEqual(connection._get_session().headers['x-csrf-token'], 'fresh')
+        self.assertEqual(self.store.load(connection._session_key, requests.Session()), 'fresh')
+
+
+if __name__ == '__main__':
+    unittest.main()
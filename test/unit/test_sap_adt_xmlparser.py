@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+import unittest
+from unittest.mock import patch
+from xml.sax.handler import ContentHandler
+
+import sap.adt.xmlparser
+from sap.adt.xmlparser import parse_xml, new_xml_parser, xml_parser_backend
+from sap.errors import SAPCliError
+
+from fixtures_adt_atc import ADT_XML_ATC_WORKLIST_CLASS
+from fixtures_adt_aunit import AUNIT_RESULTS_XML
+
+
+DOCUMENT_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<!-- comment -->
+<a:root xmlns:a="http://example.org/a" xmlns:b="http://example.org/b" a:name="root &amp; co">
+  <a:item b:kind="first">Text &lt;1&gt;
+multiline</a:item>
+  <b:item xmlns:c="http://example.org/c" c:kind="second"><c:empty/>tail</b:item>
+  <plain>Šárka</plain>
+</a:root>'''
+
+
+class RecordingHandler(ContentHandler):
+
+    def __init__(self):
+        super(RecordingHandler, self).__init__()
+
+        self.events = []
+
+    def startDocument(self):
+        self.events.append(('startDocument',))
+
+    def endDocument(self):
+        self.events.append(('endDocument',))
+
+    def startElement(self, name, attrs):
+        self.events.append(('startElement', name, dict(attrs.items())))
+
+    def endElement(self, name):
+        self.events.append(('endElement', name))
+
+    def characters(self, content):
+        # xml.sax may split text to several calls
+        if self.events[-1][0] == 'characters':
+            content = self.events.pop()[1] + content
+
+        self.events.append(('characters', content))
+
+
+def parse_events(xml_text, backend):
+    return parse_xml(xml_text, RecordingHandler(), backend=backend).events
+
+
+class TestXMLParserBackends(unittest.TestCase):
+
+    def assert_same_events(self, xml_text, backend):
+        self.assertEqual(parse_events(xml_text, backend), parse_events(xml_text, sap.adt.xmlparser.XML_PARSER_SAX))
+
+    def test_expat_same_as_sax(self):
+        for xml_text in (DOCUMENT_XML, ADT_XML_ATC_WORKLIST_CLASS, AUNIT_RESULTS_XML):
+            self.assert_same_events(xml_text, sap.adt.xmlparser.XML_PARSER_EXPAT)
+
+    @unittest.skipIf(sap.adt.xmlparser.etree is None, 'lxml is not installed')
+    def test_lxml_same_as_sax(self):
+        for xml_text in (DOCUMENT_XML, ADT_XML_ATC_WORKLIST_CLASS, AUNIT_RESULTS_XML):
+            self.assert_same_events(xml_text, sap.adt.xmlparser.XML_PARSER_LXML)
+
+    def test_feed_blocks(self):
+        data = DOCUMENT_XML.encode('utf-8')
+
+        for backend in sap.adt.xmlparser.XML_PARSERS:
+            if backend == sap.adt.xmlparser.XML_PARSER_LXML and sap.adt.xmlparser.etree is None:
+                continue
+
+            handler = RecordingHandler()
+            parser = new_xml_parser(handler, backend=backend)
+
+            for start in range(0, len(data), 7):
+                parser.feed(data[start:start + 7])
+
+            parser.close()
+
+            self.assertEqual(handler.events, parse_events(DOCUMENT_XML, sap.adt.xmlparser.XML_PARSER_SAX),
+                             msg=backend)
+
+
+class TestXMLParserBackend(unittest.TestCase):
+
+    def test_default(self):
+        with patch.dict('os.environ', {}, clear=True):
+            self.assertEqual(xml_parser_backend(), sap.adt.xmlparser.XML_PARSER_SAX)
+
+    def test_environment(self):
+        with patch.dict('os.environ', {'SAPCLI_XML_PARSER': 'expat'}):
+            self.assertEqual(xml_parser_backend(), sap.adt.xmlparser.XML_PARSER_EXPAT)
+
+    def test_unknown(self):
+        with patch.dict('os.environ', {'SAPCLI_XML_PARSER': 'magic'}):
+            with self.assertRaises(SAPCliError):
+                xml_parser_backend()
+
+    def test_lxml_not_installed(self):
+        with patch.dict('os.environ', {'SAPCLI_XML_PARSER': 'lxml'}), \
+             patch('sap.adt.xmlparser.etree', None):
+            self.assertEqual(xml_parser_backend(), sap.adt.xmlparser.XML_PARSER_EXPAT)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,7 @@
 
 import unittest
 from unittest.mock import patch, MagicMock
+from types import SimpleNamespace
 
 import sap.cli
 import sap.cli.core
@@ -24,6 +25,30 @@ class TestModule(unittest.TestCase):
                 msg='The second item should be of a command group - Command: ' + str(idx))
 
 
+class TestADTConnectionFromArgs(unittest.TestCase):
+
+    def connection_args(self, **kwargs):
+        args = {'ashost': 'fixtures', 'client': '975', 'user': 'fantomas', 'password': 'Down1oad', 'port': 443,
+                'ssl': True, 'verify': True, 'cache_dir': None, 'cache_max_size': None, 'session_file': None}
+        args.update(kwargs)
+        return SimpleNamespace(**args)
+
+    def test_without_cache(self):
+        connection = sap.cli.adt_connection_from_args(self.connection_args())
+
+        self.assertIsNone(connection.options.cache)
+
+    def test_cache_max_size(self):
+        import sap.adt.cache
+
+        connection = sap.cli.adt_connection_from_args(self.connection_args(cache_dir='/tmp/sapcli'))
+        self.assertEqual(connection.options.cache._max_size, sap.adt.cache.DEFAULT_CACHE_MAX_SIZE)
+
+        connection = sap.cli.adt_connection_from_args(self.connection_args(cache_dir='/tmp/sapcli', cache_max_size=2))
+        self.assertEqual(connection.options.cache.directory, '/tmp/sapcli')
+        self.assertEqual(connection.options.cache._max_size, 2 * 1024 * 1024)
+
+
 class TestPrinting(unittest.TestCase):
 
     def test_get_console_returns_global(self):
@@ -1,14 +1,17 @@
 #!/usr/bin/env python3
 
 import sys
+import json
+import tempfile
 import unittest
-from unittest.mock import patch, Mock, call
+from unittest.mock import patch, Mock, call, mock_open
 from argparse import ArgumentParser
 from types import SimpleNamespace
 from io import StringIO
 
 from sap.errors import SAPCliError
 import sap.cli.atc
+import sap.adt.cache
 from sap.adt.objects import ADTObjectSets
 
 from mock import Connection, Response
@@ -68,14 +71,14 @@ class TetsRun(unittest.TestCase):
         self.setUpADTObjectSets(fake_sets)
 
     def assertRunCalls(self, fake_object, fake_fetch_customizing, fake_sets, fake_runner, fake_print):
-        fake_fetch_customizing.assert_called_once_with(self.connection)
+        fake_fetch_customizing.assert_called_once_with(self.connection, cache=None)
 
         fake_object.assert_called_once_with(self.connection, fake_object.name)
 
         fake_sets.assert_called_once()
         fake_sets.return_value.include_object.assert_called_once_with(fake_object.return_value)
 
-        fake_runner.assert_called_once_with(self.connection, 'THE_VARIANT')
+        fake_runner.assert_called_once_with(self.connection, 'THE_VARIANT', worklist_id=None)
         fake_runner.return_value.run_for.assert_called_once_with(fake_sets.return_value, max_verdicts=100)
 
         fake_print.assert_called_once_with('WORKLIST', sys.stdout, error_level=2)
@@ -143,7 +146,7 @@ class TetsRun(unittest.TestCase):
         args.execute(self.connection, args)
 
         fake_fetch_customizing.assert_not_called()
-        fake_runner.assert_called_once_with(self.connection, 'MY_SPECIAL_VARIANT')
+        fake_runner.assert_called_once_with(self.connection, 'MY_SPECIAL_VARIANT', worklist_id=None)
 
     @patch('sap.cli.atc.print_worklist_to_stream')
     @patch('sap.adt.objects.ADTObjectSets')
@@ -246,6 +249,288 @@ class TetsPrintWorklistToStream(unittest.TestCase):
 ''')
         self.assertEqual(0, ret)
 
+    def test_object_without_findings(self):
+        atcobject = sap.adt.atc.ATCObject()
+        atcobject.object_type_id = 'FAKE/TEST'
+        atcobject.name = 'CLEAN_OBJECT'
+        atcobject.findings = sap.adt.atc.ATCFindingList()
+        self.worklist.objects.append(atcobject)
+
+        output = StringIO()
+        sap.cli.atc.print_worklist_to_stream(self.worklist, output)
+        self.assertTrue(output.getvalue().endswith('* 4 :: PRIO_4 :: Prio 4\nFAKE/TEST/CLEAN_OBJECT\n'))
+
+        output = StringIO()
+        sap.cli.atc.print_findings_to_stream(self.worklist.iter_findings(), output)
+        self.assertNotIn('CLEAN_OBJECT', output.getvalue())
+
+    def test_checkstyle(self):
+        self.worklist.objects[0].findings[0].location = '/sap/bc/adt/oo/classes/made_up_object#start=12,4'
+        self.worklist.objects[0].findings[1].message_title = 'Prio "2" <tag>'
+
+        output = StringIO()
+        ret = sap.cli.atc.print_findings_checkstyle(self.worklist.iter_findings(), output, error_level=2)
+        self.assertEqual(output.getvalue(),
+'''<?xml version="1.0" encoding="UTF-8"?>
+<checkstyle version="8.36">
+  <file name="FAKE/TEST/MADE_UP_OBJECT">
+    <error line="12" column="4" severity="error" message="Unit tests for ATC module of sapcli" source="UNIT_TEST/None"/>
+    <error line="0" column="0" severity="error" message="Prio &quot;2&quot; &lt;tag&gt;" source="PRIO_2/None"/>
+    <error line="0" column="0" severity="warning" message="Prio 3" source="PRIO_3/None"/>
+    <error line="0" column="0" severity="warning" message="Prio 4" source="PRIO_4/None"/>
+  </file>
+</checkstyle>
+''')
+        self.assertEqual(2, ret)
+
+    def test_jsonl(self):
+        output = StringIO()
+        ret = sap.cli.atc.print_findings_jsonl(self.worklist.iter_findings(), output, error_level=1)
+
+        lines = output.getvalue().split('\n')
+        self.assertEqual(lines[-1], '')
+        self.assertEqual(len(lines), 5)
+
+        self.assertEqual(json.loads(lines[0]),
+                         {'object_type_id': 'FAKE/TEST', 'object_name': 'MADE_UP_OBJECT', 'package_name': None,
+                          'priority': 1, 'check_id': None, 'check_title': 'UNIT_TEST', 'message_id': None,
+                          'message_title': 'Unit tests for ATC module of sapcli', 'location': None})
+        self.assertEqual(json.loads(lines[3])['check_title'], 'PRIO_4')
+        self.assertEqual(1, ret)
+
+
+class TestRunStream(unittest.TestCase):
+
+    @patch('sap.adt.atc.ChecksRunner')
+    def test_stream_jsonl(self, fake_runner):
+        atcobject = sap.adt.atc.ATCObject()
+        atcobject.object_type_id = 'CLAS/OC'
+        atcobject.name = 'ZCL_STREAM'
+
+        finding = sap.adt.atc.ATCFinding()
+        finding.priority = '1'
+        finding.check_title = 'STREAMED'
+
+        fake_runner.return_value.stream_for.return_value = SimpleNamespace(findings=iter([(atcobject, finding)]))
+
+        args = parse_args('run', 'class', 'ZCL_STREAM', '-r', 'VARIANT', '--stream', '-o', 'jsonl')
+        with patch('sys.stdout', new_callable=StringIO) as fake_stdout:
+            ret = args.execute(Connection(), args)
+
+        fake_runner.return_value.run_for.assert_not_called()
+        self.assertEqual(fake_runner.return_value.stream_for.call_args[1], {'max_verdicts': 100})
+        self.assertEqual(json.loads(fake_stdout.getvalue())['check_title'], 'STREAMED')
+        self.assertEqual(1, ret)
+
+
+class TestRunMultipleObjects(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = Connection()
+
+        patcher = patch('sap.adt.atc.ChecksRunner')
+        self.fake_runner = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.fake_runner.return_value.run_for.side_effect = \
+            lambda objects, max_verdicts: SimpleNamespace(worklist=sap.adt.atc.WorkList())
+
+    def run_checks(self, *argv, stdin=None):
+        args = parse_args('run', *argv, '-r', 'VARIANT')
+
+        with patch('sys.stdout', new_callable=StringIO), \
+             patch('sys.stdin', StringIO(stdin)):
+            return args.execute(self.connection, args)
+
+    def checked_names(self):
+        return [[ref.name for ref in call_args[0][0].inclusive.references.references]
+                for call_args in self.fake_runner.return_value.run_for.call_args_list]
+
+    def test_names(self):
+        self.run_checks('class', 'zcl_first', 'zcl_second')
+
+        self.fake_runner.assert_called_once_with(self.connection, 'VARIANT', worklist_id=None)
+        self.assertEqual(self.checked_names(), [['ZCL_FIRST', 'ZCL_SECOND']])
+
+    def test_chunks(self):
+        self.run_checks('program', 'zfirst', 'zsecond', 'zthird', '--chunk-size', '2')
+
+        self.fake_runner.assert_called_once_with(self.connection, 'VARIANT', worklist_id=None)
+        self.assertEqual(self.checked_names(), [['ZFIRST', 'ZSECOND'], ['ZTHIRD']])
+
+    def test_objects_stdin(self):
+        self.run_checks('class', 'zcl_first', '-f', '-', stdin='''
+# transport objects
+program zprogram
+
+interface zif_interface
+''')
+
+        self.assertEqual(self.checked_names(), [['ZCL_FIRST', 'ZPROGRAM', 'ZIF_INTERFACE']])
+
+    def test_objects_file(self):
+        with patch('sap.cli.core.open', mock_open(read_data='class zcl_file\npackage $file\n')) as fake_open:
+            self.run_checks('-f', 'objects.txt')
+
+        fake_open.assert_called_once_with('objects.txt', 'r', encoding='utf-8')
+        self.assertEqual(self.checked_names(), [['ZCL_FILE', '$FILE']])
+
+    def test_objects_invalid_line(self):
+        with self.assertRaises(SAPCliError) as caught:
+            self.run_checks('-f', '-', stdin='class\n')
+
+        self.assertEqual(str(caught.exception), 'Invalid object line: class')
+
+    def test_objects_unknown_type(self):
+        with self.assertRaises(SAPCliError) as caught:
+            self.run_checks('-f', '-', stdin='table t000\n')
+
+        self.assertEqual(str(caught.exception), 'Unknown type: table')
+
+    def test_no_objects(self):
+        with self.assertRaises(SAPCliError) as caught:
+            self.run_checks('-f', '-', stdin='')
+
+        self.assertEqual(str(caught.exception), 'No objects to check')
+        self.fake_runner.assert_not_called()
+
+    def test_stream_chunks(self):
+        self.fake_runner.return_value.stream_for.side_effect = \
+            lambda objects, max_verdicts: SimpleNamespace(findings=iter([]))
+
+        self.run_checks('class', 'zcl_first', 'zcl_second', '--chunk-size', '1', '--stream')
+
+        self.assertEqual(len(self.fake_runner.return_value.stream_for.call_args_list), 2)
+        self.fake_runner.return_value.run_for.assert_not_called()
+
+
+class TestRunCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+        self.connection = Connection()
+        self.connection.options.cache = sap.adt.cache.ResponseCache(self.tmpdir.name)
+
+        patcher = patch('sap.adt.atc.ChecksRunner')
+        self.fake_runner = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.fake_runner.return_value.run_for.side_effect = \
+            lambda objects, max_verdicts: SimpleNamespace(worklist=sap.adt.atc.WorkList())
+
+    def run_checks(self, *argv):
+        args = parse_args('run', 'class', 'zcl_first', *argv)
+
+        with patch('sys.stdout', new_callable=StringIO):
+            return args.execute(self.connection, args)
+
+    def test_reuse_worklist(self):
+        self.fake_runner.return_value.worklist_id = 'FIRST_ID'
+        self.run_checks('-r', 'VARIANT', '--reuse-worklist')
+
+        self.fake_runner.return_value.worklist_id = 'SECOND_ID'
+        self.run_checks('-r', 'VARIANT', '--reuse-worklist')
+        self.run_checks('-r', 'OTHER', '--reuse-worklist')
+
+        self.assertEqual(self.fake_runner.call_args_list,
+                         [call(self.connection, 'VARIANT', worklist_id=None),
+                          call(self.connection, 'VARIANT', worklist_id='FIRST_ID'),
+                          call(self.connection, 'OTHER', worklist_id=None)])
+
+        cache = sap.adt.atc.customizing_cache(self.connection)
+        self.assertEqual(cache.load_worklist_id(self.connection.system_key, 'VARIANT'), 'SECOND_ID')
+
+    def test_reuse_worklist_stream(self):
+        self.fake_runner.return_value.worklist_id = 'STREAM_ID'
+        self.fake_runner.return_value.stream_for.return_value = SimpleNamespace(findings=iter([]))
+
+        self.run_checks('-r', 'VARIANT', '--reuse-worklist', '--stream')
+
+        cache = sap.adt.atc.customizing_cache(self.connection)
+        self.assertEqual(cache.load_worklist_id(self.connection.system_key, 'VARIANT'), 'STREAM_ID')
+
+    def test_no_reuse_worklist(self):
+        self.fake_runner.return_value.worklist_id = 'FIRST_ID'
+        self.run_checks('-r', 'VARIANT')
+        self.run_checks('-r', 'VARIANT')
+
+        self.assertEqual(self.fake_runner.call_args_list,
+                         [call(self.connection, 'VARIANT', worklist_id=None),
+                          call(self.connection, 'VARIANT', worklist_id=None)])
+
+    def test_reuse_worklist_sharded(self):
+        with self.assertRaises(SAPCliError) as caught:
+            self.run_checks('-r', 'VARIANT', '--reuse-worklist', '--shard')
+
+        self.assertEqual(str(caught.exception), 'Sharded runs cannot reuse worklists')
+
+    def test_no_cache_dir(self):
+        self.connection = Connection()
+
+        for option in ['--reuse-worklist', '--cache-customizing']:
+            with self.assertRaises(SAPCliError) as caught:
+                self.run_checks(option)
+
+            self.assertEqual(str(caught.exception),
+                             '--reuse-worklist and --cache-customizing require the cache directory')
+
+    @patch('sap.adt.atc.fetch_customizing')
+    def test_cache_customizing(self, fake_fetch_customizing):
+        fake_fetch_customizing.return_value = sap.adt.atc.Customizing('THE_VARIANT')
+
+        self.run_checks('--cache-customizing')
+
+        cache = fake_fetch_customizing.call_args[1]['cache']
+        self.assertIsInstance(cache, sap.adt.atc.CustomizingCache)
+        self.fake_runner.assert_called_once_with(self.connection, 'THE_VARIANT', worklist_id=None)
+
+
+class TestRunSharded(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = Connection()
+
+        patcher = patch('sap.adt.atc.ShardedChecksRunner')
+        self.fake_runner = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.shards = []
+
+        def iter_worklists(shards, max_verdicts):
+            self.shards.extend(shards)
+            return [sap.adt.atc.WorkList() for _ in self.shards]
+
+        self.fake_runner.return_value.iter_worklists.side_effect = iter_worklists
+
+    def test_shard_package(self):
+        objects = [sap.adt.atc.ShardObject('CLAS/OC', 'ZCL_A', '/sap/bc/adt/oo/classes/zcl_a'),
+                   sap.adt.atc.ShardObject('CLAS/OC', 'ZCL_B', '/sap/bc/adt/oo/classes/zcl_b'),
+                   sap.adt.atc.ShardObject('PROG/P', 'ZPROG', '/sap/bc/adt/programs/programs/zprog')]
+
+        args = parse_args('run', 'package', '$ROOT', '-f', '-', '-r', 'VARIANT', '--shard', '-c', '2', '-j', '4',
+                          '--retries', '3')
+
+        with patch('sap.adt.atc.package_objects', return_value=objects) as fake_package_objects, \
+             patch('sys.stdin', StringIO('class zcl_a\nclass zcl_c\n')), \
+             patch('sys.stdout', new_callable=StringIO):
+            args.execute(self.connection, args)
+
+        self.assertEqual(fake_package_objects.call_args[0][0].name, '$ROOT')
+        self.fake_runner.assert_called_once_with(self.connection, 'VARIANT', jobs=4, retries=3)
+
+        self.assertEqual([[ref.name for ref in shard.inclusive.references.references] for shard in self.shards],
+                         [['ZCL_A', 'ZCL_B'], ['ZPROG', 'ZCL_C']])
+
+    def test_invalid_jobs(self):
+        args = parse_args('run', 'package', '$ROOT', '-r', 'VARIANT', '--shard', '-j', '0')
+
+        with self.assertRaises(SAPCliError) as caught:
+            args.execute(self.connection, args)
+
+        self.assertEqual(str(caught.exception), 'The number of jobs must be a positive number: 0')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 
+import os
 import sys
+import tempfile
 
 import unittest
 from unittest.mock import patch, call
@@ -9,30 +11,33 @@ from types import SimpleNamespace
 
 from sap.errors import SAPCliError
 import sap.cli.aunit
+import sap.cli.core
+import sap.adt.checkout
+import sap.adt.aunit
+import sap.adt.acoverage
 
 from mock import Connection, Response
 from fixtures_adt import LOCK_RESPONSE_OK, EMPTY_RESPONSE_OK
 from fixtures_adt_aunit import AUNIT_NO_TEST_RESULTS_XML, AUNIT_RESULTS_XML, GLOBAL_TEST_CLASS_AUNIT_RESULTS_XML
+from fixtures_adt_coverage import AUNIT_COVERAGE_RESULTS_XML, ACOVERAGE_RESULTS_XML, ACOVERAGE_STATEMENTS_RESULTS_XML
 
 
-class TestAUnitWrite(unittest.TestCase):
-
-    def assert_print_no_test_classes(self, mock_print):
-        self.assertEqual(
-            mock_print.call_args_list[0],
-            call('* [tolerable] [noTestClasses] - The task definition does not refer to any test', file=sys.stdout))
+def run_args(typ, name, output, chunk_size=100, shard=False, jobs=1, changed_since=None, coverage_output=None,
+             coverage_format='cobertura', no_cache=False):
+    return SimpleNamespace(type=typ, name=[name] if name else [], output=output, objects_file=None,
+                           chunk_size=chunk_size, shard=shard, jobs=jobs, retries=1, changed_since=changed_since,
+                           coverage_output=coverage_output, coverage_format=coverage_format,
+                           no_cache=no_cache)
 
-        self.assertEqual(
-            mock_print.call_args_list[1],
-            call('Successful: 0', file=sys.stdout))
 
-        self.assertEqual(
-            mock_print.call_args_list[2],
-            call('Warnings:   0', file=sys.stdout))
+class TestAUnitWrite(unittest.TestCase):
 
-        self.assertEqual(
-            mock_print.call_args_list[3],
-            call('Errors:     0', file=sys.stdout))
+    def assert_print_no_test_classes(self, mock_stdout):
+        self.assertEqual(mock_stdout.getvalue(),
+                         '* [tolerable] [noTestClasses] - The task definition does not refer to any test\n'
+                         'Successful: 0\n'
+                         'Warnings:   0\n'
+                         'Errors:     0\n')
 
     def test_aunit_invalid(self):
         with self.assertRaises(SAPCliError) as cm:
@@ -43,72 +48,74 @@ class TestAUnitWrite(unittest.TestCase):
     def test_aunit_program(self):
         connection = Connection([Response(status_code=200, text=AUNIT_NO_TEST_RESULTS_XML, headers={})])
 
-        with patch('sap.cli.aunit.print') as mock_print:
-            sap.cli.aunit.run(connection, SimpleNamespace(type='program', name='yprogram', output='human'))
+        with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            sap.cli.aunit.run(connection, run_args('program', 'yprogram', 'human'))
 
         self.assertEqual(len(connection.execs), 1)
         self.assertIn('programs/programs/yprogram', connection.execs[0].body)
-        self.assert_print_no_test_classes(mock_print)
+        self.assert_print_no_test_classes(mock_stdout)
 
     def test_aunit_class(self):
         connection = Connection([Response(status_code=200, text=AUNIT_NO_TEST_RESULTS_XML, headers={})])
 
-        with patch('sap.cli.aunit.print') as mock_print:
-            sap.cli.aunit.run(connection, SimpleNamespace(type='class', name='yclass', output='human'))
+        with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            sap.cli.aunit.run(connection, run_args('class', 'yclass', 'human'))
 
         self.assertEqual(len(connection.execs), 1)
         self.assertIn('oo/classes/yclass', connection.execs[0].body)
-        self.assert_print_no_test_classes(mock_print)
+        self.assert_print_no_test_classes(mock_stdout)
 
     def test_aunit_package(self):
         connection = Connection([Response(status_code=200, text=AUNIT_NO_TEST_RESULTS_XML, headers={})])
 
-        with patch('sap.cli.aunit.print') as mock_print:
-            sap.cli.aunit.run(connection, SimpleNamespace(type='package', name='ypackage', output='human'))
+        with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            sap.cli.aunit.run(connection, run_args('package', 'ypackage', 'human'))
 
         self.assertEqual(len(connection.execs), 1)
         self.assertIn('packages/ypackage', connection.execs[0].body)
-        self.assert_print_no_test_classes(mock_print)
+        self.assert_print_no_test_classes(mock_stdout)
 
     def test_aunit_package_with_results(self):
         connection = Connection([Response(status_code=200, text=AUNIT_RESULTS_XML, headers={})])
 
-        with patch('sap.cli.aunit.print') as mock_print:
-            exit_code = sap.cli.aunit.run(connection, SimpleNamespace(type='package', name='ypackage', output='human'))
+        with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            exit_code = sap.cli.aunit.run(connection, run_args('package', 'ypackage', 'human'))
 
         self.assertEqual(exit_code, 3)
         self.assertEqual(len(connection.execs), 1)
         self.assertIn('packages/ypackage', connection.execs[0].body)
 
-        self.assertEqual(mock_print.call_args_list[0], call('ZCL_THEKING_MANUAL_HARDCORE', file=sys.stdout))
-        self.assertEqual(mock_print.call_args_list[1], call('  LTCL_TEST', file=sys.stdout))
-        self.assertEqual(mock_print.call_args_list[2], call('    DO_THE_FAIL [ERR]', file=sys.stdout))
-        self.assertEqual(mock_print.call_args_list[3], call('    DO_THE_TEST [OK]', file=sys.stdout))
-        self.assertEqual(mock_print.call_args_list[4], call('  LTCL_TEST_HARDER', file=sys.stdout))
-        self.assertEqual(mock_print.call_args_list[5], call('    DO_THE_FAIL [ERR]', file=sys.stdout))
-        self.assertEqual(mock_print.call_args_list[6], call('    DO_THE_TEST [OK]', file=sys.stdout))
-        self.assertEqual(mock_print.call_args_list[7], call('ZEXAMPLE_TESTS', file=sys.stdout))
-        self.assertEqual(mock_print.call_args_list[8], call('  LTCL_TEST', file=sys.stdout))
-        self.assertEqual(mock_print.call_args_list[9], call('    DO_THE_FAIL [ERR]', file=sys.stdout))
-        self.assertEqual(mock_print.call_args_list[10], call('    DO_THE_TEST [OK]', file=sys.stdout))
-        self.assertEqual(mock_print.call_args_list[11], call('', file=sys.stdout))
-        self.assertEqual(mock_print.call_args_list[12], call('ZCL_THEKING_MANUAL_HARDCORE=>LTCL_TEST=>DO_THE_FAIL', file=sys.stdout))
-        self.assertEqual(mock_print.call_args_list[13], call('*  [critical] [failedAssertion] - Critical Assertion Error: \'I am supposed to fail\'', file=sys.stdout))
-        self.assertEqual(mock_print.call_args_list[14], call('ZCL_THEKING_MANUAL_HARDCORE=>LTCL_TEST_HARDER=>DO_THE_FAIL', file=sys.stdout))
-        self.assertEqual(mock_print.call_args_list[15], call('*  [critical] [failedAssertion] - Critical Assertion Error: \'I am supposed to fail\'', file=sys.stdout))
-        self.assertEqual(mock_print.call_args_list[16], call('ZEXAMPLE_TESTS=>LTCL_TEST=>DO_THE_FAIL', file=sys.stdout))
-        self.assertEqual(mock_print.call_args_list[17], call('*  [critical] [failedAssertion] - Critical Assertion Error: \'I am supposed to fail\'', file=sys.stdout))
-        self.assertEqual(mock_print.call_args_list[18], call('*  [critical] [failedAssertion] - Error<LOAD_PROGRAM_CLASS_MISMATCH>', file=sys.stdout))
-        self.assertEqual(mock_print.call_args_list[19], call('', file=sys.stdout))
-        self.assertEqual(mock_print.call_args_list[20], call('Successful: 3', file=sys.stdout))
-        self.assertEqual(mock_print.call_args_list[21], call('Warnings:   0', file=sys.stdout))
-        self.assertEqual(mock_print.call_args_list[22], call('Errors:     3', file=sys.stdout))
+        self.maxDiff = None
+        self.assertEqual(mock_stdout.getvalue(),
+                         'ZCL_THEKING_MANUAL_HARDCORE\n'
+                         '  LTCL_TEST\n'
+                         '    DO_THE_FAIL [ERR]\n'
+                         '    DO_THE_TEST [OK]\n'
+                         '  LTCL_TEST_HARDER\n'
+                         '    DO_THE_FAIL [ERR]\n'
+                         '    DO_THE_TEST [OK]\n'
+                         'ZEXAMPLE_TESTS\n'
+                         '  LTCL_TEST\n'
+                         '    DO_THE_FAIL [ERR]\n'
+                         '    DO_THE_TEST [OK]\n'
+                         '\n'
+                         'ZCL_THEKING_MANUAL_HARDCORE=>LTCL_TEST=>DO_THE_FAIL\n'
+                         "*  [critical] [failedAssertion] - Critical Assertion Error: 'I am supposed to fail'\n"
+                         'ZCL_THEKING_MANUAL_HARDCORE=>LTCL_TEST_HARDER=>DO_THE_FAIL\n'
+                         "*  [critical] [failedAssertion] - Critical Assertion Error: 'I am supposed to fail'\n"
+                         'ZEXAMPLE_TESTS=>LTCL_TEST=>DO_THE_FAIL\n'
+                         "*  [critical] [failedAssertion] - Critical Assertion Error: 'I am supposed to fail'\n"
+                         '*  [critical] [failedAssertion] - Error<LOAD_PROGRAM_CLASS_MISMATCH>\n'
+                         '\n'
+                         'Successful: 3\n'
+                         'Warnings:   0\n'
+                         'Errors:     3\n')
 
     def test_aunit_package_with_results_raw(self):
         connection = Connection([Response(status_code=200, text=AUNIT_RESULTS_XML, headers={})])
 
         with patch('sap.cli.aunit.print') as mock_print:
-            exit_code = sap.cli.aunit.run(connection, SimpleNamespace(type='package', name='ypackage', output='raw'))
+            exit_code = sap.cli.aunit.run(connection, run_args('package', 'ypackage', 'raw'))
 
         self.assertEqual(exit_code, 3)
         self.assertEqual(len(connection.execs), 1)
@@ -120,7 +127,7 @@ class TestAUnitWrite(unittest.TestCase):
         connection = Connection([Response(status_code=200, text=AUNIT_RESULTS_XML, headers={})])
 
         with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
-            exit_code = sap.cli.aunit.run(connection, SimpleNamespace(type='package', name='ypackage', output='junit4'))
+            exit_code = sap.cli.aunit.run(connection, run_args('package', 'ypackage', 'junit4'))
 
         self.assertEqual(exit_code, 3)
         self.assertEqual(len(connection.execs), 1)
@@ -159,6 +166,382 @@ Include: &lt;ZEXAMPLE_TESTS&gt; Line: &lt;25&gt; (PREPARE_THE_FAIL)</error>
 </testsuites>
 ''')
 
+    def test_aunit_many_objects(self):
+        connection = Connection([Response(status_code=200, text=AUNIT_RESULTS_XML, headers={})])
+        args = run_args('class', 'zcl_first', 'junit4')
+        args.name.append('zcl_second')
+
+        with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            exit_code = sap.cli.aunit.run(connection, args)
+
+        self.assertEqual(exit_code, 3)
+        self.assertEqual(len(connection.execs), 1)
+        self.assertIn('oo/classes/zcl_first"', connection.execs[0].body)
+        self.assertIn('oo/classes/zcl_second"', connection.execs[0].body)
+        self.assertIn('<testsuites name="zcl_first, zcl_second">', mock_stdout.getvalue())
+
+    def test_run_name(self):
+        objects = [SimpleNamespace(name='ZCL_FIRST'), SimpleNamespace(name='ZCL_SECOND')]
+
+        args = run_args('class', 'zcl_first', 'junit4')
+        self.assertEqual(sap.cli.aunit._run_name(args, objects[:1]), 'ZCL_FIRST')
+
+        args.objects_file = '/tmp/objects.txt'
+        self.assertEqual(sap.cli.aunit._run_name(args, objects), 'objects.txt')
+
+        args.objects_file = '-'
+        self.assertEqual(sap.cli.aunit._run_name(args, objects), 'stdin')
+
+        args.changed_since = 'C50K000001'
+        self.assertEqual(sap.cli.aunit._run_name(args, objects), 'C50K000001')
+
+    def test_aunit_objects_file_chunks(self):
+        connection = Connection([Response(status_code=200, text=AUNIT_RESULTS_XML, headers={}),
+                                 Response(status_code=200, text=GLOBAL_TEST_CLASS_AUNIT_RESULTS_XML, headers={})])
+        args = run_args('program', 'yprogram', 'human', chunk_size=1)
+        args.objects_file = '-'
+
+        with patch('sys.stdin', StringIO('# tested classes\nclass zcl_test_class\n')), \
+             patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            exit_code = sap.cli.aunit.run(connection, args)
+
+        self.assertEqual(exit_code, 3)
+        self.assertEqual(len(connection.execs), 2)
+        self.assertIn('programs/programs/yprogram"', connection.execs[0].body)
+        self.assertIn('oo/classes/zcl_test_class"', connection.execs[1].body)
+        self.assertIn('ZCL_TEST_CLASS\n  ZCL_TEST_CLASS\n    DO_THE_TEST [OK]\n', mock_stdout.getvalue())
+        self.assertIn('Successful: 4\n', mock_stdout.getvalue())
+
+    def test_aunit_objects_file_chunks_raw(self):
+        connection = Connection([Response(status_code=200, text=AUNIT_RESULTS_XML, headers={}),
+                                 Response(status_code=200, text=GLOBAL_TEST_CLASS_AUNIT_RESULTS_XML, headers={})])
+        args = run_args('class', 'zcl_first', 'raw', chunk_size=1)
+        args.name.append('zcl_second')
+
+        with patch('sap.cli.aunit.print') as mock_print:
+            exit_code = sap.cli.aunit.run(connection, args)
+
+        self.assertEqual(exit_code, 3)
+        self.assertEqual(mock_print.call_args_list, [call(AUNIT_RESULTS_XML),
+                                                     call(GLOBAL_TEST_CLASS_AUNIT_RESULTS_XML)])
+
+    def test_aunit_no_objects(self):
+        with self.assertRaises(SAPCliError) as cm:
+            sap.cli.aunit.run('wrongconn', run_args(None, None, 'human'))
+
+        self.assertEqual(str(cm.exception), 'No objects to test')
+
+    def test_aunit_shard_package(self):
+        connection = Connection([Response(status_code=200, text=GLOBAL_TEST_CLASS_AUNIT_RESULTS_XML, headers={}),
+                                 Response(status_code=200, text=AUNIT_RESULTS_XML, headers={})])
+        objects = [sap.adt.Class(connection, 'ZCL_A'), sap.adt.Class(connection, 'ZCL_B'),
+                   sap.adt.Program(connection, 'ZPROG')]
+        args = run_args('package', '$ROOT', 'human', chunk_size=2, shard=True, jobs=2)
+        args.objects_file = '-'
+
+        with patch('sap.adt.aunit.package_tested_objects', return_value=objects) as fake_package_objects, \
+             patch('sys.stdin', StringIO('class zcl_a\nclass zcl_c\n')), \
+             patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            exit_code = sap.cli.aunit.run(connection, args)
+
+        self.assertEqual(fake_package_objects.call_args[0][0].name, '$ROOT')
+        self.assertEqual(exit_code, 3)
+        self.assertEqual(len(connection.execs), 2)
+
+        bodies = sorted(request.body for request in connection.execs)
+        self.assertIn('oo/classes/zcl_a"', bodies[0])
+        self.assertIn('oo/classes/zcl_b"', bodies[0])
+        self.assertIn('programs/programs/zprog"', bodies[1])
+        self.assertIn('oo/classes/zcl_c"', bodies[1])
+
+        self.assertIn('Successful: 4\n', mock_stdout.getvalue())
+
+    def test_aunit_shard_invalid_jobs(self):
+        with self.assertRaises(SAPCliError) as cm:
+            sap.cli.aunit.run(Connection(), run_args('package', '$root', 'human', shard=True, jobs=0))
+
+        self.assertEqual(str(cm.exception), 'The number of jobs must be a positive number: 0')
+
+    def test_aunit_changed_since_manifest(self):
+        connection = Connection([Response(status_code=200, text=GLOBAL_TEST_CLASS_AUNIT_RESULTS_XML, headers={})])
+
+        with tempfile.TemporaryDirectory() as repo_dir:
+            with open(os.path.join(repo_dir, 'zcl_test_class.clas.abap'), 'w') as source:
+                source.write('CLASS zcl_test_class DEFINITION.')
+
+            manifest = sap.adt.checkout.CheckoutManifest(repo_dir, {
+                'CLAS/OC ZCL_TEST_CLASS': {'type': 'CLAS/OC', 'name': 'ZCL_TEST_CLASS', 'directory': '.',
+                                           'files': {'zcl_test_class.clas.abap': 'outdated'}},
+                'PROG/P ZPROG': {'type': 'PROG/P', 'name': 'ZPROG', 'directory': '.', 'files': {}}})
+            manifest.save()
+
+            with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+                exit_code = sap.cli.aunit.run(connection, run_args(None, None, 'junit4', changed_since=manifest.path))
+
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(len(connection.execs), 1)
+        self.assertIn('oo/classes/zcl_test_class"', connection.execs[0].body)
+        self.assertNotIn('zprog', connection.execs[0].body)
+        self.assertIn('<testsuites name="ZCL_TEST_CLASS">', mock_stdout.getvalue())
+
+    def test_aunit_changed_since_transport(self):
+        connection = Connection([Response(status_code=200, text=GLOBAL_TEST_CLASS_AUNIT_RESULTS_XML, headers={})])
+        args = run_args('class', 'zcl_test_class', 'human', changed_since='C50K000001')
+
+        with patch('sap.adt.aunit.transport_tested_objects',
+                   return_value=[sap.adt.Class(connection, 'ZCL_TEST_CLASS'), sap.adt.Program(connection, 'ZPROG')]) \
+                as fake_transport_objects, patch('sys.stdout', new_callable=StringIO):
+            sap.cli.aunit.run(connection, args)
+
+        fake_transport_objects.assert_called_once_with(connection, 'C50K000001')
+        self.assertEqual(len(connection.execs), 1)
+        self.assertEqual(connection.execs[0].body.count('adtcore:objectReference '), 2)
+        self.assertIn('programs/programs/zprog"', connection.execs[0].body)
+
+    def test_aunit_changed_since_not_found(self):
+        connection = Connection([])
+
+        with self.assertRaises(sap.cli.core.InvalidCommandLineError) as caught:
+            sap.cli.aunit.run(connection, run_args(None, None, 'junit4', changed_since='/no/such/checkout'))
+
+        self.assertEqual(str(caught.exception),
+                         'Neither a checkout directory, manifest file nor transport number: /no/such/checkout')
+        self.assertEqual(connection.execs, [])
+
+    def test_aunit_changed_since_nothing(self):
+        connection = Connection([])
+
+        with tempfile.TemporaryDirectory() as repo_dir, patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            exit_code = sap.cli.aunit.run(connection, run_args(None, None, 'junit4', changed_since=repo_dir))
+
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(connection.execs, [])
+        self.assertEqual(mock_stdout.getvalue(), f'''<?xml version="1.0" encoding="UTF-8" ?>
+<testsuites name="{repo_dir}">
+</testsuites>
+''')
+
+    def test_aunit_human_late_alerts(self):
+        connection = Connection([Response(status_code=200, text=GLOBAL_TEST_CLASS_AUNIT_RESULTS_XML, headers={}),
+                                 Response(status_code=200, text=AUNIT_NO_TEST_RESULTS_XML, headers={}),
+                                 Response(status_code=200, text=AUNIT_NO_TEST_RESULTS_XML, headers={})])
+        args = run_args('class', 'zcl_test_class', 'human', chunk_size=1)
+        args.name.extend(['zcl_first', 'zcl_second'])
+
+        with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            exit_code = sap.cli.aunit.run(connection, args)
+
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(len(connection.execs), 3)
+        self.assertEqual(mock_stdout.getvalue(),
+                         'ZCL_TEST_CLASS\n'
+                         '  ZCL_TEST_CLASS\n'
+                         '    DO_THE_TEST [OK]\n'
+                         '\n'
+                         '* [tolerable] [warning] - The global test class [ZCL_TEST_CLASS] is not abstract\n'
+                         '* [tolerable] [noTestClasses] - The task definition does not refer to any test\n'
+                         '\n'
+                         'Successful: 1\n'
+                         'Warnings:   0\n'
+                         'Errors:     0\n')
+
+    def run_coverage(self, coverage_format, output='human'):
+        connection = Connection([Response(status_code=200, text=AUNIT_COVERAGE_RESULTS_XML, headers={}),
+                                 Response(status_code=200, text=ACOVERAGE_RESULTS_XML,
+                                          headers={'Content-Type': 'application/xml'}),
+                                 Response(status_code=200, text=ACOVERAGE_STATEMENTS_RESULTS_XML,
+                                          headers={'Content-Type': 'application/xml'})])
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            coverage_output = os.path.join(tmpdir, 'coverage.xml')
+
+            with patch('sys.stdout', new_callable=StringIO):
+                exit_code = sap.cli.aunit.run(connection, run_args('package', 'test_pkg', output,
+                                                                   coverage_output=coverage_output,
+                                                                   coverage_format=coverage_format))
+
+            with open(coverage_output) as coverage_file:
+                coverage_xml = coverage_file.read()
+
+        self.assertEqual(exit_code, 0)
+        self.assertEqual([request.adt_uri for request in connection.execs],
+                         ['/sap/bc/adt/abapunit/testruns',
+                          '/sap/bc/adt/runtime/traces/coverage/measurements/FOOBAR',
+                          '/sap/bc/adt/runtime/traces/coverage/results/FOOBAR/statements'])
+        self.assertIn('<coverage active="true"/>', connection.execs[0].body)
+
+        return coverage_xml
+
+    def test_aunit_coverage_cobertura(self):
+        self.assertEqual(self.run_coverage('cobertura'), '''<?xml version="1.0" ?>
+<!DOCTYPE coverage SYSTEM "http://cobertura.sourceforge.net/xml/coverage-04.dtd">
+<coverage line-rate="0.6667" branch-rate="0.7500" lines-covered="2" lines-valid="3" branches-covered="3" branches-valid="4" complexity="0" version="sapcli">
+  <sources>
+    <source>.</source>
+  </sources>
+  <packages>
+    <package name="TEST_PKG" line-rate="0.6667" branch-rate="0.7500" complexity="0">
+      <classes>
+        <class name="ZCL_TEST_CLASS" filename="zcl_test_class.clas.abap" line-rate="0.6667" branch-rate="0.7500" complexity="0">
+          <methods>
+            <method name="METHOD_A" signature="" line-rate="1.0000" branch-rate="0.7500" complexity="0">
+              <lines/>
+            </method>
+            <method name="METHOD_B" signature="" line-rate="0.0000" branch-rate="1.0000" complexity="0">
+              <lines/>
+            </method>
+          </methods>
+          <lines>
+            <line number="11" hits="2"/>
+            <line number="12" hits="3"/>
+            <line number="21" hits="0"/>
+          </lines>
+        </class>
+      </classes>
+    </package>
+  </packages>
+</coverage>
+''')
+
+    def test_aunit_coverage_jacoco(self):
+        coverage_xml = self.run_coverage('jacoco', output='raw')
+
+        self.assertTrue(coverage_xml.startswith('''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<!DOCTYPE report PUBLIC "-//JACOCO//DTD Report 1.1//EN" "report.dtd">
+<report name="test_pkg">
+  <package name="TEST_PKG">
+    <class name="ZCL_TEST_CLASS" sourcefilename="zcl_test_class.clas.abap">
+      <method name="METHOD_A" desc="()">
+        <counter type="INSTRUCTION" missed="0" covered="5"/>
+        <counter type="BRANCH" missed="1" covered="3"/>
+        <counter type="METHOD" missed="0" covered="1"/>
+      </method>
+'''))
+        self.assertIn('''    <sourcefile name="zcl_test_class.clas.abap">
+      <line nr="11" mi="0" ci="1"/>
+      <line nr="12" mi="0" ci="1"/>
+      <line nr="21" mi="1" ci="0"/>
+''', coverage_xml)
+        self.assertTrue(coverage_xml.endswith('''  <counter type="INSTRUCTION" missed="3" covered="5"/>
+  <counter type="BRANCH" missed="1" covered="3"/>
+  <counter type="METHOD" missed="1" covered="1"/>
+</report>
+'''))
+
+    def include_coverage(self):
+        clas = sap.adt.acoverage.CoverageNode('ZCL_A', 'CLAS/OC', '/zcl_a')
+        method = sap.adt.acoverage.CoverageNode('METHOD', 'CLAS/OM', '/zcl_a/source/main#start=10,2')
+        method.counters = {'statement': (1, 2), 'branch': (1, 2), 'procedure': (1, 1)}
+        local_method = sap.adt.acoverage.CoverageNode('LOCAL', 'CLAS/OM', '/zcl_a/includes/implementations#start=5,2')
+        local_method.counters = {'statement': (1, 1), 'procedure': (1, 1)}
+        clas.nodes = [method, local_method]
+        clas.counters = {'statement': (2, 3), 'branch': (1, 2), 'procedure': (2, 2)}
+
+        return sap.adt.acoverage.Coverage([clas], {'/zcl_a/source/main': sap.adt.acoverage.LineCoverage({11: 1, 12: 0}),
+                                                   '/zcl_a/includes/implementations': sap.adt.acoverage.LineCoverage({6: 3})})
+
+    def test_coverage_cobertura_includes(self):
+        stream = StringIO()
+        sap.cli.aunit.print_coverage_cobertura(self.include_coverage(), 'test', stream)
+
+        coverage_xml = stream.getvalue()
+        self.assertIn('lines-covered="2" lines-valid="3" branches-covered="1" branches-valid="2"', coverage_xml)
+        self.assertIn('''        <class name="ZCL_A" filename="zcl_a.clas.abap" line-rate="0.5000" branch-rate="0.5000" complexity="0">
+          <methods>
+            <method name="METHOD" signature="" line-rate="0.5000" branch-rate="0.5000" complexity="0">
+              <lines/>
+            </method>
+          </methods>
+          <lines>
+            <line number="11" hits="1"/>
+            <line number="12" hits="0"/>
+          </lines>
+        </class>
+        <class name="ZCL_A.implementations" filename="zcl_a.clas.locals_imp.abap" line-rate="1.0000" branch-rate="1.0000" complexity="0">
+          <methods>
+            <method name="LOCAL" signature="" line-rate="1.0000" branch-rate="1.0000" complexity="0">
+              <lines/>
+            </method>
+          </methods>
+          <lines>
+            <line number="6" hits="3"/>
+          </lines>
+        </class>
+''', coverage_xml)
+
+    def test_coverage_jacoco_includes(self):
+        stream = StringIO()
+        sap.cli.aunit.print_coverage_jacoco(self.include_coverage(), 'test', stream)
+
+        coverage_xml = stream.getvalue()
+        self.assertIn('''    <class name="ZCL_A.implementations" sourcefilename="zcl_a.clas.locals_imp.abap">
+      <method name="LOCAL" desc="()">
+''', coverage_xml)
+        self.assertIn('''    <sourcefile name="zcl_a.clas.abap">
+      <line nr="11" mi="0" ci="1"/>
+      <line nr="12" mi="1" ci="0"/>
+''', coverage_xml)
+        self.assertIn('''    <sourcefile name="zcl_a.clas.locals_imp.abap">
+      <line nr="6" mi="0" ci="1"/>
+      <counter type="INSTRUCTION" missed="0" covered="1"/>
+      <counter type="METHOD" missed="0" covered="1"/>
+      <counter type="LINE" missed="0" covered="1"/>
+    </sourcefile>
+''', coverage_xml)
+
+    def test_aunit_without_coverage(self):
+        connection = Connection([Response(status_code=200, text=AUNIT_COVERAGE_RESULTS_XML, headers={})])
+
+        with patch('sys.stdout', new_callable=StringIO):
+            sap.cli.aunit.run(connection, run_args('package', 'test_pkg', 'human'))
+
+        self.assertEqual(len(connection.execs), 1)
+        self.assertIn('<coverage active="false"/>', connection.execs[0].body)
+
+    def test_aunit_cached_results(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = sap.adt.aunit.RunResultsCache(tmpdir)
+
+            metadata = '<program:abapProgram xmlns:adtcore="http://www.sap.com/adt/core" adtcore:changedAt="now"/>'
+            metadata_connection = Connection([Response(status_code=200, text=metadata, headers={})])
+            key = sap.adt.aunit.run_results_key(metadata_connection,
+                                                [sap.adt.Program(metadata_connection, 'yprogram')])
+            cache.save(key, AUNIT_NO_TEST_RESULTS_XML)
+
+            connection = Connection([Response(status_code=200, text=metadata, headers={})])
+
+            with patch('sap.adt.aunit.run_results_cache', return_value=cache), \
+                    patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+                sap.cli.aunit.run(connection, run_args('program', 'yprogram', 'human'))
+
+        self.assertEqual(connection.mock_methods(), [('GET', '/sap/bc/adt/programs/programs/yprogram')])
+        self.assert_print_no_test_classes(mock_stdout)
+
+    def test_aunit_no_cache(self):
+        connection = Connection([Response(status_code=200, text=AUNIT_NO_TEST_RESULTS_XML, headers={})])
+
+        with patch('sap.adt.aunit.run_results_cache') as fake_cache, \
+                patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            sap.cli.aunit.run(connection, run_args('program', 'yprogram', 'human', no_cache=True))
+
+        fake_cache.assert_not_called()
+        self.assertEqual(connection.mock_methods(), [('POST', '/sap/bc/adt/abapunit/testruns')])
+        self.assert_print_no_test_classes(mock_stdout)
+
+    def test_buffered_stream(self):
+        output = StringIO()
+        buffered = sap.cli.aunit.BufferedStream(output, size=4)
+
+        buffered.write('ab')
+        self.assertEqual(output.getvalue(), '')
+
+        buffered.write('cd')
+        self.assertEqual(output.getvalue(), 'abcd')
+
+        buffered.write('e')
+        buffered.flush()
+        self.assertEqual(output.getvalue(), 'abcde')
+
     def test_aunit_parser_results_global_class_tests(self):
         results = sap.adt.aunit.parse_run_results(GLOBAL_TEST_CLASS_AUNIT_RESULTS_XML)
         output = StringIO()
@@ -2,17 +2,23 @@
 
 import os
 import sys
+import json
+import tempfile
 from argparse import ArgumentParser
 import unittest
-from unittest.mock import Mock, PropertyMock, patch, mock_open, call
+from unittest.mock import Mock, PropertyMock, patch, mock_open, call, ANY
 from types import SimpleNamespace
 from io import StringIO
 
+import sap.adt.checkout
 import sap.cli.checkout
+import sap.errors
 import sap.platform.abap
 import sap.platform.abap.abapgit
 
-from mock import Connection
+from mock import Connection, Response
+
+from fixtures_adt_program import GET_EXECUTABLE_PROGRAM_ADT_XML
 
 
 def parse_args(argv):
@@ -338,6 +344,7 @@ class TestCheckoutPackage(unittest.TestCase):
 
         args = parse_args(['package', package_name, '--recursive'])
         with patch('sap.cli.checkout.open', mock_open()) as fake_open, \
+             patch('sap.adt.checkout.open', mock_open()), \
              patch('sap.cli.checkout.print') as fake_print, \
              patch('os.path.isdir') as fake_isdir, \
              patch('os.makedirs') as fake_makedirs, \
@@ -351,10 +358,10 @@ class TestCheckoutPackage(unittest.TestCase):
 
         exp_destdir = os.path.abspath(os.path.join(package_name, 'src'))
         exp_sub_destdir = os.path.abspath(os.path.join(package_name, 'src', sub_package_name.lower()))
-        fake_prog.assert_called_once_with(conn, 'Z_HELLO_WORLD', exp_destdir)
-        fake_intf.assert_called_once_with(conn, 'ZIF_HELLO_WORLD', exp_destdir)
-        self.assertEqual(fake_clas.mock_calls, [call(conn, 'ZCL_HELLO_WORLD', exp_destdir),
-                                                call(conn, 'ZCL_TESTS', exp_sub_destdir)])
+        fake_prog.assert_called_once_with(conn, 'Z_HELLO_WORLD', exp_destdir, manifest=ANY)
+        fake_intf.assert_called_once_with(conn, 'ZIF_HELLO_WORLD', exp_destdir, manifest=ANY)
+        self.assertEqual(fake_clas.mock_calls, [call(conn, 'ZCL_HELLO_WORLD', exp_destdir, manifest=ANY),
+                                                call(conn, 'ZCL_TESTS', exp_sub_destdir, manifest=ANY)])
 
         self.assertEqual(fake_print.mock_calls, [call('Unsupported object: 7777/3 Magic Unicorn', file=sys.stderr)])
 
@@ -385,6 +392,7 @@ class TestCheckoutPackage(unittest.TestCase):
         starting_folder = 'src'
         args = parse_args(['package', package_name])
         with patch('sap.cli.checkout.open', mock_open()) as fake_open, \
+             patch('sap.adt.checkout.open', mock_open()), \
              patch('os.path.isdir') as fake_isdir, \
              patch('os.makedirs') as fake_makedirs:
             fake_isdir.return_value = True
@@ -392,7 +400,7 @@ class TestCheckoutPackage(unittest.TestCase):
             args.execute(conn, args)
 
         exp_destdir = os.path.abspath(os.path.join(package_name, starting_folder))
-        fake_checkout.assert_called_once_with(conn, exp_objects, destdir=exp_destdir)
+        fake_checkout.assert_called_once_with(conn, exp_objects, destdir=exp_destdir, executor=None, manifest=ANY)
 
     @patch('sap.cli.checkout.checkout_package')
     @patch('sap.cli.checkout.checkout_objects')
@@ -407,6 +415,7 @@ class TestCheckoutPackage(unittest.TestCase):
         starting_folder = os.path.join('backend', 'abap', 'src')
         args = parse_args(['package', package_name, '--starting-folder', starting_folder])
         with patch('sap.cli.checkout.open', mock_open()) as fake_open, \
+             patch('sap.adt.checkout.open', mock_open()), \
              patch('os.path.isdir') as fake_isdir, \
              patch('os.makedirs') as fake_makedirs:
             fake_isdir.return_value = True
@@ -417,7 +426,7 @@ class TestCheckoutPackage(unittest.TestCase):
         fake_isdir.assert_called_once_with(exp_repodir)
 
         exp_sourcedir = os.path.abspath(os.path.join(exp_repodir, starting_folder))
-        fake_checkout.assert_called_once_with(conn, exp_objects, destdir=exp_sourcedir)
+        fake_checkout.assert_called_once_with(conn, exp_objects, destdir=exp_sourcedir, executor=None, manifest=ANY)
 
     @patch('sap.platform.abap.to_xml')
     @patch('sap.cli.checkout.checkout_package')
@@ -431,6 +440,7 @@ class TestCheckoutPackage(unittest.TestCase):
         starting_folder = os.path.join('backend', 'abap', 'src')
         args = parse_args(['package', package_name, '--starting-folder', starting_folder])
         with patch('sap.cli.checkout.open', mock_open()) as fake_open, \
+             patch('sap.adt.checkout.open', mock_open()), \
              patch('os.path.isdir') as fake_isdir, \
              patch('os.makedirs') as fake_makedirs:
             fake_isdir.return_value = False
@@ -464,6 +474,7 @@ class TestCheckoutPackage(unittest.TestCase):
         repo_dir_name = 'valhalla'
         args = parse_args(['package', package_name, repo_dir_name, '--starting-folder', starting_folder])
         with patch('sap.cli.checkout.open', mock_open()) as fake_open, \
+             patch('sap.adt.checkout.open', mock_open()), \
              patch('os.path.isdir') as fake_isdir, \
              patch('os.makedirs') as fake_makedirs:
             fake_isdir.return_value = True
@@ -474,7 +485,7 @@ class TestCheckoutPackage(unittest.TestCase):
         fake_isdir.assert_called_once_with(exp_repodir)
 
         exp_sourcedir = os.path.join(exp_repodir, starting_folder)
-        fake_checkout.assert_called_once_with(conn, exp_objects, destdir=exp_sourcedir)
+        fake_checkout.assert_called_once_with(conn, exp_objects, destdir=exp_sourcedir, executor=None, manifest=ANY)
 
     def test_checkout_objects_makedirs(self):
         conn = Connection([])
@@ -488,6 +499,139 @@ class TestCheckoutPackage(unittest.TestCase):
         fake_isdir.assert_called_once_with(starting_folder)
         fake_makedirs.assert_called_once_with(starting_folder)
 
+    @patch('sap.cli.checkout.checkout_package')
+    @patch('sap.cli.checkout.checkout_class')
+    @patch('sap.cli.checkout.checkout_interface')
+    @patch('sap.cli.checkout.checkout_program')
+    @patch('sap.adt.package.walk')
+    def test_checkout_package_jobs(self, fake_walk, fake_prog, fake_intf, fake_clas, fake_package):
+        conn = Connection([])
+
+        fake_walk.return_value = iter((([], [], [SimpleNamespace(typ='INTF/OI', name='ZIF_HELLO_WORLD'),
+                                                 SimpleNamespace(typ='CLAS/OC', name='ZCL_HELLO_WORLD'),
+                                                 SimpleNamespace(typ='PROG/P', name='Z_HELLO_WORLD')]), ))
+
+        fake_clas.side_effect = sap.errors.SAPCliError('Locked')
+
+        args = parse_args(['package', '$VICTORY', '--jobs', '2'])
+        with patch('sap.cli.checkout.open', mock_open()) as fake_open, \
+             patch('sap.adt.checkout.open', mock_open()), \
+             patch('sap.cli.checkout.print') as fake_print, \
+             patch('os.path.isdir') as fake_isdir, \
+             patch('os.makedirs') as fake_makedirs:
+            fake_isdir.return_value = True
+            exit_code = args.execute(conn, args)
+
+        self.assertEqual(exit_code, 1)
+
+        exp_destdir = os.path.abspath(os.path.join('$VICTORY', 'src'))
+        fake_prog.assert_called_once_with(conn, 'Z_HELLO_WORLD', exp_destdir, manifest=ANY)
+        fake_intf.assert_called_once_with(conn, 'ZIF_HELLO_WORLD', exp_destdir, manifest=ANY)
+        fake_clas.assert_called_once_with(conn, 'ZCL_HELLO_WORLD', exp_destdir, manifest=ANY)
+
+        self.assertEqual(fake_print.mock_calls, [call('Failed to checkout CLAS/OC ZCL_HELLO_WORLD: Locked',
+                                                      file=sys.stderr)])
+
+    def test_checkout_package_jobs_invalid(self):
+        conn = Connection([])
+
+        args = parse_args(['package', '$VICTORY', '--jobs', '0'])
+        with self.assertRaises(sap.cli.core.InvalidCommandLineError):
+            args.execute(conn, args)
+
+
+class TestCheckoutManifest(unittest.TestCase):
+
+    def checkout_program(self, repo_dir, changed_at='2019-02-10T20:16:33Z'):
+        responses = [Response(text=GET_EXECUTABLE_PROGRAM_ADT_XML.replace('2019-02-10T20:16:33Z', changed_at),
+                              status_code=200, headers={}),
+                     Response(text='REPORT zhello_world.', status_code=200, headers={})]
+
+        conn = Connection(responses)
+
+        manifest = sap.adt.checkout.CheckoutManifest.load(repo_dir)
+        sap.cli.checkout.checkout_program(conn, 'ZHELLO_WORLD', os.path.join(repo_dir, 'src'), manifest=manifest)
+        manifest.save()
+
+        return conn.mock_methods()
+
+    def test_checkout_skips_unchanged(self):
+        with tempfile.TemporaryDirectory() as repo_dir:
+            os.makedirs(os.path.join(repo_dir, 'src'))
+
+            self.assertEqual(self.checkout_program(repo_dir),
+                             [('GET', '/sap/bc/adt/programs/programs/zhello_world'),
+                              ('GET', '/sap/bc/adt/programs/programs/zhello_world/source/main')])
+
+            with open(os.path.join(repo_dir, sap.adt.checkout.CHECKOUT_MANIFEST_FILE)) as manifest_file:
+                record = json.load(manifest_file)['objects']['PROG/P ZHELLO_WORLD']
+
+            self.assertEqual(record['version'], 'active')
+            self.assertEqual(record['changed_at'], '2019-02-10T20:16:33Z')
+            self.assertEqual(record['directory'], 'src')
+            self.assertEqual(sorted(record['files'].keys()), ['zhello_world.prog.abap', 'zhello_world.prog.xml'])
+
+            self.assertEqual(self.checkout_program(repo_dir),
+                             [('GET', '/sap/bc/adt/programs/programs/zhello_world')])
+
+    def test_checkout_downloads_changed(self):
+        with tempfile.TemporaryDirectory() as repo_dir:
+            os.makedirs(os.path.join(repo_dir, 'src'))
+
+            self.checkout_program(repo_dir)
+
+            self.assertEqual(self.checkout_program(repo_dir, changed_at='2019-02-11T08:00:00Z'),
+                             [('GET', '/sap/bc/adt/programs/programs/zhello_world'),
+                              ('GET', '/sap/bc/adt/programs/programs/zhello_world/source/main')])
+
+    def test_checkout_downloads_locally_modified(self):
+        with tempfile.TemporaryDirectory() as repo_dir:
+            os.makedirs(os.path.join(repo_dir, 'src'))
+
+            self.checkout_program(repo_dir)
+
+            with open(os.path.join(repo_dir, 'src', 'zhello_world.prog.abap'), 'a') as source:
+                source.write('WRITE: / \'Hello\'.')
+
+            self.assertEqual(self.checkout_program(repo_dir),
+                             [('GET', '/sap/bc/adt/programs/programs/zhello_world'),
+                              ('GET', '/sap/bc/adt/programs/programs/zhello_world/source/main')])
+
+            with open(os.path.join(repo_dir, 'src', 'zhello_world.prog.abap')) as source:
+                self.assertEqual(source.read(), 'REPORT zhello_world.')
+
+    def test_changed_objects(self):
+        with tempfile.TemporaryDirectory() as repo_dir:
+            os.makedirs(os.path.join(repo_dir, 'src'))
+
+            self.checkout_program(repo_dir)
+            manifest = sap.adt.checkout.CheckoutManifest.load(repo_dir)
+            self.assertEqual(manifest.changed_objects(), [])
+
+            with open(os.path.join(repo_dir, 'src', 'zhello_world.prog.abap'), 'a') as source:
+                source.write('WRITE: / \'Hello\'.')
+
+            self.assertEqual(manifest.changed_objects(), [('PROG/P', 'ZHELLO_WORLD')])
+
+            os.remove(os.path.join(repo_dir, 'src', 'zhello_world.prog.abap'))
+            self.assertEqual(manifest.changed_objects(), [('PROG/P', 'ZHELLO_WORLD')])
+
+    @patch('sap.cli.checkout.checkout_package')
+    @patch('sap.cli.checkout.checkout_objects')
+    @patch('sap.adt.package.walk')
+    def test_checkout_package_force(self, fake_walk, fake_checkout, fake_package):
+        fake_walk.return_value = iter((([], [], []), ))
+
+        with tempfile.TemporaryDirectory() as repo_dir:
+            with open(os.path.join(repo_dir, sap.adt.checkout.CHECKOUT_MANIFEST_FILE), 'w') as manifest_file:
+                manifest_file.write('{"objects": {"PROG/P ZHELLO_WORLD": {}}}')
+
+            args = parse_args(['package', '$VICTORY', repo_dir, '--force'])
+            args.execute(Connection([]), args)
+
+            with open(os.path.join(repo_dir, sap.adt.checkout.CHECKOUT_MANIFEST_FILE)) as manifest_file:
+                self.assertEqual(json.load(manifest_file), {'objects': {}})
+
 
 class TestDOT_ABAP_GIT(unittest.TestCase):
 